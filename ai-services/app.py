@@ -1,12 +1,20 @@
-from flask import Flask, jsonify
+from flask import Flask, Response, jsonify
 from flask_cors import CORS
 from app.config import Config
 from app.routes import image_routes
+from app.services.warmup import warmup
+from app.utils.metrics import metrics
 import os
 
 
-def create_app():
-    """Application factory"""
+def create_app(start_warmup: bool = True):
+    """
+    Application factory
+    
+    Args:
+        start_warmup: Start background warmup when WARMUP_ENABLED (the
+            pre-fork server starts it in each worker instead)
+    """
     app = Flask(__name__)
     
     # Load configuration
@@ -21,6 +29,17 @@ def create_app():
     # Register blueprints
     app.register_blueprint(image_routes.bp)
     
+    # Load and exercise models in the background; /api/image/health/ready
+    # reports 503 until this finishes
+    if Config.WARMUP_ENABLED and start_warmup:
+        warmup.start()
+    
+    # Prometheus scrape endpoint
+    if Config.METRICS_ENABLED:
+        @app.route('/metrics')
+        def metrics_endpoint():
+            return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+    
     # Root endpoint
     @app.route('/')
     def index():
@@ -30,11 +49,17 @@ def create_app():
             'status': 'running',
             'endpoints': {
                 'process': '/api/image/process',
+                'process_batch': '/api/image/process/batch',
+                'jobs': '/api/image/jobs',
                 'segment': '/api/image/segment',
+                'segment_prompt': '/api/image/segment/prompt',
                 'ocr': '/api/image/ocr',
                 'layout': '/api/image/layout',
                 'colors': '/api/image/colors',
-                'health': '/api/image/health'
+                'health': '/api/image/health',
+                'health_live': '/api/image/health/live',
+                'health_ready': '/api/image/health/ready',
+                'metrics': '/metrics'
             }
         })
     
@@ -63,7 +88,6 @@ if __name__ == '__main__':
     print(f"🌐 Server: http://{Config.HOST}:{Config.PORT}")
     print(f"🔧 Device: {Config.DEVICE}")
     print(f"📝 OCR: {Config.OCR_BACKEND}")
-    print(f"📁 Uploads: {Config.UPLOAD_FOLDER}")
     print(f"🤖 Models: {Config.MODELS_DIR}")
     print("="*60 + "\n")
     
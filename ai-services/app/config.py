@@ -15,24 +15,104 @@ class Config:
     # SAM Model
     SAM_CHECKPOINT = os.getenv('SAM_CHECKPOINT', 'sam_vit_h_4b8939.pth')
     SAM_MODEL_TYPE = os.getenv('SAM_MODEL_TYPE', 'vit_h')  # vit_h, vit_l, vit_b
+    SAM_PROFILE = os.getenv('SAM_PROFILE', 'quality')  # fast, balanced or quality
+    SAM_BACKEND = os.getenv('SAM_BACKEND', 'torch')  # torch, onnx (ONNX Runtime, exported once to MODELS_DIR/onnx) or stub
+    SAM_ONNX_THREADS = int(os.getenv('SAM_ONNX_THREADS', 0))  # ONNX Runtime intra-op threads (0 = default)
+    SAM_EMBEDDING_CACHE_BYTES = int(os.getenv('SAM_EMBEDDING_CACHE_BYTES', 512 * 1024 * 1024))
+    SAM_EMBEDDING_CACHE_DIR = os.getenv('SAM_EMBEDDING_CACHE_DIR', '')  # Persist embeddings as .npy when set
     
     # Pix2Struct Model
     PIX2STRUCT_MODEL = os.getenv('PIX2STRUCT_MODEL', 'google/pix2struct-base')
+    PIX2STRUCT_DECODING = os.getenv('PIX2STRUCT_DECODING', 'beam')  # beam, small_beam, greedy or budget
+    PIX2STRUCT_TIME_BUDGET = float(os.getenv('PIX2STRUCT_TIME_BUDGET', 2.0))  # Seconds of generate() in the budget profile
+    PIX2STRUCT_QUANTIZE = os.getenv('PIX2STRUCT_QUANTIZE', 'False').lower() == 'true'  # Dynamic int8 on CPU
+    PIX2STRUCT_BACKEND = os.getenv('PIX2STRUCT_BACKEND', 'transformers')  # transformers or stub
     
     # Device Config
     DEVICE = os.getenv('DEVICE', 'cuda' if __import__('torch').cuda.is_available() else 'cpu')
     
     # OCR Config
-    OCR_BACKEND = os.getenv('OCR_BACKEND', 'paddleocr')  # paddleocr or tesseract
+    OCR_BACKEND = os.getenv('OCR_BACKEND', 'paddleocr')  # paddleocr, tesseract or stub
     TESSERACT_CMD = os.getenv('TESSERACT_CMD', None)  # Path to tesseract executable
+    OCR_MODE = os.getenv('OCR_MODE', 'full')  # full (detect + recognize) or segments (recognize SAM text segments)
+    OCR_REC_BATCH_SIZE = int(os.getenv('OCR_REC_BATCH_SIZE', 16))  # Crops per PaddleOCR recognition batch
+    OCR_REGION_MIN_CONFIDENCE = float(os.getenv('OCR_REGION_MIN_CONFIDENCE', 0.5))  # Drop weaker region reads
+    OCR_WORKERS = int(os.getenv('OCR_WORKERS', 0))  # OCR worker processes, each with its own engine (0 = in-process)
+    OCR_POOL_START_METHOD = os.getenv('OCR_POOL_START_METHOD', 'spawn')  # spawn, forkserver or fork
+    OCR_TILE_MIN_PIXELS = int(os.getenv('OCR_TILE_MIN_PIXELS', 4_000_000))  # Tile OCR above this many pixels (0 = never)
+    OCR_TILE_SIZE = int(os.getenv('OCR_TILE_SIZE', 960))  # Tile side, PaddleOCR's default detector limit
+    OCR_TILE_OVERLAP = int(os.getenv('OCR_TILE_OVERLAP', 160))  # Must exceed the tallest text line
+    OCR_TILE_WORKERS = int(os.getenv('OCR_TILE_WORKERS', 4))  # Tiles OCR'd in parallel without a worker pool
     
     # Processing Config
-    MAX_IMAGE_SIZE = int(os.getenv('MAX_IMAGE_SIZE', 2048))
+    MAX_IMAGE_SIZE = int(os.getenv('MAX_IMAGE_SIZE', 2048))  # Longest side SAM segments at
+    LAYOUT_MAX_IMAGE_SIZE = int(os.getenv('LAYOUT_MAX_IMAGE_SIZE', 2048))  # Longest side Pix2Struct sees (0 = full)
+    OCR_MAX_IMAGE_SIZE = int(os.getenv('OCR_MAX_IMAGE_SIZE', 0))  # Longest side OCR runs at (0 = full)
     MIN_SEGMENT_AREA = int(os.getenv('MIN_SEGMENT_AREA', 100))
+    MASK_ENCODING = os.getenv('MASK_ENCODING', 'rle')  # rle, bitmap, polygon or raw
+    PIPELINE_MODE = os.getenv('PIPELINE_MODE', 'concurrent')  # concurrent or sequential
+    PALETTE_MAX_PIXELS = int(os.getenv('PALETTE_MAX_PIXELS', 250000))  # Pixels sampled for the palette (0 = all)
+    TEXT_BOLD_STROKE_RATIO = float(os.getenv('TEXT_BOLD_STROKE_RATIO', 0.1))  # Stroke width / text height marking bold
+    
+    # Stub Backends Config (SAM_BACKEND / PIX2STRUCT_BACKEND / OCR_BACKEND = stub)
+    STUB_SAM_ENCODER_MS = float(os.getenv('STUB_SAM_ENCODER_MS', 150))  # Per image embedding (skipped on cache hits)
+    STUB_SAM_DECODER_MS = float(os.getenv('STUB_SAM_DECODER_MS', 100))  # Mask generation at the quality grid
+    STUB_SAM_SEGMENTS = int(os.getenv('STUB_SAM_SEGMENTS', 24))  # Masks per image
+    STUB_PIX2STRUCT_MS = float(os.getenv('STUB_PIX2STRUCT_MS', 300))  # Per image, greedy decoding
+    STUB_LAYOUT_ELEMENTS = int(os.getenv('STUB_LAYOUT_ELEMENTS', 8))  # Text elements per layout description
+    STUB_OCR_MS = float(os.getenv('STUB_OCR_MS', 80))  # Per image detection
+    STUB_OCR_REC_MS = float(os.getenv('STUB_OCR_REC_MS', 2))  # Per recognized line
+    STUB_OCR_MAX_LINES = int(os.getenv('STUB_OCR_MAX_LINES', 100))  # Text lines per image
+    
+    # Warmup Config
+    WARMUP_ENABLED = os.getenv('WARMUP_ENABLED', 'False').lower() == 'true'  # Load and exercise models at startup
+    WARMUP_SERVICES = [s.strip() for s in os.getenv('WARMUP_SERVICES', 'sam,pix2struct,ocr').split(',') if s.strip()]
+    
+    # Pre-fork Serving Config (gunicorn -c gunicorn.conf.py wsgi:app)
+    SERVER_WORKERS = int(os.getenv('SERVER_WORKERS', 2))  # Worker processes forked from the master
+    SERVER_THREADS = int(os.getenv('SERVER_THREADS', 4))  # Request threads per worker
+    SERVER_TIMEOUT = int(os.getenv('SERVER_TIMEOUT', 300))  # Seconds before a silent worker is restarted
+    SERVER_PRELOAD_SERVICES = [s.strip() for s in os.getenv('SERVER_PRELOAD_SERVICES', 'sam,pix2struct,ocr').split(',') if s.strip()]
+    TORCH_THREADS_PER_WORKER = int(os.getenv('TORCH_THREADS_PER_WORKER', 0))  # 0 = CPU cores / SERVER_WORKERS
+    
+    # Metrics Config
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'True').lower() == 'true'  # Serve /metrics (Prometheus text format)
+    METRICS_MULTIPROC_DIR = os.getenv('METRICS_MULTIPROC_DIR', '')  # Workers' metric snapshots (gunicorn uses a temp dir when empty)
+    METRICS_SYNC_INTERVAL = float(os.getenv('METRICS_SYNC_INTERVAL', 5))  # Seconds between a worker's snapshots
+    
+    # Profiling Config
+    PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', 'False').lower() == 'true'  # Honour X-Profile / ?profile=1
+    PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', 0.0))  # Fraction of requests profiled automatically
+    PROFILES_DIR = os.getenv('PROFILES_DIR', './profiles')
+    PROFILE_TOP_N = int(os.getenv('PROFILE_TOP_N', 20))  # Hotspots returned in the response
+    PROFILE_TORCH = os.getenv('PROFILE_TORCH', 'True').lower() == 'true'  # Also run the PyTorch profiler
+    
+    # Batch Processing Config
+    BATCH_SIZE = int(os.getenv('BATCH_SIZE', 4))  # Images per micro-batch
+    BATCH_MAX_SIZE = int(os.getenv('BATCH_MAX_SIZE', 16))  # Also the most images read from one zip archive
+    BATCH_ZIP_MAX_MEMBER_BYTES = int(os.getenv('BATCH_ZIP_MAX_MEMBER_BYTES', 32 * 1024 * 1024))  # Uncompressed, per image
+    BATCH_ZIP_MAX_TOTAL_BYTES = int(os.getenv('BATCH_ZIP_MAX_TOTAL_BYTES', 256 * 1024 * 1024))  # Uncompressed, per archive
+    BATCH_ZIP_MAX_RATIO = float(os.getenv('BATCH_ZIP_MAX_RATIO', 100))  # Uncompressed / compressed size of a member
+    
+    # Async Job Config
+    JOB_BACKEND = os.getenv('JOB_BACKEND', 'local')  # local or redis
+    JOB_WORKERS = int(os.getenv('JOB_WORKERS', 2))
+    JOB_MAX_QUEUE = int(os.getenv('JOB_MAX_QUEUE', 100))
+    JOB_RESULT_TTL = int(os.getenv('JOB_RESULT_TTL', 3600))  # Seconds finished jobs are kept
+    JOB_MAX_STORED = int(os.getenv('JOB_MAX_STORED', 1000))  # Job records the local backend keeps (oldest finished dropped)
+    JOB_CALLBACK_TIMEOUT = float(os.getenv('JOB_CALLBACK_TIMEOUT', 10))
+    # Hosts callbacks may target; when empty, any host resolving only to public addresses
+    JOB_CALLBACK_ALLOWED_HOSTS = [h.strip().lower() for h in os.getenv('JOB_CALLBACK_ALLOWED_HOSTS', '').split(',') if h.strip()]
+    REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
+    
+    # Result Cache Config
+    CACHE_ENABLED = os.getenv('CACHE_ENABLED', 'True').lower() == 'true'
+    CACHE_MAX_BYTES = int(os.getenv('CACHE_MAX_BYTES', 256 * 1024 * 1024))  # 256MB in memory
+    CACHE_DIR = os.getenv('CACHE_DIR', '')  # Optional on-disk tier, disabled when empty
     
     # Upload Config
-    UPLOAD_FOLDER = os.getenv('UPLOAD_FOLDER', './uploads')
     MAX_CONTENT_LENGTH = int(os.getenv('MAX_CONTENT_LENGTH', 16 * 1024 * 1024))  # 16MB
+    UPLOAD_SPILL_THRESHOLD = int(os.getenv('UPLOAD_SPILL_THRESHOLD', 8 * 1024 * 1024))  # Decode in memory below 8MB
     ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'webp', 'svg'}
     
     # CORS
@@ -42,7 +122,5 @@ class Config:
     def init_app():
         """Initialize application directories"""
         os.makedirs(Config.MODELS_DIR, exist_ok=True)
-        os.makedirs(Config.UPLOAD_FOLDER, exist_ok=True)
         print(f"🚀 Using device: {Config.DEVICE}")
         print(f"📁 Models directory: {Config.MODELS_DIR}")
-        print(f"📁 Upload directory: {Config.UPLOAD_FOLDER}")
@@ -1,34 +1,257 @@
-from flask import Blueprint, request, jsonify
-from werkzeug.utils import secure_filename
+from flask import Blueprint, Response, g, request, jsonify, stream_with_context
+from werkzeug.datastructures import FileStorage
+import json
 import os
+import threading
+import time
+import uuid
+import zipfile
 import cv2
 import numpy as np
+from io import BytesIO
 from ..config import Config
-from ..services.processor import ImageProcessor
-from ..utils.helpers import allowed_file, save_upload_file, load_image
+from ..services.processor import ImageProcessor, PIPELINE_MODES, STREAM_FORMATS
+from ..services.job_queue import JobManager, QueueFullError, validate_callback_url
+from ..services.ocr_service import validate_ocr_mode
+from ..services.pix2struct_service import validate_decoding_profile
+from ..services.registry import registry
+from ..services.sam_service import UnknownImageError, validate_sam_profile
+from ..services.warmup import warmup
+from ..utils.helpers import (
+    allowed_file, decode_upload, get_file_extension, get_memory_breakdown, get_rss_bytes,
+    iter_batch_uploads, zip_image_members
+)
+from ..utils.image_context import ImageContext
+from ..utils.mask_encoding import validate_mask_encoding
+from ..utils.profiling import (
+    PROFILE_TRIGGER_HEADER, PROFILE_TRIGGER_PARAM, RequestProfiler, safe_request_id, should_profile
+)
+from ..utils.metrics import (
+    CACHE_LOOKUPS, MEMORY_BREAKDOWN, MODEL_LOAD_SECONDS, QUEUE_DEPTH, REQUEST_LATENCY, REQUESTS,
+    REQUESTS_IN_FLIGHT, RESIDENT_MEMORY, STAGE_LATENCY
+)
 
 bp = Blueprint('image', __name__, url_prefix='/api/image')
 
 # Initialize processor (singleton)
 processor = None
+job_manager = None
+_singleton_lock = threading.Lock()
 
 
 def get_processor():
-    """Get or create processor instance"""
+    """Get or create processor instance (models load lazily per service)"""
     global processor
     if processor is None:
-        processor = ImageProcessor()
+        with _singleton_lock:
+            if processor is None:
+                processor = ImageProcessor()
     return processor
 
 
+def get_job_manager():
+    """Get or create the async job manager"""
+    global job_manager
+    if job_manager is None:
+        with _singleton_lock:
+            if job_manager is None:
+                job_manager = JobManager(get_processor)
+    return job_manager
+
+
+@bp.before_request
+def start_request_metrics():
+    """Count the request as in flight and start its latency clock"""
+    g.metrics_endpoint = request.url_rule.rule if request.url_rule else request.path
+    g.metrics_start = time.perf_counter()
+    REQUESTS_IN_FLIGHT.inc(endpoint=g.metrics_endpoint)
+
+
+@bp.after_request
+def record_request_metrics(response):
+    """
+    Record status and latency (to the first byte for streamed responses)
+    
+    The request leaves the in-flight gauge when the server closes the
+    response, so streamed bodies count as in flight until fully sent.
+    """
+    endpoint = g.metrics_endpoint
+    REQUESTS.inc(endpoint=endpoint, method=request.method, status=str(response.status_code))
+    REQUEST_LATENCY.observe(time.perf_counter() - g.metrics_start, endpoint=endpoint)
+    response.call_on_close(lambda: REQUESTS_IN_FLIGHT.dec(endpoint=endpoint))
+    return response
+
+
+@bp.before_request
+def start_profiling():
+    """
+    Profile the request when asked to (X-Profile header or ?profile=) or sampled
+    
+    Requests arriving while another is profiled are served unprofiled.
+    """
+    requested = request.headers.get(PROFILE_TRIGGER_HEADER) or request.args.get(PROFILE_TRIGGER_PARAM)
+    if should_profile(requested):
+        request_id = safe_request_id(request.headers.get('X-Request-ID')) or uuid.uuid4().hex
+        profiler = RequestProfiler(request_id)
+        if profiler.start():
+            g.profiler = profiler
+
+
+@bp.after_request
+def finish_profiling(response):
+    """
+    Save the request's profile and report it
+    
+    JSON responses get the hotspot summary under 'profile'. Streamed
+    responses are profiled until fully sent, so only the X-Profile-Id
+    header points at the saved summary.
+    """
+    profiler = g.pop('profiler', None)
+    if profiler is None:
+        return response
+    
+    response.headers['X-Profile-Id'] = profiler.request_id
+    if response.is_streamed:
+        response.call_on_close(profiler.stop)
+        return response
+    
+    summary = profiler.stop()
+    body = response.get_json(silent=True)
+    if isinstance(body, dict):
+        body['profile'] = summary
+        response.set_data(json.dumps(body))
+    return response
+
+
+def _model_load_seconds():
+    return {
+        (name,): stats['load_time']
+        for name, stats in registry.stats().items() if stats['loaded']
+    }
+
+
+def _queue_depths():
+    depths = {}
+    if job_manager is not None:
+        depths[('jobs',)] = job_manager.stats()['queue_depth']
+    if registry.is_loaded('ocr') and registry.get('ocr').pool is not None:
+        depths[('ocr_pool',)] = registry.get('ocr').pool.stats()['queue_depth']
+    return depths
+
+
+def _cache_lookups():
+    if processor is None or processor.cache is None:
+        return {}
+    stats = processor.cache.stats()
+    return {('hit',): stats['hits'], ('miss',): stats['misses']}
+
+
+def _memory_breakdown():
+    memory = get_memory_breakdown()
+    if memory is None:
+        return {}
+    return {('pss',): memory['pss_bytes'], ('uss',): memory['uss_bytes'], ('shared',): memory['shared_bytes']}
+
+
+# Read at scrape time from the existing stats, never loading a model
+RESIDENT_MEMORY.set_function(get_rss_bytes)
+MEMORY_BREAKDOWN.set_function(_memory_breakdown)
+MODEL_LOAD_SECONDS.set_function(_model_load_seconds)
+QUEUE_DEPTH.set_function(_queue_depths)
+CACHE_LOOKUPS.set_function(_cache_lookups)
+
+
+def get_request_option(name: str, default=None):
+    """Read an option from the form (or JSON) body or the query string"""
+    if request.is_json:
+        value = (request.get_json(silent=True) or {}).get(name)
+    else:
+        value = request.form.get(name)
+    return value or request.args.get(name) or default
+
+
+def get_stream_format():
+    """
+    Requested streaming format for /process, or None for a single JSON body
+    
+    Taken from the 'stream' option, else from an Accept header asking for
+    text/event-stream (sse) or application/x-ndjson (ndjson).
+    """
+    stream_format = get_request_option('stream')
+    if stream_format is None:
+        accepted = request.accept_mimetypes.best_match(['application/json', 'application/x-ndjson', 'text/event-stream'])
+        stream_format = {'application/x-ndjson': 'ndjson', 'text/event-stream': 'sse'}.get(accepted)
+    if stream_format is None:
+        return None
+    
+    stream_format = stream_format.lower()
+    if stream_format not in STREAM_FORMATS:
+        raise ValueError(f"Unknown stream format: {stream_format}. Allowed: {STREAM_FORMATS}")
+    return stream_format
+
+
+def stream_events(events, stream_format: str) -> Response:
+    """Serialize pipeline events one at a time as NDJSON lines or SSE messages"""
+    def generate():
+        serialization = 0.0
+        try:
+            for event in events:
+                start = time.perf_counter()
+                if stream_format == 'sse':
+                    chunk = f"event: {event['event']}\ndata: {json.dumps(event)}\n\n"
+                else:
+                    chunk = json.dumps(event) + '\n'
+                serialization += time.perf_counter() - start
+                yield chunk
+            STAGE_LATENCY.observe(serialization, stage='serialization')
+        except Exception as e:
+            print(f"❌ Error streaming image: {str(e)}")
+            event = {'event': 'error', 'error': str(e)}
+            if stream_format == 'sse':
+                yield f"event: error\ndata: {json.dumps(event)}\n\n"
+            else:
+                yield json.dumps(event) + '\n'
+    
+    mimetype = 'text/event-stream' if stream_format == 'sse' else 'application/x-ndjson'
+    return Response(
+        stream_with_context(generate()),
+        mimetype=mimetype,
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
+def get_request_json_option(name: str, default=None):
+    """Read a structured option from a JSON body or a JSON-encoded form field"""
+    if request.is_json:
+        value = (request.get_json(silent=True) or {}).get(name)
+        return default if value is None else value
+    
+    value = get_request_option(name)
+    if value is None:
+        return default
+    
+    try:
+        return json.loads(value)
+    except json.JSONDecodeError:
+        raise ValueError(f"Option '{name}' must be valid JSON")
+
+
 @bp.route('/process', methods=['POST'])
 def process_image():
     """
     Process uploaded image with SAM + Pix2Struct + OCR
     
     Expected: multipart/form-data with 'image' file
+    Optional: 'mask_encoding' (rle, bitmap, polygon or raw)
+    Optional: 'pipeline_mode' (concurrent or sequential)
+    Optional: 'sam_profile' (fast, balanced or quality)
+    Optional: 'decoding_profile' (beam, small_beam, greedy or budget)
+    Optional: 'ocr_mode' (full or segments)
+    Optional: 'stream' (ndjson or sse; also chosen by an Accept header of
+              application/x-ndjson or text/event-stream)
     
-    Returns: JSON with editable layers
+    Returns: JSON with editable layers, or a stream of stage events
+             (start, palette, ocr, layout, segmentation, layer..., done)
     """
     try:
         # Validate request
@@ -43,11 +266,25 @@ def process_image():
         if not allowed_file(file.filename):
             return jsonify({'error': f'Invalid file type. Allowed: {Config.ALLOWED_EXTENSIONS}'}), 400
         
-        # Save file
-        filepath = save_upload_file(file)
+        try:
+            mask_encoding = validate_mask_encoding(get_request_option('mask_encoding'))
+            sam_profile = validate_sam_profile(get_request_option('sam_profile'))
+            decoding_profile = validate_decoding_profile(get_request_option('decoding_profile'))
+            ocr_mode = validate_ocr_mode(get_request_option('ocr_mode'))
+            stream_format = get_stream_format()
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
-        # Load image
-        image = load_image(filepath)
+        pipeline_mode = get_request_option('pipeline_mode', Config.PIPELINE_MODE).lower()
+        if pipeline_mode not in PIPELINE_MODES:
+            return jsonify({'error': f'Invalid pipeline mode. Allowed: {PIPELINE_MODES}'}), 400
+        
+        # cProfile only sees this thread, so keep every stage in it
+        if 'profiler' in g:
+            pipeline_mode = 'sequential'
+        
+        # Decode upload in memory
+        image = decode_upload(file)
         
         if image is None:
             return jsonify({'error': 'Failed to load image'}), 500
@@ -55,51 +292,302 @@ def process_image():
         # Process image
         print(f"📸 Processing image: {file.filename}")
         proc = get_processor()
-        result = proc.process_image(image)
         
-        # Clean up
+        if stream_format:
+            return stream_events(
+                proc.process_image_stream(
+                    image,
+                    mask_encoding=mask_encoding,
+                    pipeline_mode=pipeline_mode,
+                    sam_profile=sam_profile,
+                    decoding_profile=decoding_profile,
+                    ocr_mode=ocr_mode
+                ),
+                stream_format
+            )
+        
+        result = proc.process_image(
+            image,
+            mask_encoding=mask_encoding,
+            pipeline_mode=pipeline_mode,
+            sam_profile=sam_profile,
+            decoding_profile=decoding_profile,
+            ocr_mode=ocr_mode
+        )
+        
+        with STAGE_LATENCY.time(stage='serialization'):
+            response = jsonify({
+                'success': True,
+                'data': result
+            })
+        return response, 200
+    
+    except Exception as e:
+        print(f"❌ Error processing image: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/process/batch', methods=['POST'])
+def process_batch():
+    """
+    Process many images with micro-batched SAM, Pix2Struct and OCR calls
+    
+    Expected: multipart/form-data with one or more 'images' files
+              (zip archives of images are expanded)
+    Optional: 'mask_encoding' (rle, bitmap, polygon or raw)
+    Optional: 'sam_profile' (fast, balanced or quality)
+    Optional: 'decoding_profile' (beam, small_beam, greedy or budget)
+    Optional: 'ocr_mode' (full or segments)
+    Optional: 'batch_size' (1 to Config.BATCH_MAX_SIZE)
+    
+    Returns: NDJSON stream with one line per image as it finishes,
+             followed by a summary line
+    """
+    try:
+        files = request.files.getlist('images') + request.files.getlist('image')
+        files = [file for file in files if file.filename]
+        
+        if not files:
+            return jsonify({'error': 'No image files provided'}), 400
+        
+        for file in files:
+            if get_file_extension(file.filename) != 'zip' and not allowed_file(file.filename):
+                return jsonify({'error': f'Invalid file type: {file.filename}. Allowed: {Config.ALLOWED_EXTENSIONS} or zip'}), 400
+        
         try:
-            os.remove(filepath)
-        except:
-            pass
+            mask_encoding = validate_mask_encoding(get_request_option('mask_encoding'))
+            sam_profile = validate_sam_profile(get_request_option('sam_profile'))
+            decoding_profile = validate_decoding_profile(get_request_option('decoding_profile'))
+            ocr_mode = validate_ocr_mode(get_request_option('ocr_mode'))
+            batch_size = int(get_request_option('batch_size', Config.BATCH_SIZE))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        if not 1 <= batch_size <= Config.BATCH_MAX_SIZE:
+            return jsonify({'error': f'batch_size must be between 1 and {Config.BATCH_MAX_SIZE}'}), 400
+        
+        # Zip limits only need the central directory, so oversized archives
+        # fail before the stream starts
+        for file in files:
+            if get_file_extension(file.filename) == 'zip':
+                try:
+                    with zipfile.ZipFile(file.stream) as archive:
+                        zip_image_members(archive)
+                except zipfile.BadZipFile:
+                    pass
+                except ValueError as e:
+                    return jsonify({'error': f'{file.filename}: {str(e)}'}), 400
+        
+        # Flask closes request.files when the view returns, before the body
+        # is generated, so take over the upload streams (spooled to disk by
+        # the form parser) and decode them lazily, one micro-batch at a time
+        uploads = [FileStorage(file.stream, file.filename) for file in files]
+        for file in files:
+            file.stream = BytesIO()
+        proc = get_processor()
+    
+    except Exception as e:
+        print(f"❌ Error starting batch: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+    
+    def run_batch(batch):
+        """Yield one NDJSON line per entry of a micro-batch"""
+        valid = []
+        for index, filename, image in batch:
+            if image is None:
+                yield {'index': index, 'filename': filename, 'success': False,
+                       'error': 'Failed to load image'}
+            else:
+                valid.append((index, filename, image))
+        
+        if not valid:
+            return
+        
+        pending = {position: entry for position, entry in enumerate(valid)}
+        try:
+            for position, result in proc.process_batch([image for _, _, image in valid],
+                                                       mask_encoding=mask_encoding,
+                                                       sam_profile=sam_profile,
+                                                       decoding_profile=decoding_profile,
+                                                       ocr_mode=ocr_mode):
+                index, filename, _ = pending.pop(position)
+                yield {'index': index, 'filename': filename, 'success': True, 'data': result}
+        except Exception as e:
+            print(f"❌ Error processing batch: {str(e)}")
+            for index, filename, _ in pending.values():
+                yield {'index': index, 'filename': filename, 'success': False, 'error': str(e)}
+    
+    def generate():
+        start = time.perf_counter()
+        counts = {'count': 0, 'failed': 0}
+        batch = []
+        
+        def emit(lines):
+            for line in lines:
+                counts['count'] += 1
+                counts['failed'] += 0 if line['success'] else 1
+                with STAGE_LATENCY.time(stage='serialization'):
+                    chunk = json.dumps(line) + '\n'
+                yield chunk
+        
+        try:
+            for index, (filename, image) in enumerate(iter_batch_uploads(uploads)):
+                batch.append((index, filename, image))
+                if len(batch) == batch_size:
+                    yield from emit(run_batch(batch))
+                    batch = []
+            
+            if batch:
+                yield from emit(run_batch(batch))
+        finally:
+            for upload in uploads:
+                upload.close()
+        
+        elapsed = time.perf_counter() - start
+        processed = counts['count'] - counts['failed']
+        yield json.dumps({
+            'done': True,
+            'count': counts['count'],
+            'failed': counts['failed'],
+            'batch_size': batch_size,
+            'elapsed_ms': round(elapsed * 1000, 2),
+            'images_per_sec': round(processed / elapsed, 3) if elapsed > 0 else 0.0
+        }) + '\n'
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+
+@bp.route('/jobs', methods=['POST'])
+def submit_job():
+    """
+    Queue an image for asynchronous processing
+    
+    Expected: multipart/form-data with 'image' file
+    Optional: 'mask_encoding', 'pipeline_mode', 'sam_profile', 'decoding_profile',
+              'ocr_mode' (as for /process)
+    Optional: 'callback_url' (receives the finished job as a JSON POST)
+    
+    Returns: 202 with the job id; poll /api/image/jobs/<id> for the result
+    """
+    try:
+        if 'image' not in request.files:
+            return jsonify({'error': 'No image file provided'}), 400
+        
+        file = request.files['image']
+        
+        if file.filename == '':
+            return jsonify({'error': 'Empty filename'}), 400
+        
+        if not allowed_file(file.filename):
+            return jsonify({'error': f'Invalid file type. Allowed: {Config.ALLOWED_EXTENSIONS}'}), 400
+        
+        try:
+            mask_encoding = validate_mask_encoding(get_request_option('mask_encoding'))
+            sam_profile = validate_sam_profile(get_request_option('sam_profile'))
+            decoding_profile = validate_decoding_profile(get_request_option('decoding_profile'))
+            ocr_mode = validate_ocr_mode(get_request_option('ocr_mode'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        pipeline_mode = get_request_option('pipeline_mode', Config.PIPELINE_MODE).lower()
+        if pipeline_mode not in PIPELINE_MODES:
+            return jsonify({'error': f'Invalid pipeline mode. Allowed: {PIPELINE_MODES}'}), 400
+        
+        callback_url = get_request_option('callback_url')
+        if callback_url:
+            try:
+                validate_callback_url(callback_url)
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+        
+        image = decode_upload(file)
+        
+        if image is None:
+            return jsonify({'error': 'Failed to load image'}), 500
+        
+        try:
+            job = get_job_manager().submit(
+                image,
+                options={
+                    'mask_encoding': mask_encoding,
+                    'pipeline_mode': pipeline_mode,
+                    'sam_profile': sam_profile,
+                    'decoding_profile': decoding_profile,
+                    'ocr_mode': ocr_mode
+                },
+                callback_url=callback_url
+            )
+        except QueueFullError as e:
+            return jsonify({'error': str(e)}), 503
         
         return jsonify({
             'success': True,
-            'data': result
-        }), 200
+            'job_id': job['id'],
+            'status': job['status'],
+            'status_url': f"{bp.url_prefix}/jobs/{job['id']}"
+        }), 202
     
     except Exception as e:
-        print(f"❌ Error processing image: {str(e)}")
+        print(f"❌ Error submitting job: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
 
+@bp.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """
+    Poll an asynchronous job
+    
+    Returns: Job status, timings and (when completed) the processing result
+    """
+    job = get_job_manager().get(job_id)
+    
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    return jsonify({
+        'success': True,
+        'job': job
+    }), 200
+
+
+@bp.route('/jobs', methods=['GET'])
+def job_stats():
+    """Queue depth, running jobs and wait/run time summaries"""
+    return jsonify({
+        'success': True,
+        'jobs': get_job_manager().stats()
+    }), 200
+
+
 @bp.route('/segment', methods=['POST'])
 def segment_only():
     """
     Perform only SAM segmentation
     
+    Optional: 'mask_encoding' (rle, bitmap, polygon or raw)
+    Optional: 'sam_profile' (fast, balanced or quality)
+    
     Returns: Segments with masks and bounding boxes
     """
     try:
         if 'image' not in request.files:
             return jsonify({'error': 'No image file provided'}), 400
         
+        try:
+            mask_encoding = validate_mask_encoding(get_request_option('mask_encoding'))
+            sam_profile = validate_sam_profile(get_request_option('sam_profile'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
         file = request.files['image']
-        filepath = save_upload_file(file)
-        image = load_image(filepath)
+        image = decode_upload(file)
         
         if image is None:
             return jsonify({'error': 'Failed to load image'}), 500
         
         # Get processor and run SAM only
         proc = get_processor()
-        segments = proc.sam_service.segment_image(image)
-        
-        # Clean up
-        try:
-            os.remove(filepath)
-        except:
-            pass
+        segments = proc.segment_image(ImageContext(image), mask_encoding=mask_encoding, sam_profile=sam_profile)
         
         return jsonify({
             'success': True,
@@ -112,6 +600,65 @@ def segment_only():
         return jsonify({'error': str(e)}), 500
 
 
+@bp.route('/segment/prompt', methods=['POST'])
+def segment_prompt():
+    """
+    Interactive SAM segmentation from point and/or box prompts
+    
+    Expected: either multipart/form-data with an 'image' file (first call),
+              or an 'image_id' returned by a previous call (form or JSON body)
+    Prompts: 'points' [[x, y], ...] with 'labels' [1, 0, ...] and/or
+             'box' [x0, y0, x1, y1], in original image pixels (JSON-encoded
+             when sent as form fields)
+    Optional: 'mask_encoding' (rle, bitmap, polygon or raw)
+    
+    Returns: Best mask, scores, image_id for follow-up calls and timings
+    """
+    try:
+        try:
+            points = get_request_json_option('points')
+            labels = get_request_json_option('labels')
+            box = get_request_json_option('box')
+            mask_encoding = validate_mask_encoding(get_request_option('mask_encoding'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        image = None
+        image_id = get_request_option('image_id')
+        
+        if 'image' in request.files:
+            image = decode_upload(request.files['image'])
+            
+            if image is None:
+                return jsonify({'error': 'Failed to load image'}), 500
+        elif not image_id:
+            return jsonify({'error': 'Provide an image file or an image_id'}), 400
+        
+        proc = get_processor()
+        try:
+            result = proc.sam_service.segment_with_prompts(
+                image=image,
+                image_id=image_id,
+                points=points,
+                labels=labels,
+                box=box,
+                mask_encoding=mask_encoding
+            )
+        except UnknownImageError as e:
+            return jsonify({'error': f'{str(e)}; upload the image again'}), 404
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        return jsonify({
+            'success': True,
+            **result
+        }), 200
+    
+    except Exception as e:
+        print(f"❌ Error in prompt segmentation: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+
 @bp.route('/ocr', methods=['POST'])
 def ocr_only():
     """
@@ -124,21 +671,14 @@ def ocr_only():
             return jsonify({'error': 'No image file provided'}), 400
         
         file = request.files['image']
-        filepath = save_upload_file(file)
-        image = load_image(filepath)
+        image = decode_upload(file)
         
         if image is None:
             return jsonify({'error': 'Failed to load image'}), 500
         
         # Get processor and run OCR only
         proc = get_processor()
-        text_elements = proc.ocr_service.extract_text(image)
-        
-        # Clean up
-        try:
-            os.remove(filepath)
-        except:
-            pass
+        text_elements = proc.extract_text(ImageContext(image))
         
         return jsonify({
             'success': True,
@@ -156,28 +696,28 @@ def analyze_layout():
     """
     Perform only Pix2Struct layout analysis
     
+    Optional: 'decoding_profile' (beam, small_beam, greedy or budget)
+    
     Returns: Layout structure
     """
     try:
         if 'image' not in request.files:
             return jsonify({'error': 'No image file provided'}), 400
         
+        try:
+            decoding_profile = validate_decoding_profile(get_request_option('decoding_profile'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
         file = request.files['image']
-        filepath = save_upload_file(file)
-        image = load_image(filepath)
+        image = decode_upload(file)
         
         if image is None:
             return jsonify({'error': 'Failed to load image'}), 500
         
         # Get processor and run Pix2Struct only
         proc = get_processor()
-        layout = proc.pix2struct_service.analyze_layout(image)
-        
-        # Clean up
-        try:
-            os.remove(filepath)
-        except:
-            pass
+        layout = proc.analyze_layout(ImageContext(image), decoding_profile=decoding_profile)
         
         return jsonify({
             'success': True,
@@ -201,21 +741,14 @@ def extract_colors():
             return jsonify({'error': 'No image file provided'}), 400
         
         file = request.files['image']
-        filepath = save_upload_file(file)
-        image = load_image(filepath)
+        image = decode_upload(file)
         
         if image is None:
             return jsonify({'error': 'Failed to load image'}), 500
         
         # Get processor and extract colors
         proc = get_processor()
-        colors = proc._extract_color_palette(image)
-        
-        # Clean up
-        try:
-            os.remove(filepath)
-        except:
-            pass
+        colors = proc.extract_colors(ImageContext(image))
         
         return jsonify({
             'success': True,
@@ -230,9 +763,50 @@ def extract_colors():
 @bp.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
+    cache_stats = None
+    embedding_cache_stats = None
+    ocr_pool_stats = None
+    if processor is not None and processor.cache is not None:
+        cache_stats = processor.cache.stats()
+    
+    # Only report on models that are already loaded; never trigger a load here
+    if registry.is_loaded('sam'):
+        embedding_cache_stats = registry.get('sam').embedding_cache.stats()
+    if registry.is_loaded('ocr') and registry.get('ocr').pool is not None:
+        ocr_pool_stats = registry.get('ocr').pool.stats()
+    
     return jsonify({
         'status': 'healthy',
         'service': 'PixMorph AI Service',
         'device': Config.DEVICE,
-        'ocr_backend': Config.OCR_BACKEND
+        'ocr_backend': Config.OCR_BACKEND,
+        'services': registry.stats(),
+        'warmup': warmup.state(),
+        'pid': os.getpid(),
+        'rss_bytes': get_rss_bytes(),
+        'memory': get_memory_breakdown(),
+        'cache': cache_stats,
+        'sam_embedding_cache': embedding_cache_stats,
+        'ocr_pool': ocr_pool_stats
     }), 200
+
+
+@bp.route('/health/live', methods=['GET'])
+def liveness():
+    """Liveness probe: the process is up and serving requests"""
+    return jsonify({'status': 'alive'}), 200
+
+
+@bp.route('/health/ready', methods=['GET'])
+def readiness():
+    """
+    Readiness probe
+    
+    Returns 200 once startup warmup has finished (or immediately when
+    WARMUP_ENABLED is off) and 503 while warming up or after a failed warmup.
+    """
+    ready = warmup.is_ready()
+    return jsonify({
+        'status': 'ready' if ready else 'not_ready',
+        'warmup': warmup.state()
+    }), 200 if ready else 503
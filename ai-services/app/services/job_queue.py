@@ -0,0 +1,427 @@
+import abc
+import ipaddress
+import json
+import queue
+import socket
+import threading
+import time
+import urllib.parse
+import urllib.request
+import uuid
+from collections import deque
+from io import BytesIO
+from typing import Any, Callable, Dict, Optional
+import numpy as np
+from ..config import Config
+
+
+class QueueFullError(Exception):
+    """Raised when the job queue is at capacity"""
+
+
+def validate_callback_url(url: str) -> str:
+    """
+    Check that a job callback URL may receive results
+    
+    The URL must be http(s). Its host must either be listed in
+    Config.JOB_CALLBACK_ALLOWED_HOSTS, or, when that list is empty, resolve
+    only to public addresses (no loopback, private, link-local, multicast
+    or reserved ranges), so submitters cannot make the service POST
+    results into its own network.
+    
+    Args:
+        url: Callback URL
+    
+    Returns:
+        The URL unchanged
+    
+    Raises:
+        ValueError: If the URL is not allowed
+    """
+    parsed = urllib.parse.urlsplit(url)
+    if parsed.scheme not in ('http', 'https') or not parsed.hostname:
+        raise ValueError("callback_url must be an http(s) URL")
+    
+    host = parsed.hostname.lower()
+    if Config.JOB_CALLBACK_ALLOWED_HOSTS:
+        if host not in Config.JOB_CALLBACK_ALLOWED_HOSTS:
+            raise ValueError(f"callback_url host {host} is not allowed")
+        return url
+    
+    try:
+        infos = socket.getaddrinfo(host, parsed.port or (443 if parsed.scheme == 'https' else 80),
+                                   type=socket.SOCK_STREAM)
+    except (socket.gaierror, ValueError):
+        raise ValueError(f"callback_url host {host} does not resolve")
+    
+    for info in infos:
+        address = ipaddress.ip_address(info[4][0].split('%')[0])
+        if address.version == 6 and address.ipv4_mapped is not None:
+            address = address.ipv4_mapped
+        if not address.is_global or address.is_multicast:
+            raise ValueError(f"callback_url host {host} resolves to a non-public address")
+    return url
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    """Fail on redirects instead of following them past validate_callback_url"""
+    
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+
+_callback_opener = urllib.request.build_opener(_NoRedirect)
+
+
+class QueueBackend(abc.ABC):
+    """
+    Storage and queue interface for jobs
+    
+    Backends hold job records (plain dicts), job payloads and a FIFO of
+    pending job ids. Register new backends in JOB_BACKENDS; a backend
+    missing any abstract method fails when it is instantiated.
+    """
+    
+    @abc.abstractmethod
+    def push(self, job_id: str):
+        """Append a job id to the pending FIFO"""
+    
+    @abc.abstractmethod
+    def pop(self, timeout: float) -> Optional[str]:
+        """Next pending job id, or None after timeout seconds"""
+    
+    @abc.abstractmethod
+    def depth(self) -> int:
+        """Number of pending job ids"""
+    
+    @abc.abstractmethod
+    def save_job(self, job: Dict):
+        """Store (or replace) a job record"""
+    
+    @abc.abstractmethod
+    def load_job(self, job_id: str) -> Optional[Dict]:
+        """Job record by id, or None when unknown or expired"""
+    
+    @abc.abstractmethod
+    def save_payload(self, job_id: str, payload: Any):
+        """Store a job's input until a worker takes it"""
+    
+    @abc.abstractmethod
+    def pop_payload(self, job_id: str) -> Any:
+        """Remove and return a job's input"""
+    
+    def expire(self, max_age: float):
+        """Drop finished jobs older than max_age seconds"""
+
+
+class LocalQueueBackend(QueueBackend):
+    """
+    In-process backend (jobs are lost on restart)
+    
+    Besides the JOB_RESULT_TTL expiry, at most max_jobs job records are
+    kept: saving a new job beyond that drops the oldest finished ones.
+    """
+    
+    def __init__(self, max_jobs: Optional[int] = None):
+        """
+        Args:
+            max_jobs: Job records kept (defaults to Config.JOB_MAX_STORED)
+        """
+        self.max_jobs = max_jobs or Config.JOB_MAX_STORED
+        self._queue = queue.Queue()
+        self._jobs = {}
+        self._payloads = {}
+        self._lock = threading.Lock()
+    
+    def push(self, job_id: str):
+        self._queue.put(job_id)
+    
+    def pop(self, timeout: float) -> Optional[str]:
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+    
+    def depth(self) -> int:
+        return self._queue.qsize()
+    
+    def save_job(self, job: Dict):
+        with self._lock:
+            is_new = job['id'] not in self._jobs
+            self._jobs[job['id']] = dict(job)
+            if is_new and len(self._jobs) > self.max_jobs:
+                self._evict(len(self._jobs) - self.max_jobs)
+    
+    def _evict(self, count: int):
+        """Drop up to count finished jobs, oldest first (dicts keep insertion order)"""
+        finished = [job_id for job_id, job in self._jobs.items() if job['finished_at'] is not None]
+        for job_id in finished[:count]:
+            del self._jobs[job_id]
+    
+    def load_job(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+    
+    def save_payload(self, job_id: str, payload: Any):
+        with self._lock:
+            self._payloads[job_id] = payload
+    
+    def pop_payload(self, job_id: str) -> Any:
+        with self._lock:
+            return self._payloads.pop(job_id, None)
+    
+    def expire(self, max_age: float):
+        cutoff = time.time() - max_age
+        with self._lock:
+            expired = [
+                job_id for job_id, job in self._jobs.items()
+                if job['finished_at'] is not None and job['finished_at'] < cutoff
+            ]
+            for job_id in expired:
+                del self._jobs[job_id]
+
+
+class RedisQueueBackend(QueueBackend):
+    """
+    Backend for Redis or any client exposing the same list/string commands
+    (lpush, brpop, llen, set, get, getdel/delete)
+    
+    Job records are stored as JSON and image payloads in the .npy format
+    loaded with allow_pickle=False, so nothing read back from Redis can
+    execute code in the server.
+    """
+    
+    def __init__(self, client=None, prefix: str = 'pixmorph:jobs'):
+        if client is None:
+            import redis
+            client = redis.Redis.from_url(Config.REDIS_URL)
+        
+        self.client = client
+        self.prefix = prefix
+    
+    def _key(self, *parts: str) -> str:
+        return ':'.join((self.prefix,) + parts)
+    
+    def push(self, job_id: str):
+        self.client.lpush(self._key('queue'), job_id)
+    
+    def pop(self, timeout: float) -> Optional[str]:
+        item = self.client.brpop(self._key('queue'), timeout=max(1, int(timeout)))
+        if item is None:
+            return None
+        job_id = item[1]
+        return job_id.decode('utf-8') if isinstance(job_id, bytes) else job_id
+    
+    def depth(self) -> int:
+        return int(self.client.llen(self._key('queue')))
+    
+    def save_job(self, job: Dict):
+        self.client.set(self._key('job', job['id']), json.dumps(job), ex=Config.JOB_RESULT_TTL)
+    
+    def load_job(self, job_id: str) -> Optional[Dict]:
+        data = self.client.get(self._key('job', job_id))
+        return json.loads(data) if data is not None else None
+    
+    def save_payload(self, job_id: str, payload: np.ndarray):
+        buffer = BytesIO()
+        np.save(buffer, np.asarray(payload), allow_pickle=False)
+        self.client.set(self._key('payload', job_id), buffer.getvalue(), ex=Config.JOB_RESULT_TTL)
+    
+    def pop_payload(self, job_id: str) -> Optional[np.ndarray]:
+        key = self._key('payload', job_id)
+        data = self.client.get(key)
+        self.client.delete(key)
+        return np.load(BytesIO(data), allow_pickle=False) if data is not None else None
+
+
+JOB_BACKENDS = {
+    'local': LocalQueueBackend,
+    'redis': RedisQueueBackend
+}
+
+
+class JobManager:
+    """Bounded worker pool executing ImageProcessor.process_image asynchronously"""
+    
+    def __init__(self, processor_factory: Callable, backend: Optional[QueueBackend] = None,
+                 num_workers: Optional[int] = None, max_queue: Optional[int] = None):
+        """
+        Args:
+            processor_factory: Zero-argument callable returning the ImageProcessor
+            backend: Queue backend (defaults to Config.JOB_BACKEND)
+            num_workers: Worker threads (defaults to Config.JOB_WORKERS)
+            max_queue: Maximum queued jobs before submit is rejected
+        """
+        if backend is None:
+            if Config.JOB_BACKEND not in JOB_BACKENDS:
+                raise ValueError(f"Unknown job backend: {Config.JOB_BACKEND}")
+            backend = JOB_BACKENDS[Config.JOB_BACKEND]()
+        
+        self.processor_factory = processor_factory
+        self.backend = backend
+        self.num_workers = num_workers or Config.JOB_WORKERS
+        self.max_queue = max_queue or Config.JOB_MAX_QUEUE
+        
+        self._lock = threading.Lock()
+        self._running = 0
+        self._counters = {'submitted': 0, 'completed': 0, 'failed': 0, 'rejected': 0}
+        self._wait_times = deque(maxlen=200)
+        self._run_times = deque(maxlen=200)
+        
+        self._workers = []
+        for idx in range(self.num_workers):
+            worker = threading.Thread(target=self._worker_loop, name=f'job-worker-{idx}', daemon=True)
+            worker.start()
+            self._workers.append(worker)
+        
+        print(f"✅ Job queue started ({Config.JOB_BACKEND}, {self.num_workers} workers)")
+    
+    def submit(self, image, options: Optional[Dict] = None,
+               callback_url: Optional[str] = None) -> Dict:
+        """
+        Queue an image for processing
+        
+        Args:
+            image: Input image as numpy array (RGB)
+            options: Keyword arguments for ImageProcessor.process_image
+            callback_url: Optional URL that receives the finished job as a JSON POST
+        
+        Returns:
+            Job record
+        """
+        if self.backend.depth() >= self.max_queue:
+            with self._lock:
+                self._counters['rejected'] += 1
+            raise QueueFullError(f"Job queue is full ({self.max_queue} jobs)")
+        
+        job = {
+            'id': uuid.uuid4().hex,
+            'status': 'queued',
+            'options': options or {},
+            'callback_url': callback_url,
+            'created_at': time.time(),
+            'started_at': None,
+            'finished_at': None,
+            'wait_time': None,
+            'run_time': None,
+            'result': None,
+            'error': None
+        }
+        
+        self.backend.save_payload(job['id'], image)
+        self.backend.save_job(job)
+        self.backend.push(job['id'])
+        
+        with self._lock:
+            self._counters['submitted'] += 1
+        
+        return job
+    
+    def get(self, job_id: str) -> Optional[Dict]:
+        """Look up a job record by id"""
+        return self.backend.load_job(job_id)
+    
+    def stats(self) -> Dict:
+        """Queue depth, worker utilisation and wait/run time summaries"""
+        with self._lock:
+            stats = dict(self._counters)
+            stats['running'] = self._running
+            wait_times = list(self._wait_times)
+            run_times = list(self._run_times)
+        
+        stats['queue_depth'] = self.backend.depth()
+        stats['max_queue'] = self.max_queue
+        stats['workers'] = self.num_workers
+        stats['wait_time'] = _summarize(wait_times)
+        stats['run_time'] = _summarize(run_times)
+        return stats
+    
+    def _worker_loop(self):
+        while True:
+            job_id = self.backend.pop(timeout=1.0)
+            
+            if job_id is not None:
+                try:
+                    self._run_job(job_id)
+                except Exception as e:
+                    print(f"❌ Job worker error for {job_id}: {str(e)}")
+            
+            # After every job as well as when idle, so results expire under load
+            self.backend.expire(Config.JOB_RESULT_TTL)
+    
+    def _run_job(self, job_id: str):
+        job = self.backend.load_job(job_id)
+        image = self.backend.pop_payload(job_id)
+        
+        if job is None:
+            return
+        
+        job['status'] = 'running'
+        job['started_at'] = time.time()
+        job['wait_time'] = job['started_at'] - job['created_at']
+        self.backend.save_job(job)
+        
+        with self._lock:
+            self._running += 1
+            self._wait_times.append(job['wait_time'])
+        
+        try:
+            if image is None:
+                raise ValueError("Job payload is missing")
+            
+            job['result'] = self.processor_factory().process_image(image, **job['options'])
+            job['status'] = 'completed'
+        except Exception as e:
+            print(f"❌ Job {job_id} failed: {str(e)}")
+            job['error'] = str(e)
+            job['status'] = 'failed'
+        finally:
+            job['finished_at'] = time.time()
+            job['run_time'] = job['finished_at'] - job['started_at']
+            
+            with self._lock:
+                self._running -= 1
+                self._run_times.append(job['run_time'])
+                self._counters[job['status']] += 1
+        
+        self.backend.save_job(job)
+        
+        if job['callback_url']:
+            self._send_callback(job)
+    
+    def _send_callback(self, job: Dict):
+        """
+        POST the finished job to its callback URL
+        
+        The URL is validated again right before sending, since its host
+        may resolve differently than at submit time. Redirects are not
+        followed.
+        """
+        try:
+            validate_callback_url(job['callback_url'])
+            request = urllib.request.Request(
+                job['callback_url'],
+                data=json.dumps(job).encode('utf-8'),
+                headers={'Content-Type': 'application/json'},
+                method='POST'
+            )
+            with _callback_opener.open(request, timeout=Config.JOB_CALLBACK_TIMEOUT):
+                pass
+        except Exception as e:
+            print(f"⚠️  Callback for job {job['id']} failed: {str(e)}")
+
+
+def _summarize(values) -> Dict:
+    """Count, mean, p50, p95 and max of a list of durations in seconds"""
+    if not values:
+        return {'count': 0, 'mean': None, 'p50': None, 'p95': None, 'max': None}
+    
+    ordered = sorted(values)
+    return {
+        'count': len(ordered),
+        'mean': round(sum(ordered) / len(ordered), 4),
+        'p50': round(ordered[int(0.50 * (len(ordered) - 1))], 4),
+        'p95': round(ordered[int(0.95 * (len(ordered) - 1))], 4),
+        'max': round(ordered[-1], 4)
+    }
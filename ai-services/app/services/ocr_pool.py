@@ -0,0 +1,165 @@
+import multiprocessing
+import threading
+import time
+import numpy as np
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Any, Dict, List, Optional, Tuple
+from ..config import Config
+
+
+# Settings a worker process copies from the parent's Config, so runtime
+# overrides (and not only the environment) reach the worker engines
+WORKER_SETTINGS = ('OCR_BACKEND', 'TESSERACT_CMD', 'OCR_REC_BATCH_SIZE', 'DEVICE',
+                   'OCR_TILE_MIN_PIXELS', 'OCR_TILE_SIZE', 'OCR_TILE_OVERLAP',
+                   'STUB_OCR_MS', 'STUB_OCR_REC_MS', 'STUB_OCR_MAX_LINES')
+
+# OCRService held by each worker process, built once by _init_worker
+_worker_service = None
+
+
+def _init_worker(settings: Dict):
+    """Process initializer: apply the parent's settings and build the engine"""
+    global _worker_service
+    
+    for name, value in settings.items():
+        setattr(Config, name, value)
+    
+    from .ocr_service import OCRService
+    _worker_service = OCRService(workers=0)
+
+
+def _run_in_worker(method: str, specs: List[Tuple[str, Tuple, str]], kwargs: Dict) -> Any:
+    """Call an OCRService method with images attached from shared memory"""
+    blocks = [shared_memory.SharedMemory(name=name) for name, _, _ in specs]
+    images = []
+    try:
+        images = [
+            np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+            for block, (_, shape, dtype) in zip(blocks, specs)
+        ]
+        return getattr(_worker_service, method)(*images, **kwargs)
+    finally:
+        # Views into block.buf must be gone before close(), or it raises
+        # BufferError and hides the call's own error
+        images.clear()
+        for block in blocks:
+            block.close()
+
+
+def _warmup_worker() -> int:
+    """Exercise one worker's engine, returning its pid"""
+    _worker_service.warmup()
+    return multiprocessing.current_process().pid
+
+
+class OCRWorkerPool:
+    """
+    Pool of worker processes that each own an OCR engine
+    
+    Images are copied once into shared memory blocks that workers map
+    directly, instead of being pickled through the executor's pipe; only
+    the (small) text results travel back. Calls from many threads run in
+    parallel up to the pool size and queue beyond it.
+    """
+    
+    def __init__(self, workers: int, start_method: Optional[str] = None):
+        """
+        Args:
+            workers: Number of worker processes
+            start_method: multiprocessing start method (defaults to
+                Config.OCR_POOL_START_METHOD)
+        """
+        self.workers = workers
+        self.start_method = start_method or Config.OCR_POOL_START_METHOD
+        self.executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context(self.start_method),
+            initializer=_init_worker,
+            initargs=({name: getattr(Config, name) for name in WORKER_SETTINGS},)
+        )
+        
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._peak_in_flight = 0
+        self._counters = {'submitted': 0, 'completed': 0, 'failed': 0}
+        self._run_times = deque(maxlen=200)
+        print(f"✅ OCR worker pool started ({workers} {self.start_method} workers)")
+    
+    def submit(self, method: str, images: List[np.ndarray], **kwargs) -> Future:
+        """
+        Run an OCRService method in a worker
+        
+        Args:
+            method: OCRService method name, called as method(*images, **kwargs)
+            images: Image arguments, shipped through shared memory
+            **kwargs: Remaining (picklable) keyword arguments
+        
+        Returns:
+            Future resolving to the method's return value
+        """
+        blocks, specs = [], []
+        try:
+            for image in images:
+                image = np.ascontiguousarray(image)
+                block = shared_memory.SharedMemory(create=True, size=max(image.nbytes, 1))
+                np.ndarray(image.shape, dtype=image.dtype, buffer=block.buf)[...] = image
+                blocks.append(block)
+                specs.append((block.name, image.shape, image.dtype.str))
+            
+            start = time.perf_counter()
+            future = self.executor.submit(_run_in_worker, method, specs, kwargs)
+        except Exception:
+            self._release(blocks)
+            raise
+        
+        with self._lock:
+            self._in_flight += 1
+            self._peak_in_flight = max(self._peak_in_flight, self._in_flight)
+            self._counters['submitted'] += 1
+        
+        def done(future):
+            self._release(blocks)
+            with self._lock:
+                self._in_flight -= 1
+                self._counters['failed' if future.exception() else 'completed'] += 1
+                self._run_times.append(time.perf_counter() - start)
+        
+        future.add_done_callback(done)
+        return future
+    
+    def run(self, method: str, images: List[np.ndarray], **kwargs) -> Any:
+        """Blocking submit(): wait for the worker and return its result"""
+        return self.submit(method, images, **kwargs).result()
+    
+    def warmup(self):
+        """Start every worker and exercise its engine"""
+        futures = [self.executor.submit(_warmup_worker) for _ in range(self.workers)]
+        pids = {future.result() for future in futures}
+        print(f"✅ OCR worker pool warm ({len(pids)} processes)")
+    
+    def _release(self, blocks: List[shared_memory.SharedMemory]):
+        """Free the shared memory blocks of a finished call"""
+        for block in blocks:
+            block.close()
+            block.unlink()
+    
+    def stats(self) -> Dict:
+        """Pool size, calls in flight, queue depth and call latency"""
+        with self._lock:
+            stats = dict(self._counters)
+            stats['in_flight'] = self._in_flight
+            stats['peak_in_flight'] = self._peak_in_flight
+            run_times = list(self._run_times)
+        
+        stats['workers'] = self.workers
+        stats['start_method'] = self.start_method
+        # Calls waiting for a free worker
+        stats['queue_depth'] = max(0, stats['in_flight'] - self.workers)
+        stats['avg_call_ms'] = round(sum(run_times) / len(run_times) * 1000, 2) if run_times else None
+        return stats
+    
+    def shutdown(self):
+        """Stop the worker processes"""
+        self.executor.shutdown(wait=True)
@@ -1,17 +1,68 @@
 import cv2
 import numpy as np
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Optional, Tuple
 from PIL import Image
 from ..config import Config
+from ..utils.image_context import scale_bbox, scale_point
+from ..utils.tiling import merge_tile_text, offset_text_element, tile_grid, touches_seam
+
+
+# Whole-image detection + recognition, or recognition only on the boxes of
+# text-typed SAM segments
+OCR_MODES = ('full', 'segments')
+
+# Backends whose engine speaks PaddleOCR's API (ocr(), text_recognizer)
+PADDLE_API_BACKENDS = ('paddleocr', 'stub')
+
+
+def validate_ocr_mode(mode: Optional[str]) -> str:
+    """
+    Normalize and validate a requested OCR mode
+    
+    Args:
+        mode: Requested mode name (None uses Config.OCR_MODE)
+    
+    Returns:
+        Lower-cased mode name
+    """
+    mode = (mode or Config.OCR_MODE).lower()
+    
+    if mode not in OCR_MODES:
+        raise ValueError(f"Unknown OCR mode: {mode}. Allowed: {OCR_MODES}")
+    
+    return mode
 
 
 class OCRService:
     """Service for OCR text extraction using PaddleOCR or Tesseract"""
     
-    def __init__(self):
+    def __init__(self, workers: Optional[int] = None):
+        """
+        Args:
+            workers: OCR worker processes (defaults to Config.OCR_WORKERS);
+                0 runs the engine in this process
+        """
         self.backend = Config.OCR_BACKEND
         self.ocr_engine = None
-        self._initialize_ocr()
+        self.pool = None
+        self.lock = threading.Lock()  # PaddleOCR engine must not be shared across threads
+        self.tile_executor = None
+        
+        workers = Config.OCR_WORKERS if workers is None else workers
+        if workers > 0:
+            # Each worker process builds its own engine; this instance only
+            # dispatches to them
+            from .ocr_pool import OCRWorkerPool
+            self.pool = OCRWorkerPool(workers)
+        else:
+            self._initialize_ocr()
+            # Tesseract tiles run as parallel subprocesses; PaddleOCR tiles
+            # still queue on the engine lock
+            self.tile_executor = ThreadPoolExecutor(
+                max_workers=max(1, Config.OCR_TILE_WORKERS), thread_name_prefix='ocr-tile'
+            )
     
     def _initialize_ocr(self):
         """Initialize OCR engine based on configuration"""
@@ -24,10 +75,18 @@ class OCRService:
                     use_angle_cls=True,
                     lang='en',
                     use_gpu=Config.DEVICE == 'cuda',
+                    rec_batch_num=Config.OCR_REC_BATCH_SIZE,
                     show_log=False
                 )
                 print(f"✅ PaddleOCR initialized")
             
+            elif self.backend == 'stub':
+                from .stub_models import StubPaddleOCR
+                
+                # Speaks PaddleOCR's API, so the PaddleOCR code paths run on it
+                self.ocr_engine = StubPaddleOCR()
+                print(f"✅ OCR stub backend initialized")
+            
             elif self.backend == 'tesseract':
                 import pytesseract
                 
@@ -43,29 +102,184 @@ class OCRService:
         except Exception as e:
             raise Exception(f"Failed to initialize OCR engine: {str(e)}")
     
-    def extract_text(self, image: np.ndarray) -> List[Dict]:
+    def warmup(self):
+        """Run detection and recognition on a small rendered word"""
+        if self.pool is not None:
+            self.pool.warmup()
+            return
+        
+        image = np.full((48, 160, 3), 255, dtype=np.uint8)
+        cv2.putText(image, 'Warmup', (8, 34), cv2.FONT_HERSHEY_SIMPLEX, 1.0, (0, 0, 0), 2)
+        self.extract_text(image)
+    
+    def extract_text(self, image: np.ndarray, output_size: Optional[Tuple[int, int]] = None) -> List[Dict]:
         """
         Extract text from entire image
         
+        Images above Config.OCR_TILE_MIN_PIXELS are read as overlapping
+        tiles (see _extract_tiled) so small text keeps its resolution.
+        
         Args:
             image: Input image as numpy array
+            output_size: (h, w) frame for the returned boxes when image is a
+                downscaled view (defaults to the input image's size)
         
         Returns:
             List of text elements with position and content
         """
+        if self.pool is not None and not self._should_tile(image):
+            return self.pool.run('extract_text', [image], output_size=output_size)
+        
         try:
-            if self.backend == 'paddleocr':
-                return self._extract_with_paddleocr(image)
+            if self._should_tile(image):
+                text_elements = self._extract_tiled(image)
             else:
-                return self._extract_with_tesseract(image)
+                text_elements = self._extract_single(image)
+            
+            return self._to_output_frame(text_elements, image.shape[:2], output_size)
         
         except Exception as e:
             raise Exception(f"Text extraction failed: {str(e)}")
     
+    def extract_text_batch(self, images: List[np.ndarray],
+                           output_sizes: Optional[List[Tuple[int, int]]] = None) -> List[List[Dict]]:
+        """
+        Extract text from several images
+        
+        PaddleOCR only accepts image lists when detection is disabled, so full
+        detection+recognition runs per image while holding the engine once for
+        the whole batch; recognition still batches text lines internally.
+        With a worker pool the images are spread across the workers instead.
+        
+        Args:
+            images: Input images as numpy arrays
+            output_sizes: (h, w) result frame per image (defaults to each input's size)
+        
+        Returns:
+            List of text elements per image
+        """
+        if output_sizes is None:
+            output_sizes = [None] * len(images)
+        
+        # Images large enough to tile go through extract_text one by one
+        tiled = [self._should_tile(image) for image in images]
+        
+        if self.pool is not None:
+            futures = [
+                None if tile else self.pool.submit('extract_text', [image], output_size=output_size)
+                for image, output_size, tile in zip(images, output_sizes, tiled)
+            ]
+            return [
+                self.extract_text(image, output_size) if future is None else future.result()
+                for image, output_size, future in zip(images, output_sizes, futures)
+            ]
+        
+        try:
+            if self.backend in PADDLE_API_BACKENDS:
+                with self.lock:
+                    batch_results = [
+                        None if tile else self.ocr_engine.ocr(image, cls=True)
+                        for image, tile in zip(images, tiled)
+                    ]
+                batch_elements = [
+                    self._extract_tiled(image) if tile else self._parse_paddleocr_results(results)
+                    for image, results, tile in zip(images, batch_results, tiled)
+                ]
+            else:
+                batch_elements = [
+                    self._extract_tiled(image) if tile else self._extract_with_tesseract(image)
+                    for image, tile in zip(images, tiled)
+                ]
+            
+            return [
+                self._to_output_frame(text_elements, image.shape[:2], output_size)
+                for text_elements, image, output_size in zip(batch_elements, images, output_sizes)
+            ]
+        
+        except Exception as e:
+            raise Exception(f"Batch text extraction failed: {str(e)}")
+    
+    def _to_output_frame(self, text_elements: List[Dict], image_shape: Tuple[int, int],
+                         output_size: Optional[Tuple[int, int]]) -> List[Dict]:
+        """Map boxes, centers and polygons from the OCR input to the output frame"""
+        if output_size is None or tuple(output_size) == tuple(image_shape):
+            return text_elements
+        
+        sy, sx = output_size[0] / image_shape[0], output_size[1] / image_shape[1]
+        for element in text_elements:
+            element['bbox'] = scale_bbox(element['bbox'], image_shape, output_size)
+            center = scale_point(element['center'], image_shape, output_size)
+            element['center'] = {'x': int(center['x']), 'y': int(center['y'])}
+            if 'polygon' in element:
+                element['polygon'] = [[int(round(x * sx)), int(round(y * sy))] for x, y in element['polygon']]
+            element['font_size'] = self._estimate_font_size(element['bbox']['height'])
+        
+        return text_elements
+    
+    def _extract_single(self, image: np.ndarray) -> List[Dict]:
+        """One detection + recognition pass over the whole image"""
+        if self.backend in PADDLE_API_BACKENDS:
+            return self._extract_with_paddleocr(image)
+        return self._extract_with_tesseract(image)
+    
+    def _should_tile(self, image: np.ndarray) -> bool:
+        """Whether an image is large enough for tiled OCR"""
+        h, w = image.shape[:2]
+        return (
+            Config.OCR_TILE_MIN_PIXELS > 0 and
+            h * w > Config.OCR_TILE_MIN_PIXELS and
+            max(h, w) > Config.OCR_TILE_SIZE  # A single tile never tiles again
+        )
+    
+    def _extract_tiled(self, image: np.ndarray) -> List[Dict]:
+        """
+        Extract text from overlapping tiles and merge them
+        
+        Tiles run in parallel (on the worker pool when there is one) and
+        their detections are moved to image coordinates. Lines seen by two
+        tiles are merged by box NMS plus text containment, preferring the
+        copy that is not cut by a tile edge.
+        
+        Args:
+            image: Input image as numpy array
+        
+        Returns:
+            Text elements in image coordinates, in reading order
+        """
+        tiles = tile_grid(image.shape[:2], Config.OCR_TILE_SIZE, Config.OCR_TILE_OVERLAP)
+        print(f"🔍 Tiled OCR: {len(tiles)} tiles of {Config.OCR_TILE_SIZE}px for image {image.shape[:2]}")
+        
+        futures = []
+        for x, y, w, h in tiles:
+            tile = np.ascontiguousarray(image[y:y+h, x:x+w])
+            if self.pool is not None:
+                futures.append(self.pool.submit('extract_text', [tile]))
+            else:
+                futures.append(self.tile_executor.submit(self._extract_single, tile))
+        
+        elements, clipped = [], []
+        for (x, y, w, h), future in zip(tiles, futures):
+            for element in future.result():
+                offset_text_element(element, x, y)
+                elements.append(element)
+                clipped.append(touches_seam(element['bbox'], (x, y, w, h), image.shape[:2]))
+        
+        text_elements = merge_tile_text(elements, clipped)
+        for idx, element in enumerate(text_elements):
+            element['id'] = f'text_{idx}'
+        
+        print(f"✅ Tiled OCR kept {len(text_elements)}/{len(elements)} text elements")
+        return text_elements
+    
     def _extract_with_paddleocr(self, image: np.ndarray) -> List[Dict]:
         """Extract text using PaddleOCR"""
-        results = self.ocr_engine.ocr(image, cls=True)
+        with self.lock:
+            results = self.ocr_engine.ocr(image, cls=True)
         
+        return self._parse_paddleocr_results(results)
+    
+    def _parse_paddleocr_results(self, results: List) -> List[Dict]:
+        """Convert raw PaddleOCR output into text element dictionaries"""
         text_elements = []
         
         if results and results[0]:
@@ -161,6 +375,9 @@ class OCRService:
         Returns:
             Text information or None
         """
+        if self.pool is not None:
+            return self.pool.run('extract_text_from_region', [image], bbox=bbox)
+        
         try:
             x, y, w, h = bbox['x'], bbox['y'], bbox['width'], bbox['height']
             
@@ -171,8 +388,9 @@ class OCRService:
                 return None
             
             # Extract text from region
-            if self.backend == 'paddleocr':
-                results = self.ocr_engine.ocr(region, cls=True)
+            if self.backend in PADDLE_API_BACKENDS:
+                with self.lock:
+                    results = self.ocr_engine.ocr(region, cls=True)
                 
                 if results and results[0]:
                     # Concatenate all text in region
@@ -203,6 +421,141 @@ class OCRService:
             print(f"⚠️  Error extracting text from region: {str(e)}")
             return None
     
+    def extract_text_from_regions(self, image: np.ndarray, bboxes: List[Dict], detect: bool = False,
+                                  classify: bool = False) -> List[Optional[Dict]]:
+        """
+        Extract text from many regions with one batched recognition pass
+        
+        Every region is cropped once. Without detection each crop is treated
+        as a single text line: PaddleOCR runs its recognizer over all crops
+        (in batches of Config.OCR_REC_BATCH_SIZE) and Tesseract reads one
+        sheet with the crops stacked vertically instead of one process per
+        crop. With detection each crop goes through the full pipeline, as in
+        extract_text_from_region, while the engine is held once.
+        
+        Args:
+            image: Full image
+            bboxes: Bounding boxes with x, y, width, height
+            detect: Run text detection inside each crop (multi-line regions)
+            classify: Run PaddleOCR's angle classifier before recognition
+        
+        Returns:
+            Per box: content, confidence, bbox, center and font_size, or None
+            when no text was recognized
+        """
+        if self.pool is not None:
+            return self.pool.run('extract_text_from_regions', [image], bboxes=bboxes,
+                                 detect=detect, classify=classify)
+        
+        crops = []
+        for bbox in bboxes:
+            x, y, w, h = bbox['x'], bbox['y'], bbox['width'], bbox['height']
+            crops.append(image[max(y, 0):y+h, max(x, 0):x+w])
+        
+        indices = [idx for idx, crop in enumerate(crops) if crop.size > 0]
+        results = [None] * len(bboxes)
+        if not indices:
+            return results
+        
+        try:
+            if self.backend in PADDLE_API_BACKENDS:
+                recognized = self._recognize_with_paddleocr([crops[idx] for idx in indices], detect, classify)
+            else:
+                recognized = self._recognize_with_tesseract([crops[idx] for idx in indices], detect)
+        except Exception as e:
+            print(f"⚠️  Error extracting text from regions: {str(e)}")
+            return results
+        
+        for idx, (text, confidence) in zip(indices, recognized):
+            text = text.strip()
+            if not text:
+                continue
+            
+            bbox = bboxes[idx]
+            results[idx] = {
+                'content': text,
+                'confidence': float(confidence),
+                'bbox': bbox,
+                'center': {
+                    'x': bbox['x'] + bbox['width'] // 2,
+                    'y': bbox['y'] + bbox['height'] // 2
+                },
+                'font_size': self._estimate_font_size(bbox['height']),
+                'type': 'text'
+            }
+        
+        print(f"✅ Recognized text in {sum(r is not None for r in results)}/{len(bboxes)} regions")
+        return results
+    
+    def _recognize_with_paddleocr(self, crops: List[np.ndarray], detect: bool,
+                                  classify: bool) -> List[Tuple[str, float]]:
+        """(text, confidence) per crop from PaddleOCR"""
+        with self.lock:
+            if detect:
+                recognized = []
+                for crop in crops:
+                    lines = self.ocr_engine.ocr(crop, cls=classify)
+                    lines = lines[0] if lines and lines[0] else []
+                    recognized.append((
+                        ' '.join(line[1][0] for line in lines),
+                        np.mean([line[1][1] for line in lines]) if lines else 0.0
+                    ))
+                return recognized
+            
+            # Straight to the engine's stages: ocr(det=False) would run the
+            # recognizer once per image instead of batching the list
+            if classify and getattr(self.ocr_engine, 'text_classifier', None) is not None:
+                crops, _, _ = self.ocr_engine.text_classifier(crops)
+            recognized, _ = self.ocr_engine.text_recognizer(crops)
+        
+        return [(text, confidence) for text, confidence in recognized]
+    
+    def _recognize_with_tesseract(self, crops: List[np.ndarray], detect: bool) -> List[Tuple[str, float]]:
+        """(text, confidence) per crop from one Tesseract run over a stacked sheet"""
+        import pytesseract
+        
+        pad = 16
+        width = max(crop.shape[1] for crop in crops) + 2 * pad
+        height = sum(crop.shape[0] + pad for crop in crops) + pad
+        sheet = np.full((height, width, 3), 255, dtype=np.uint8)
+        
+        bands = []
+        y = pad
+        for crop in crops:
+            if crop.ndim == 2:
+                crop = cv2.cvtColor(crop, cv2.COLOR_GRAY2RGB)
+            sheet[y:y + crop.shape[0], pad:pad + crop.shape[1]] = crop[:, :, :3]
+            bands.append(y)
+            y += crop.shape[0] + pad
+        
+        # The sheet is one uniform block of lines (psm 6); multi-line crops of
+        # varying sizes read better as a single column (psm 4)
+        data = pytesseract.image_to_data(
+            sheet,
+            output_type=pytesseract.Output.DICT,
+            config='--psm 4' if detect else '--psm 6'
+        )
+        
+        words = [[] for _ in crops]
+        confidences = [[] for _ in crops]
+        for i, text in enumerate(data['text']):
+            text = text.strip()
+            conf = float(data['conf'][i])
+            if not text or conf <= 0:
+                continue
+            
+            # Assign each word to the crop band its center falls in
+            center_y = data['top'][i] + data['height'][i] / 2
+            band = int(np.searchsorted(bands, center_y, side='right')) - 1
+            if band >= 0:
+                words[band].append(text)
+                confidences[band].append(conf / 100.0)
+        
+        return [
+            (' '.join(band_words), np.mean(band_confidences) if band_confidences else 0.0)
+            for band_words, band_confidences in zip(words, confidences)
+        ]
+    
     def _estimate_font_size(self, height: float) -> int:
         """
         Estimate font size in points from pixel height
@@ -219,13 +572,15 @@ class OCRService:
         # Clamp to reasonable range
         return max(8, min(72, font_size))
     
-    def detect_font_color(self, image: np.ndarray, bbox: Dict) -> Tuple[int, int, int]:
+    def detect_font_color(self, image: np.ndarray, bbox: Dict,
+                          gray: Optional[np.ndarray] = None) -> Tuple[int, int, int]:
         """
         Detect dominant font color in text region
         
         Args:
             image: Full image
             bbox: Bounding box of text
+            gray: Optional grayscale view of the full image, shared across calls
         
         Returns:
             RGB color tuple
@@ -238,7 +593,10 @@ class OCRService:
                 return (0, 0, 0)
             
             # Convert to grayscale
-            gray = cv2.cvtColor(region, cv2.COLOR_RGB2GRAY)
+            if gray is not None:
+                gray = gray[y:y+h, x:x+w]
+            else:
+                gray = cv2.cvtColor(region, cv2.COLOR_RGB2GRAY)
             
             # Threshold to separate text from background
             _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
@@ -1,25 +1,78 @@
 import torch
 import numpy as np
-from typing import Dict, List, Optional
-from transformers import Pix2StructForConditionalGeneration, Pix2StructProcessor
+from typing import Dict, List, Optional, Tuple
 from PIL import Image
 from ..config import Config
 import json
 import re
+import threading
+import time
+
+
+# Decoding profiles. max_new_tokens caps each method's own budget (None keeps
+# it) and max_time adds a wall-clock stopping criterion. 'beam' matches the
+# original settings.
+DECODING_PROFILES = {
+    'beam': {'num_beams': 4, 'max_new_tokens': None, 'max_time': None},
+    'small_beam': {'num_beams': 2, 'max_new_tokens': 256, 'max_time': None},
+    'greedy': {'num_beams': 1, 'max_new_tokens': None, 'max_time': None},
+    'budget': {'num_beams': 1, 'max_new_tokens': 128, 'max_time': Config.PIX2STRUCT_TIME_BUDGET}
+}
+
+
+PIX2STRUCT_BACKENDS = ('transformers', 'stub')
+
+
+def validate_decoding_profile(profile: Optional[str]) -> str:
+    """
+    Normalize and validate a requested Pix2Struct decoding profile
+    
+    Args:
+        profile: Requested profile name (None uses Config.PIX2STRUCT_DECODING)
+    
+    Returns:
+        Lower-cased profile name
+    """
+    profile = (profile or Config.PIX2STRUCT_DECODING).lower()
+    
+    if profile not in DECODING_PROFILES:
+        raise ValueError(f"Unknown decoding profile: {profile}. Allowed: {tuple(DECODING_PROFILES)}")
+    
+    return profile
 
 
 class Pix2StructService:
     """Service for Pix2Struct model integration for layout analysis"""
     
-    def __init__(self):
+    LAYOUT_PROMPT = "Generate a structured layout description of this image, including all text elements, shapes, and their positions."
+    
+    def __init__(self, quantize: Optional[bool] = None):
+        """
+        Args:
+            quantize: Apply dynamic int8 quantization on CPU (defaults to Config.PIX2STRUCT_QUANTIZE)
+        """
         self.device = Config.DEVICE
         self.model = None
         self.processor = None
-        self._load_model()
+        self.quantized = False
+        self.backend = Config.PIX2STRUCT_BACKEND.lower()
+        self.lock = threading.Lock()  # Serialize generate() calls on the shared model
+        self._load_model(Config.PIX2STRUCT_QUANTIZE if quantize is None else quantize)
     
-    def _load_model(self):
+    def _load_model(self, quantize: bool = False):
         """Load Pix2Struct pretrained model"""
+        if self.backend == 'stub':
+            from .stub_models import StubPix2StructModel, StubPix2StructProcessor
+            self.processor = StubPix2StructProcessor()
+            self.model = StubPix2StructModel()
+            print(f"✅ Pix2Struct stub backend ready ({Config.STUB_LAYOUT_ELEMENTS} layout elements per image)")
+            return
+        if self.backend != 'transformers':
+            raise ValueError(f"Unknown Pix2Struct backend: {self.backend}. Allowed: {PIX2STRUCT_BACKENDS}")
+        
         try:
+            from transformers import Pix2StructForConditionalGeneration, Pix2StructProcessor
+            
             print(f"📦 Loading Pix2Struct model: {Config.PIX2STRUCT_MODEL}")
             
             self.processor = Pix2StructProcessor.from_pretrained(Config.PIX2STRUCT_MODEL)
@@ -27,47 +80,109 @@ class Pix2StructService:
             self.model.to(self.device)
             self.model.eval()
             
-            print(f"✅ Pix2Struct model loaded successfully on {self.device}")
+            if quantize:
+                if self.device == 'cpu':
+                    # int8 weights for every Linear layer; activations stay float
+                    self.model = torch.quantization.quantize_dynamic(
+                        self.model, {torch.nn.Linear}, dtype=torch.qint8
+                    )
+                    self.quantized = True
+                else:
+                    print(f"⚠️  Dynamic quantization is CPU-only, keeping float weights on {self.device}")
+            
+            print(f"✅ Pix2Struct model loaded successfully on {self.device}"
+                  f"{' (int8 dynamic quantization)' if self.quantized else ''}")
         except Exception as e:
             raise Exception(f"Failed to load Pix2Struct model: {str(e)}")
     
-    def analyze_layout(self, image: np.ndarray) -> Dict:
+    def _generate(self, inputs, max_new_tokens: int, profile: Optional[str] = None,
+                  early_stopping: bool = False):
+        """
+        Run generate() with the settings of a decoding profile
+        
+        Args:
+            inputs: Processor outputs on self.device
+            max_new_tokens: The calling method's token budget
+            profile: Decoding profile name (defaults to Config.PIX2STRUCT_DECODING)
+            early_stopping: Stop beam search once num_beams candidates are finished
+        
+        Returns:
+            (output ids, decoding info with profile, new_tokens, generate_ms, time_limited)
+        """
+        profile = validate_decoding_profile(profile)
+        settings = DECODING_PROFILES[profile]
+        
+        kwargs = {
+            'max_new_tokens': min(max_new_tokens, settings['max_new_tokens'] or max_new_tokens),
+            'num_beams': settings['num_beams']
+        }
+        if early_stopping and settings['num_beams'] > 1:
+            kwargs['early_stopping'] = True
+        
+        with self.lock, torch.no_grad():
+            if settings['max_time'] and self.backend == 'stub':
+                kwargs['max_time'] = settings['max_time']
+            elif settings['max_time']:
+                from transformers import MaxTimeCriteria, StoppingCriteriaList
+                # Started after acquiring the lock so queueing does not eat the budget
+                kwargs['stopping_criteria'] = StoppingCriteriaList([MaxTimeCriteria(settings['max_time'])])
+            
+            start = time.perf_counter()
+            outputs = self.model.generate(**inputs, **kwargs)
+            elapsed = time.perf_counter() - start
+        
+        # Encoder-decoder output starts with the decoder start token
+        new_tokens = max(0, len(outputs[0]) - 1)
+        
+        return outputs, {
+            'profile': profile,
+            'quantized': self.quantized,
+            'new_tokens': new_tokens,
+            'generate_ms': round(elapsed * 1000, 2),
+            'time_limited': settings['max_time'] is not None and elapsed >= settings['max_time']
+        }
+    
+    def warmup(self):
+        """Run a short generate() on a blank image"""
+        inputs = self.processor(
+            images=Image.new('RGB', (64, 64), 'white'),
+            text=self.LAYOUT_PROMPT,
+            return_tensors="pt"
+        ).to(self.device)
+        
+        with self.lock, torch.no_grad():
+            self.model.generate(**inputs, max_new_tokens=4)
+    
+    def analyze_layout(self, image: np.ndarray, profile: Optional[str] = None,
+                       output_size: Optional[Tuple[int, int]] = None) -> Dict:
         """
         Analyze image layout and generate structured representation
         
         Args:
             image: Input image as numpy array (RGB)
+            profile: Decoding profile (defaults to Config.PIX2STRUCT_DECODING)
+            output_size: (h, w) of the original image when image is a downscaled view
         
         Returns:
             Structured layout information
         """
         try:
-            # Convert numpy array to PIL Image
-            pil_image = Image.fromarray(image)
-            
-            # Prepare input with layout analysis prompt
-            prompt = "Generate a structured layout description of this image, including all text elements, shapes, and their positions."
-            
+            # The processor takes arrays directly (PIL input is converted back)
             inputs = self.processor(
-                images=pil_image,
-                text=prompt,
+                images=image,
+                text=self.LAYOUT_PROMPT,
                 return_tensors="pt"
             ).to(self.device)
             
             # Generate layout description
-            with torch.no_grad():
-                outputs = self.model.generate(
-                    **inputs,
-                    max_new_tokens=512,
-                    num_beams=4,
-                    early_stopping=True
-                )
+            outputs, decoding = self._generate(inputs, 512, profile, early_stopping=True)
             
             # Decode output
             layout_text = self.processor.decode(outputs[0], skip_special_tokens=True)
             
             # Parse layout text into structured format
-            layout_structure = self._parse_layout(layout_text, image.shape[:2])
+            layout_structure = self._parse_layout(layout_text, output_size or image.shape[:2])
+            layout_structure['decoding'] = decoding
             
             print(f"✅ Layout analysis completed")
             return layout_structure
@@ -75,6 +190,45 @@ class Pix2StructService:
         except Exception as e:
             raise Exception(f"Layout analysis failed: {str(e)}")
     
+    def analyze_layout_batch(self, images: List[np.ndarray], profile: Optional[str] = None,
+                             output_sizes: Optional[List[Tuple[int, int]]] = None) -> List[Dict]:
+        """
+        Analyze the layout of several images with one padded generate() call
+        
+        Args:
+            images: Input images as numpy arrays (RGB)
+            profile: Decoding profile (defaults to Config.PIX2STRUCT_DECODING)
+            output_sizes: (h, w) of each original image (defaults to each input's size)
+        
+        Returns:
+            Structured layout information per image
+        """
+        if output_sizes is None:
+            output_sizes = [image.shape[:2] for image in images]
+        
+        try:
+            # The processor pads every image to the same number of patches
+            inputs = self.processor(
+                images=list(images),
+                text=[self.LAYOUT_PROMPT] * len(images),
+                return_tensors="pt"
+            ).to(self.device)
+            
+            outputs, decoding = self._generate(inputs, 512, profile, early_stopping=True)
+            
+            layout_texts = self.processor.batch_decode(outputs, skip_special_tokens=True)
+            
+            print(f"✅ Layout analysis completed for batch of {len(images)} images")
+            layouts = []
+            for layout_text, output_size in zip(layout_texts, output_sizes):
+                layout = self._parse_layout(layout_text, output_size)
+                layout['decoding'] = dict(decoding, batch_size=len(images))
+                layouts.append(layout)
+            return layouts
+        
+        except Exception as e:
+            raise Exception(f"Batch layout analysis failed: {str(e)}")
+    
     def _parse_layout(self, layout_text: str, image_shape: tuple) -> Dict:
         """
         Parse layout text into structured format
@@ -130,12 +284,13 @@ class Pix2StructService:
         
         return structure
     
-    def extract_text_regions(self, image: np.ndarray) -> List[Dict]:
+    def extract_text_regions(self, image: np.ndarray, profile: Optional[str] = None) -> List[Dict]:
         """
         Extract text regions from image using Pix2Struct
         
         Args:
             image: Input image as numpy array
+            profile: Decoding profile (defaults to Config.PIX2STRUCT_DECODING)
         
         Returns:
             List of text region dictionaries
@@ -151,12 +306,7 @@ class Pix2StructService:
                 return_tensors="pt"
             ).to(self.device)
             
-            with torch.no_grad():
-                outputs = self.model.generate(
-                    **inputs,
-                    max_new_tokens=256,
-                    num_beams=4
-                )
+            outputs, _ = self._generate(inputs, 256, profile)
             
             text_info = self.processor.decode(outputs[0], skip_special_tokens=True)
             
@@ -209,12 +359,13 @@ class Pix2StructService:
         
         return regions
     
-    def detect_visual_hierarchy(self, image: np.ndarray) -> Dict:
+    def detect_visual_hierarchy(self, image: np.ndarray, profile: Optional[str] = None) -> Dict:
         """
         Detect visual hierarchy and relationships between elements
         
         Args:
             image: Input image as numpy array
+            profile: Decoding profile (defaults to Config.PIX2STRUCT_DECODING)
         
         Returns:
             Hierarchy information
@@ -230,12 +381,7 @@ class Pix2StructService:
                 return_tensors="pt"
             ).to(self.device)
             
-            with torch.no_grad():
-                outputs = self.model.generate(
-                    **inputs,
-                    max_new_tokens=384,
-                    num_beams=4
-                )
+            outputs, _ = self._generate(inputs, 384, profile)
             
             hierarchy_text = self.processor.decode(outputs[0], skip_special_tokens=True)
             
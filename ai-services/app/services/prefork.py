@@ -0,0 +1,135 @@
+import gc
+import os
+from typing import Dict, List, Optional
+from ..config import Config
+from ..utils.metrics import metrics
+from .registry import registry
+
+
+def preload_skip_reason(name: str) -> Optional[str]:
+    """
+    Why a service must not be loaded before forking, or None if it can be
+    
+    Forked children get a copy of the master's memory but not its threads,
+    so anything holding a thread pool, a CUDA context or pipes to other
+    processes has to be created in each worker instead.
+    """
+    if Config.DEVICE != 'cpu':
+        return f"{Config.DEVICE} contexts do not survive fork"
+    if name == 'sam' and Config.SAM_BACKEND == 'onnx':
+        return "ONNX Runtime sessions start their thread pools on creation"
+    if name == 'ocr' and Config.OCR_WORKERS > 0:
+        return "the OCR worker pool's queues cannot be shared between workers"
+    if name == 'ocr' and Config.OCR_BACKEND == 'paddleocr':
+        return "Paddle predictors own native thread pools (and their weights are small)"
+    return None
+
+
+def torch_threads_per_worker(workers: Optional[int] = None) -> int:
+    """
+    Intra-op threads each worker gives torch
+    
+    Defaults to the CPU cores split evenly between the workers, so N
+    workers running inference together do not oversubscribe the machine.
+    """
+    if Config.TORCH_THREADS_PER_WORKER > 0:
+        return Config.TORCH_THREADS_PER_WORKER
+    workers = Config.SERVER_WORKERS if workers is None else workers
+    return max(1, (os.cpu_count() or 1) // max(1, workers))
+
+
+def per_worker_state_warnings(workers: Optional[int] = None) -> List[str]:
+    """
+    State that each worker keeps to itself, which requests cannot rely on
+    
+    Every worker has its own JobManager threads, result cache and SAM
+    embedding cache, and consecutive requests from one client may reach
+    different workers.
+    
+    Args:
+        workers: Number of worker processes (defaults to Config.SERVER_WORKERS)
+    
+    Returns:
+        One message per feature that breaks across workers
+    """
+    workers = Config.SERVER_WORKERS if workers is None else workers
+    if workers <= 1:
+        return []
+    
+    warnings = []
+    if Config.JOB_BACKEND == 'local':
+        warnings.append(f"JOB_BACKEND=local keeps jobs in each of the {workers} workers, so "
+                        "/api/image/jobs/<id> returns 404 on the others; use JOB_BACKEND=redis")
+    if not Config.SAM_EMBEDDING_CACHE_DIR:
+        warnings.append(f"SAM image_id prompts only work on the worker that embedded the image ({workers} workers); "
+                        "set SAM_EMBEDDING_CACHE_DIR to share embeddings")
+    return warnings
+
+
+def preload_models(services: Optional[List[str]] = None) -> Dict[str, Optional[str]]:
+    """
+    Load model services in the master process before workers are forked
+    
+    Weights loaded here are shared copy-on-write by every worker: inference
+    only reads parameter tensors, so their pages stay shared and each worker
+    only adds its activations, caches and Python objects. Torch is limited
+    to one thread while loading so no OpenMP pool exists at fork time, and
+    the loaded objects are moved out of the garbage collector's reach
+    (gc.freeze) so collections in the workers do not write to, and thereby
+    copy, the pages holding them. No inference runs here; workers warm up
+    after the fork.
+    
+    Args:
+        services: Registry service names (defaults to Config.SERVER_PRELOAD_SERVICES)
+    
+    Returns:
+        Service name -> None when preloaded, else why it was left to the workers
+    """
+    import torch
+    torch.set_num_threads(1)
+    
+    results = {}
+    for name in (services if services is not None else Config.SERVER_PRELOAD_SERVICES):
+        reason = preload_skip_reason(name)
+        if reason is None:
+            try:
+                registry.get(name)
+            except Exception as e:
+                reason = f"load failed: {str(e)}"
+        
+        results[name] = reason
+        if reason is not None:
+            print(f"⚠️  Not preloading {name}: {reason}")
+    
+    gc.collect()
+    gc.freeze()
+    print(f"✅ Preloaded before fork: {', '.join(n for n, r in results.items() if r is None) or 'nothing'}")
+    return results
+
+
+def init_worker(workers: Optional[int] = None):
+    """
+    Per-worker setup after fork
+    
+    Gives torch and OpenCV this worker's share of the CPU cores, shares
+    this worker's metrics through METRICS_MULTIPROC_DIR so /metrics covers
+    every worker, and starts warmup, which runs each model once in this
+    process (loading whatever the master did not preload).
+    
+    Args:
+        workers: Number of worker processes (defaults to Config.SERVER_WORKERS)
+    """
+    import cv2
+    import torch
+    from .warmup import warmup
+    
+    threads = torch_threads_per_worker(workers)
+    torch.set_num_threads(threads)
+    cv2.setNumThreads(threads)
+    
+    if Config.METRICS_ENABLED and Config.METRICS_MULTIPROC_DIR:
+        metrics.enable_multiprocess(Config.METRICS_MULTIPROC_DIR, Config.METRICS_SYNC_INTERVAL)
+    
+    print(f"🔧 Worker {os.getpid()}: {threads} torch threads")
+    if Config.WARMUP_ENABLED:
+        warmup.start()
@@ -1,12 +1,33 @@
 import cv2
+import time
 import numpy as np
-from typing import Dict, List, Optional
-from .sam_service import SAMService
-from .pix2struct_service import Pix2StructService
-from .ocr_service import OCRService
-from colorthief import ColorThief
-from io import BytesIO
-from PIL import Image
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from .pix2struct_service import DECODING_PROFILES, validate_decoding_profile
+from .ocr_service import validate_ocr_mode
+from .registry import registry
+from .sam_service import validate_sam_profile
+from ..config import Config
+from ..utils.box_matching import match_segments_to_text
+from ..utils.cache import ResultCache, make_cache_key
+from ..utils.image_context import ImageContext
+from ..utils.mask_encoding import decode_mask, validate_mask_encoding
+from ..utils.metrics import observe_stages
+from ..utils.palette import dominant_colors, extract_palette, to_hex
+from ..utils.text_style import text_styles
+
+
+PIPELINE_MODES = ('concurrent', 'sequential')
+
+# Response formats of a streamed /process call
+STREAM_FORMATS = ('ndjson', 'sse')
+
+
+def _timed(func: Callable, *args, **kwargs) -> Tuple[object, float]:
+    """Call func and return (result, elapsed seconds)"""
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
 
 
 class ImageProcessor:
@@ -14,105 +35,529 @@ class ImageProcessor:
     
     def __init__(self):
         print("🚀 Initializing Image Processor...")
-        self.sam_service = SAMService()
-        self.pix2struct_service = Pix2StructService()
-        self.ocr_service = OCRService()
+        
+        # Model services (sam_service, pix2struct_service, ocr_service) are
+        # constructed on first use through the registry
+        
+        # One worker per model stage for the concurrent pipeline
+        self.executor = ThreadPoolExecutor(max_workers=3, thread_name_prefix='pipeline')
+        
+        # Content-addressed cache of per-stage outputs
+        self.cache = None
+        if Config.CACHE_ENABLED:
+            self.cache = ResultCache(Config.CACHE_MAX_BYTES, Config.CACHE_DIR)
         print("✅ Image Processor initialized")
     
-    def process_image(self, image: np.ndarray) -> Dict:
+    @property
+    def sam_service(self):
+        """SAM service (loaded on first access)"""
+        return registry.get('sam')
+    
+    @property
+    def pix2struct_service(self):
+        """Pix2Struct service (loaded on first access)"""
+        return registry.get('pix2struct')
+    
+    @property
+    def ocr_service(self):
+        """OCR service (loaded on first access)"""
+        return registry.get('ocr')
+    
+    def _cached(self, stage: str, context: ImageContext, params: Tuple, compute: Callable):
+        """Run compute() through the result cache keyed by pixels + params"""
+        if self.cache is None:
+            return compute()
+        
+        key = make_cache_key(stage, context.hash, params)
+        return self.cache.get_or_compute(key, compute)
+    
+    def _segmentation_params(self, mask_encoding: str, sam_profile: str) -> Tuple:
+        """Config values that change SAM output, used in segmentation cache keys"""
+        # Stub backend output is synthetic and must never share entries with SAM's
+        stub = Config.STUB_SAM_SEGMENTS if Config.SAM_BACKEND == 'stub' else None
+        return (Config.SAM_MODEL_TYPE, Config.SAM_CHECKPOINT, Config.MAX_IMAGE_SIZE,
+                Config.MIN_SEGMENT_AREA, mask_encoding, sam_profile, stub)
+    
+    def segment_image(self, context: ImageContext, mask_encoding: Optional[str] = None,
+                      sam_profile: Optional[str] = None) -> List[Dict]:
+        """Cached SAM segmentation in original image coordinates"""
+        mask_encoding = validate_mask_encoding(mask_encoding)
+        sam_profile = validate_sam_profile(sam_profile)
+        return self._cached(
+            'segmentation', context, self._segmentation_params(mask_encoding, sam_profile),
+            lambda: self.sam_service.segment_image(
+                context.stage_image('segmentation'), mask_encoding=mask_encoding,
+                profile=sam_profile, output_size=context.size
+            )
+        )
+    
+    def _layout_params(self, decoding_profile: str) -> Tuple:
+        """Config values that change Pix2Struct output, used in layout cache keys"""
+        stub = Config.STUB_LAYOUT_ELEMENTS if Config.PIX2STRUCT_BACKEND == 'stub' else None
+        return (Config.PIX2STRUCT_MODEL, Config.PIX2STRUCT_QUANTIZE, Config.LAYOUT_MAX_IMAGE_SIZE,
+                decoding_profile, DECODING_PROFILES[decoding_profile]['max_time'], stub)
+    
+    def analyze_layout(self, context: ImageContext, decoding_profile: Optional[str] = None) -> Dict:
+        """Cached Pix2Struct layout analysis"""
+        decoding_profile = validate_decoding_profile(decoding_profile)
+        return self._cached(
+            'layout', context, self._layout_params(decoding_profile),
+            lambda: self.pix2struct_service.analyze_layout(
+                context.stage_image('layout'), profile=decoding_profile, output_size=context.size
+            )
+        )
+    
+    def _ocr_params(self) -> Tuple:
+        """Config values that change OCR output, used in OCR cache keys"""
+        stub = Config.STUB_OCR_MAX_LINES if Config.OCR_BACKEND == 'stub' else None
+        return (Config.OCR_BACKEND, Config.OCR_MAX_IMAGE_SIZE, Config.OCR_TILE_MIN_PIXELS,
+                Config.OCR_TILE_SIZE, Config.OCR_TILE_OVERLAP, stub)
+    
+    def extract_text(self, context: ImageContext) -> List[Dict]:
+        """Cached OCR text extraction in original image coordinates"""
+        return self._cached(
+            'ocr', context, self._ocr_params(),
+            lambda: self.ocr_service.extract_text(context.stage_image('ocr'), output_size=context.size)
+        )
+    
+    def extract_segment_text(self, context: ImageContext, segments: List[Dict]) -> List[Dict]:
+        """
+        Cached recognition-only OCR over the boxes of text-typed segments
+        
+        Skips whole-image text detection: SAM has already located the text,
+        so every text segment is recognized in one batched pass.
+        
+        Args:
+            context: Original image context
+            segments: SAM segments in original image coordinates
+        
+        Returns:
+            Text elements in the extract_text schema, each tied to its segment
+        """
+        text_segments = [segment for segment in segments if segment['type'] == 'text']
+        bboxes = [segment['bbox'] for segment in text_segments]
+        params = (Config.OCR_BACKEND, Config.OCR_REGION_MIN_CONFIDENCE, 'segments',
+                  tuple((b['x'], b['y'], b['width'], b['height']) for b in bboxes))
+        
+        def compute():
+            text_elements = []
+            recognized = self.ocr_service.extract_text_from_regions(context.image, bboxes)
+            for segment, text in zip(text_segments, recognized):
+                if text is None or text['confidence'] < Config.OCR_REGION_MIN_CONFIDENCE:
+                    continue
+                text['id'] = f'text_{len(text_elements)}'
+                text['segment_id'] = segment['id']
+                text_elements.append(text)
+            return text_elements
+        
+        return self._cached('ocr', context, params, compute)
+    
+    def extract_colors(self, context: ImageContext, num_colors: int = 8) -> List[Dict]:
+        """Cached color palette extraction"""
+        return self._cached(
+            'palette', context, (num_colors, Config.PALETTE_MAX_PIXELS),
+            lambda: self._extract_color_palette(context.image, num_colors)
+        )
+    
+    def _cached_batch(self, stage: str, contexts: List[ImageContext],
+                      params: Tuple, compute_batch: Callable) -> List:
+        """Serve cached entries and run compute_batch() only over the misses"""
+        if self.cache is None:
+            return compute_batch(contexts)
+        
+        keys = [make_cache_key(stage, context.hash, params) for context in contexts]
+        results = [None] * len(contexts)
+        misses = []
+        
+        for idx, key in enumerate(keys):
+            found, value = self.cache.get(key)
+            if found:
+                results[idx] = value
+            else:
+                misses.append(idx)
+        
+        if misses:
+            computed = compute_batch([contexts[idx] for idx in misses])
+            for idx, value in zip(misses, computed):
+                self.cache.put(keys[idx], value)
+                results[idx] = value
+        
+        return results
+    
+    def process_image(self, image: np.ndarray, mask_encoding: Optional[str] = None,
+                      pipeline_mode: Optional[str] = None, sam_profile: Optional[str] = None,
+                      decoding_profile: Optional[str] = None, ocr_mode: Optional[str] = None) -> Dict:
         """
         Complete image processing pipeline
         
         Args:
             image: Input image as numpy array (RGB)
+            mask_encoding: Mask encoding for segment layers (defaults to Config.MASK_ENCODING)
+            pipeline_mode: 'concurrent' or 'sequential' (defaults to Config.PIPELINE_MODE)
+            sam_profile: SAM speed profile (defaults to Config.SAM_PROFILE)
+            decoding_profile: Pix2Struct decoding profile (defaults to Config.PIX2STRUCT_DECODING)
+            ocr_mode: 'full' or 'segments' (defaults to Config.OCR_MODE)
         
         Returns:
             Complete analysis with editable layers
         """
-        print(f"🔄 Processing image of shape {image.shape}")
+        ocr_mode = validate_ocr_mode(ocr_mode)
+        pipeline_mode = (pipeline_mode or Config.PIPELINE_MODE).lower()
+        if pipeline_mode not in PIPELINE_MODES:
+            raise ValueError(f"Unknown pipeline mode: {pipeline_mode}. Allowed: {PIPELINE_MODES}")
+        
+        print(f"🔄 Processing image of shape {image.shape} ({pipeline_mode})")
+        total_start = time.perf_counter()
+        timings = {}
+        context = ImageContext(image)
+        
+        if pipeline_mode == 'concurrent':
+            # Steps 1-3 are independent reads of the same image; each service
+            # holds its own lock so concurrent requests still queue per model
+            print("📍 Steps 1-3/5: SAM, Pix2Struct and OCR in parallel")
+            futures = {
+                'segmentation': self.executor.submit(
+                    _timed, self.segment_image, context, mask_encoding=mask_encoding,
+                    sam_profile=sam_profile
+                ),
+                'layout': self.executor.submit(
+                    _timed, self.analyze_layout, context, decoding_profile=decoding_profile
+                ),
+            }
+            if ocr_mode == 'full':
+                futures['ocr'] = self.executor.submit(_timed, self.extract_text, context)
+            
+            stage_results = {}
+            for name, future in futures.items():
+                stage_results[name], timings[name] = future.result()
+                if name == 'segmentation' and ocr_mode == 'segments':
+                    # Region OCR needs the segments; run it here (not on a
+                    # pool worker waiting on another future) while layout runs
+                    stage_results['ocr'], timings['ocr'] = _timed(
+                        self.extract_segment_text, context, stage_results['segmentation']
+                    )
+            
+            segments = stage_results['segmentation']
+            layout = stage_results['layout']
+            ocr_results = stage_results['ocr']
+        else:
+            # Step 1: SAM Segmentation
+            print("📍 Step 1/5: SAM Segmentation")
+            segments, timings['segmentation'] = _timed(
+                self.segment_image, context, mask_encoding=mask_encoding, sam_profile=sam_profile
+            )
+            
+            # Step 2: Pix2Struct Layout Analysis
+            print("📍 Step 2/5: Pix2Struct Layout Analysis")
+            layout, timings['layout'] = _timed(
+                self.analyze_layout, context, decoding_profile=decoding_profile
+            )
+            
+            # Step 3: OCR Text Extraction
+            print(f"📍 Step 3/5: OCR Text Extraction ({ocr_mode})")
+            if ocr_mode == 'segments':
+                ocr_results, timings['ocr'] = _timed(self.extract_segment_text, context, segments)
+            else:
+                ocr_results, timings['ocr'] = _timed(self.extract_text, context)
+        
+        result = self._finish_image(context, segments, layout, ocr_results, timings)
+        
+        timings['total'] = time.perf_counter() - total_start
+        observe_stages(timings)
+        result['pipeline'] = {
+            'mode': pipeline_mode,
+            'ocr_mode': ocr_mode,
+            'timings_ms': {name: round(seconds * 1000, 2) for name, seconds in timings.items()}
+        }
+        
+        print(f"✅ Processing complete: {len(result['layers'])} editable layers created "
+              f"in {timings['total']:.2f}s")
+        return result
+    
+    def process_image_stream(self, image: np.ndarray, mask_encoding: Optional[str] = None,
+                             pipeline_mode: Optional[str] = None, sam_profile: Optional[str] = None,
+                             decoding_profile: Optional[str] = None,
+                             ocr_mode: Optional[str] = None) -> Iterator[Dict]:
+        """
+        Complete image processing pipeline, yielding results as they are ready
+        
+        Emits one event per stage in completion order, then the editable
+        layers one at a time, so a client can render text, palette and layout
+        before matching finishes and no full response is ever assembled.
+        
+        Events ('event' key):
+            start: image_size and pipeline modes
+            palette: color_palette
+            ocr: text_elements
+            layout: layout
+            segmentation: total_segments (masks arrive with the layers)
+            layer: one editable layer, in z-order
+            done: totals and pipeline timings
+        
+        Args:
+            image: Input image as numpy array (RGB)
+            mask_encoding: Mask encoding for segment layers (defaults to Config.MASK_ENCODING)
+            pipeline_mode: 'concurrent' or 'sequential' (defaults to Config.PIPELINE_MODE)
+            sam_profile: SAM speed profile (defaults to Config.SAM_PROFILE)
+            decoding_profile: Pix2Struct decoding profile (defaults to Config.PIX2STRUCT_DECODING)
+            ocr_mode: 'full' or 'segments' (defaults to Config.OCR_MODE)
+        
+        Yields:
+            Event dictionaries
+        """
+        ocr_mode = validate_ocr_mode(ocr_mode)
+        pipeline_mode = (pipeline_mode or Config.PIPELINE_MODE).lower()
+        if pipeline_mode not in PIPELINE_MODES:
+            raise ValueError(f"Unknown pipeline mode: {pipeline_mode}. Allowed: {PIPELINE_MODES}")
+        
+        print(f"🔄 Streaming image of shape {image.shape} ({pipeline_mode})")
+        total_start = time.perf_counter()
+        timings = {}
+        context = ImageContext(image)
+        
+        yield {
+            'event': 'start',
+            'image_size': {'width': context.size[1], 'height': context.size[0]},
+            'pipeline': {'mode': pipeline_mode, 'ocr_mode': ocr_mode}
+        }
         
-        # Step 1: SAM Segmentation
-        print("📍 Step 1/5: SAM Segmentation")
-        segments = self.sam_service.segment_image(image)
+        stages = {
+            'segmentation': lambda: self.segment_image(
+                context, mask_encoding=mask_encoding, sam_profile=sam_profile
+            ),
+            'layout': lambda: self.analyze_layout(context, decoding_profile=decoding_profile)
+        }
+        if ocr_mode == 'full':
+            stages['ocr'] = lambda: self.extract_text(context)
         
-        # Step 2: Pix2Struct Layout Analysis
-        print("📍 Step 2/5: Pix2Struct Layout Analysis")
-        layout = self.pix2struct_service.analyze_layout(image)
+        if pipeline_mode == 'concurrent':
+            futures = {self.executor.submit(_timed, compute): name for name, compute in stages.items()}
+            
+            # The palette needs no model; compute it here while the models run
+            color_palette, timings['palette'] = _timed(self.extract_colors, context)
+            yield {'event': 'palette', 'color_palette': color_palette}
+            
+            completed = ((futures[future], future.result()) for future in as_completed(futures))
+        else:
+            color_palette, timings['palette'] = _timed(self.extract_colors, context)
+            yield {'event': 'palette', 'color_palette': color_palette}
+            
+            completed = ((name, _timed(compute)) for name, compute in stages.items())
         
-        # Step 3: OCR Text Extraction
-        print("📍 Step 3/5: OCR Text Extraction")
-        ocr_results = self.ocr_service.extract_text(image)
+        results = {}
+        for name, (result, elapsed) in completed:
+            results[name], timings[name] = result, elapsed
+            
+            if name == 'segmentation':
+                yield {'event': 'segmentation', 'total_segments': len(result)}
+                if ocr_mode == 'segments':
+                    results['ocr'], timings['ocr'] = _timed(self.extract_segment_text, context, result)
+                    yield {'event': 'ocr', 'text_elements': results['ocr']}
+            elif name == 'ocr':
+                yield {'event': 'ocr', 'text_elements': result}
+            elif name == 'layout':
+                yield {'event': 'layout', 'layout': result}
+        
+        layers, timings['matching'] = _timed(
+            self._match_segments_with_text, results['segmentation'], results['ocr'], context
+        )
+        for layer in layers:
+            yield {'event': 'layer', 'layer': layer}
+        
+        timings['total'] = time.perf_counter() - total_start
+        observe_stages(timings)
+        print(f"✅ Streamed {len(layers)} editable layers in {timings['total']:.2f}s")
+        yield {
+            'event': 'done',
+            'total_layers': len(layers),
+            'total_segments': len(results['segmentation']),
+            'total_text_elements': len(results['ocr']),
+            'pipeline': {
+                'mode': pipeline_mode,
+                'ocr_mode': ocr_mode,
+                'timings_ms': {name: round(seconds * 1000, 2) for name, seconds in timings.items()}
+            }
+        }
+    
+    def process_batch(self, images: List[np.ndarray], mask_encoding: Optional[str] = None,
+                      sam_profile: Optional[str] = None,
+                      decoding_profile: Optional[str] = None,
+                      ocr_mode: Optional[str] = None) -> Iterator[Tuple[int, Dict]]:
+        """
+        Process one micro-batch of images with batched model calls
         
+        SAM encodes the whole batch in one forward pass, Pix2Struct decodes a
+        padded batch and OCR holds its engine once for the batch; all three run
+        concurrently. In 'segments' OCR mode text is instead recognized per
+        image from its text segments once segmentation is done. Matching and
+        palette extraction then run per image and each result is yielded as
+        soon as it is ready.
+        
+        Args:
+            images: Input images as numpy arrays (RGB)
+            mask_encoding: Mask encoding for segment layers (defaults to Config.MASK_ENCODING)
+            sam_profile: SAM speed profile (defaults to Config.SAM_PROFILE)
+            decoding_profile: Pix2Struct decoding profile (defaults to Config.PIX2STRUCT_DECODING)
+            ocr_mode: 'full' or 'segments' (defaults to Config.OCR_MODE)
+        
+        Yields:
+            (index into images, result dictionary)
+        """
+        mask_encoding = validate_mask_encoding(mask_encoding)
+        sam_profile = validate_sam_profile(sam_profile)
+        decoding_profile = validate_decoding_profile(decoding_profile)
+        ocr_mode = validate_ocr_mode(ocr_mode)
+        print(f"🔄 Processing batch of {len(images)} images")
+        
+        timings = {}
+        contexts = [ImageContext(image) for image in images]
+        
+        futures = {
+            'segmentation': self.executor.submit(
+                _timed, self._cached_batch, 'segmentation', contexts,
+                self._segmentation_params(mask_encoding, sam_profile),
+                lambda batch: self.sam_service.segment_images(
+                    [context.stage_image('segmentation') for context in batch],
+                    mask_encoding=mask_encoding, profile=sam_profile,
+                    output_sizes=[context.size for context in batch]
+                )
+            ),
+            'layout': self.executor.submit(
+                _timed, self._cached_batch, 'layout', contexts,
+                self._layout_params(decoding_profile),
+                lambda batch: self.pix2struct_service.analyze_layout_batch(
+                    [context.stage_image('layout') for context in batch], profile=decoding_profile,
+                    output_sizes=[context.size for context in batch]
+                )
+            )
+        }
+        if ocr_mode == 'full':
+            futures['ocr'] = self.executor.submit(
+                _timed, self._cached_batch, 'ocr', contexts, self._ocr_params(),
+                lambda batch: self.ocr_service.extract_text_batch(
+                    [context.stage_image('ocr') for context in batch],
+                    output_sizes=[context.size for context in batch]
+                )
+            )
+        
+        stage_results = {}
+        for name, future in futures.items():
+            stage_results[name], timings[name] = future.result()
+        # Batch-wide stages are recorded once; the rest per image below
+        observe_stages(timings)
+        
+        for idx, context in enumerate(contexts):
+            image_timings = dict(timings)
+            segments = stage_results['segmentation'][idx]
+            if ocr_mode == 'segments':
+                ocr_results, image_timings['ocr'] = _timed(self.extract_segment_text, context, segments)
+            else:
+                ocr_results = stage_results['ocr'][idx]
+            
+            result = self._finish_image(
+                context,
+                segments,
+                stage_results['layout'][idx],
+                ocr_results,
+                image_timings
+            )
+            observe_stages(image_timings, skip=tuple(timings))
+            result['pipeline'] = {
+                'mode': 'batch',
+                'ocr_mode': ocr_mode,
+                'batch_size': len(images),
+                'timings_ms': {name: round(seconds * 1000, 2) for name, seconds in image_timings.items()}
+            }
+            yield idx, result
+    
+    def _finish_image(self, context: ImageContext, segments: List[Dict], layout: Dict,
+                      ocr_results: List[Dict], timings: Dict) -> Dict:
+        """Match segments with text, extract the palette and assemble the result"""
         # Step 4: Match segments with text
         print("📍 Step 4/5: Matching Segments with Text")
-        matched_layers = self._match_segments_with_text(segments, ocr_results, image)
+        matched_layers, timings['matching'] = _timed(
+            self._match_segments_with_text, segments, ocr_results, context
+        )
         
         # Step 5: Extract colors
         print("📍 Step 5/5: Extracting Color Palette")
-        color_palette = self._extract_color_palette(image)
+        color_palette, timings['palette'] = _timed(self.extract_colors, context)
         
         # Combine all results
-        result = {
+        return {
             'layers': matched_layers,
             'layout': layout,
             'color_palette': color_palette,
             'image_size': {
-                'width': image.shape[1],
-                'height': image.shape[0]
+                'width': context.size[1],
+                'height': context.size[0]
             },
             'total_segments': len(segments),
             'total_text_elements': len(ocr_results)
         }
-        
-        print(f"✅ Processing complete: {len(matched_layers)} editable layers created")
-        return result
     
     def _match_segments_with_text(self, segments: List[Dict], ocr_results: List[Dict], 
-                                   image: np.ndarray) -> List[Dict]:
+                                   context: ImageContext) -> List[Dict]:
         """
         Match SAM segments with OCR text results
         
         Args:
             segments: List of SAM segments
             ocr_results: List of OCR text elements
-            image: Original image
+            context: Original image context (segments and text share its coordinates)
         
         Returns:
             List of matched editable layers
         """
+        image = context.image
         layers = []
         matched_text_ids = set()
         
+        # Pairwise IoU and center tests for all segments and texts at once
+        assignments = match_segments_to_text(segments, ocr_results)
+        
+        # Fill colors of all non-text segments from one quantized pass
+        fill_colors = self._get_fill_colors(
+            image, [seg for seg, text_idx in zip(segments, assignments) if text_idx is None]
+        )
+        
+        # Color, weight and alignment of every text box in one batched stage
+        styles = text_styles(
+            image, context.gray, [text['bbox'] for text in ocr_results],
+            bold_stroke_ratio=Config.TEXT_BOLD_STROKE_RATIO
+        )
+        
         # Process each segment
-        for segment in segments:
+        for segment, text_idx in zip(segments, assignments):
             layer = {
                 'id': segment['id'],
                 'type': segment['type'],
                 'bbox': segment['bbox'],
                 'center': segment['center'],
                 'area': segment['area'],
-                'mask': segment['mask'],
+                'mask': segment['mask'],  # Already compact-encoded by SAMService
                 'editable': True,
                 'locked': False,
                 'visible': True
             }
             
-            # Try to match with text
-            matching_text = self._find_matching_text(segment, ocr_results, matched_text_ids)
+            matching_text = ocr_results[text_idx] if text_idx is not None else None
             
             if matching_text:
                 # This is a text layer
+                style = styles[text_idx]
                 layer['type'] = 'text'
                 layer['content'] = matching_text['content']
                 layer['text'] = {
                     'content': matching_text['content'],
                     'font_size': matching_text['font_size'],
                     'font_family': 'Arial',  # Default, can be enhanced with font recognition
-                    'color': self._get_text_color(image, matching_text['bbox']),
-                    'bold': False,
+                    'color': style['color'],
+                    'bold': style['bold'],
+                    'stroke_width': style['stroke_width'],
                     'italic': False,
                     'underline': False,
-                    'align': self._detect_text_alignment(matching_text['bbox'], image.shape[1])
+                    'align': style['align']
                 }
                 layer['confidence'] = matching_text['confidence']
                 matched_text_ids.add(matching_text['id'])
@@ -120,7 +565,7 @@ class ImageProcessor:
                 # Not a text layer - could be shape, icon, or background
                 layer['content'] = None
                 layer['style'] = {
-                    'fill_color': self._get_dominant_color(image, segment['bbox']),
+                    'fill_color': fill_colors[segment['id']],
                     'stroke_color': None,
                     'stroke_width': 0
                 }
@@ -128,7 +573,7 @@ class ImageProcessor:
             layers.append(layer)
         
         # Add any unmatched text as separate layers
-        for text in ocr_results:
+        for text, style in zip(ocr_results, styles):
             if text['id'] not in matched_text_ids:
                 layer = {
                     'id': text['id'],
@@ -140,11 +585,12 @@ class ImageProcessor:
                         'content': text['content'],
                         'font_size': text['font_size'],
                         'font_family': 'Arial',
-                        'color': self._get_text_color(image, text['bbox']),
-                        'bold': False,
+                        'color': style['color'],
+                        'bold': style['bold'],
+                        'stroke_width': style['stroke_width'],
                         'italic': False,
                         'underline': False,
-                        'align': self._detect_text_alignment(text['bbox'], image.shape[1])
+                        'align': style['align']
                     },
                     'confidence': text['confidence'],
                     'editable': True,
@@ -161,125 +607,34 @@ class ImageProcessor:
         
         return layers
     
-    def _find_matching_text(self, segment: Dict, ocr_results: List[Dict], 
-                           matched_ids: set) -> Optional[Dict]:
+    def _get_fill_colors(self, image: np.ndarray, segments: List[Dict]) -> Dict[str, str]:
         """
-        Find OCR text that matches a segment
+        Dominant color of each segment's masked pixels as hex strings
         
         Args:
-            segment: SAM segment
-            ocr_results: List of OCR results
-            matched_ids: Set of already matched text IDs
+            image: Original image
+            segments: SAM segments with encoded masks
         
         Returns:
-            Matching text element or None
+            Mapping of segment id to hex color
         """
-        seg_bbox = segment['bbox']
-        seg_center = segment['center']
-        
-        best_match = None
-        best_iou = 0.0
+        def regions():
+            # Decode lazily: full-resolution masks are only needed one at a time
+            for segment in segments:
+                try:
+                    mask = decode_mask(segment['mask']) if segment.get('mask') else None
+                except Exception as e:
+                    print(f"⚠️  Error decoding mask for {segment['id']}: {str(e)}")
+                    mask = None
+                yield segment['bbox'], mask
         
-        for text in ocr_results:
-            if text['id'] in matched_ids:
-                continue
-            
-            # Calculate IoU (Intersection over Union)
-            iou = self._calculate_iou(seg_bbox, text['bbox'])
-            
-            # Check if text center is inside segment
-            text_center = text['center']
-            center_inside = (
-                seg_bbox['x'] <= text_center['x'] <= seg_bbox['x'] + seg_bbox['width'] and
-                seg_bbox['y'] <= text_center['y'] <= seg_bbox['y'] + seg_bbox['height']
-            )
-            
-            # Match if high IoU or center is inside
-            if iou > 0.5 or (center_inside and iou > 0.3):
-                if iou > best_iou:
-                    best_iou = iou
-                    best_match = text
-        
-        return best_match
-    
-    def _calculate_iou(self, bbox1: Dict, bbox2: Dict) -> float:
-        """Calculate Intersection over Union for two bounding boxes"""
-        x1_min = bbox1['x']
-        y1_min = bbox1['y']
-        x1_max = bbox1['x'] + bbox1['width']
-        y1_max = bbox1['y'] + bbox1['height']
-        
-        x2_min = bbox2['x']
-        y2_min = bbox2['y']
-        x2_max = bbox2['x'] + bbox2['width']
-        y2_max = bbox2['y'] + bbox2['height']
-        
-        # Calculate intersection
-        x_inter_min = max(x1_min, x2_min)
-        y_inter_min = max(y1_min, y2_min)
-        x_inter_max = min(x1_max, x2_max)
-        y_inter_max = min(y1_max, y2_max)
-        
-        if x_inter_max < x_inter_min or y_inter_max < y_inter_min:
-            return 0.0
-        
-        inter_area = (x_inter_max - x_inter_min) * (y_inter_max - y_inter_min)
-        
-        # Calculate union
-        bbox1_area = bbox1['width'] * bbox1['height']
-        bbox2_area = bbox2['width'] * bbox2['height']
-        union_area = bbox1_area + bbox2_area - inter_area
-        
-        if union_area == 0:
-            return 0.0
-        
-        return inter_area / union_area
-    
-    def _get_text_color(self, image: np.ndarray, bbox: Dict) -> str:
-        """Get text color as hex string"""
-        rgb = self.ocr_service.detect_font_color(image, bbox)
-        return '#{:02x}{:02x}{:02x}'.format(*rgb)
-    
-    def _get_dominant_color(self, image: np.ndarray, bbox: Dict) -> str:
-        """Get dominant color in region as hex string"""
         try:
-            x, y, w, h = bbox['x'], bbox['y'], bbox['width'], bbox['height']
-            region = image[y:y+h, x:x+w]
-            
-            if region.size == 0:
-                return '#000000'
-            
-            # Convert to PIL Image
-            pil_image = Image.fromarray(region)
-            
-            # Save to BytesIO
-            img_io = BytesIO()
-            pil_image.save(img_io, format='PNG')
-            img_io.seek(0)
-            
-            # Extract dominant color
-            color_thief = ColorThief(img_io)
-            dominant_color = color_thief.get_color(quality=1)
-            
-            return '#{:02x}{:02x}{:02x}'.format(*dominant_color)
-        
+            colors = dominant_colors(image, regions())
         except Exception as e:
-            print(f"⚠️  Error getting dominant color: {str(e)}")
-            return '#000000'
-    
-    def _detect_text_alignment(self, bbox: Dict, image_width: int) -> str:
-        """Detect text alignment based on position"""
-        center_x = bbox['x'] + bbox['width'] / 2
-        
-        left_threshold = image_width * 0.33
-        right_threshold = image_width * 0.67
+            print(f"⚠️  Error getting dominant colors: {str(e)}")
+            colors = [(0, 0, 0)] * len(segments)
         
-        if center_x < left_threshold:
-            return 'left'
-        elif center_x > right_threshold:
-            return 'right'
-        else:
-            return 'center'
+        return {segment['id']: to_hex(rgb) for segment, rgb in zip(segments, colors)}
     
     def _extract_color_palette(self, image: np.ndarray, num_colors: int = 8) -> List[Dict]:
         """
@@ -293,25 +648,15 @@ class ImageProcessor:
             List of color dictionaries
         """
         try:
-            # Convert to PIL Image
-            pil_image = Image.fromarray(image)
-            
-            # Save to BytesIO
-            img_io = BytesIO()
-            pil_image.save(img_io, format='PNG')
-            img_io.seek(0)
-            
-            # Extract palette
-            color_thief = ColorThief(img_io)
-            palette = color_thief.get_palette(color_count=num_colors, quality=1)
+            # Quantized histogram directly on the RGB array
+            palette = extract_palette(image, num_colors, max_pixels=Config.PALETTE_MAX_PIXELS)
             
             # Convert to hex and create color objects
             colors = []
             for idx, rgb in enumerate(palette):
-                hex_color = '#{:02x}{:02x}{:02x}'.format(*rgb)
                 colors.append({
                     'id': f'color_{idx}',
-                    'hex': hex_color,
+                    'hex': to_hex(rgb),
                     'rgb': {'r': rgb[0], 'g': rgb[1], 'b': rgb[2]},
                     'name': self._get_color_name(rgb)
                 })
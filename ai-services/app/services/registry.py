@@ -0,0 +1,102 @@
+import threading
+import time
+from typing import Any, Callable, Dict, List
+from ..utils.helpers import get_rss_bytes
+
+
+class ServiceRegistry:
+    """Thread-safe registry that constructs each model service on first use"""
+    
+    def __init__(self):
+        self._factories = {}
+        self._services = {}
+        self._locks = {}
+        self._stats = {}
+    
+    def register(self, name: str, factory: Callable[[], Any]):
+        """
+        Register a service factory
+        
+        Args:
+            name: Service name (e.g. 'sam')
+            factory: Zero-argument callable that loads and returns the service
+        """
+        self._factories[name] = factory
+        self._locks[name] = threading.Lock()
+        self._stats[name] = {'loaded': False, 'load_time': None, 'rss_delta_bytes': None, 'error': None}
+    
+    def get(self, name: str) -> Any:
+        """
+        Return the named service, loading it on first use
+        
+        Concurrent first calls for the same service wait for a single load;
+        different services load independently.
+        """
+        service = self._services.get(name)
+        if service is not None:
+            return service
+        
+        if name not in self._factories:
+            raise KeyError(f"Unknown service: {name}")
+        
+        with self._locks[name]:
+            service = self._services.get(name)
+            if service is not None:
+                return service
+            
+            rss_before = get_rss_bytes()
+            start = time.perf_counter()
+            
+            try:
+                service = self._factories[name]()
+            except Exception as e:
+                self._stats[name]['error'] = str(e)
+                raise
+            
+            load_time = time.perf_counter() - start
+            rss_after = get_rss_bytes()
+            
+            self._stats[name] = {
+                'loaded': True,
+                'load_time': round(load_time, 3),
+                'rss_delta_bytes': rss_after - rss_before if rss_before is not None and rss_after is not None else None,
+                'error': None
+            }
+            self._services[name] = service
+            print(f"✅ Service '{name}' loaded in {load_time:.2f}s")
+        
+        return service
+    
+    def is_loaded(self, name: str) -> bool:
+        """Whether the named service has been constructed"""
+        return name in self._services
+    
+    def loaded(self) -> List[str]:
+        """Names of constructed services"""
+        return [name for name in self._factories if name in self._services]
+    
+    def stats(self) -> Dict:
+        """Per-service load state, load time (seconds) and RSS growth during load"""
+        return {name: dict(stats) for name, stats in self._stats.items()}
+
+
+def _create_sam_service():
+    from .sam_service import SAMService
+    return SAMService()
+
+
+def _create_pix2struct_service():
+    from .pix2struct_service import Pix2StructService
+    return Pix2StructService()
+
+
+def _create_ocr_service():
+    from .ocr_service import OCRService
+    return OCRService()
+
+
+# Shared by every ImageProcessor; model modules are imported on first use too
+registry = ServiceRegistry()
+registry.register('sam', _create_sam_service)
+registry.register('pix2struct', _create_pix2struct_service)
+registry.register('ocr', _create_ocr_service)
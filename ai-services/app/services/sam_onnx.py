@@ -0,0 +1,241 @@
+import inspect
+import os
+import shutil
+import numpy as np
+import torch
+from typing import Optional, Tuple
+from segment_anything.utils.onnx import SamOnnxModel
+from ..config import Config
+from .sam_service import CachedSamPredictor, EmbeddingCache
+
+
+class _EncoderExport(torch.nn.Module):
+    """Image encoder on a preprocessed (B, 3, 1024, 1024) batch"""
+    
+    def __init__(self, model):
+        super().__init__()
+        self.image_encoder = model.image_encoder
+    
+    def forward(self, images: torch.Tensor) -> torch.Tensor:
+        return self.image_encoder(images)
+
+
+class _DecoderExport(SamOnnxModel):
+    """
+    Prompt encoder + mask decoder returning every mask token at low resolution
+    
+    Mask selection and upscaling stay in PyTorch so both backends share
+    postprocess_masks exactly.
+    """
+    
+    def __init__(self, model):
+        super().__init__(model, return_single_mask=False)
+    
+    def forward(self, image_embeddings: torch.Tensor, point_coords: torch.Tensor,
+                point_labels: torch.Tensor, mask_input: torch.Tensor,
+                has_mask_input: torch.Tensor) -> Tuple[torch.Tensor, torch.Tensor]:
+        sparse_embedding = self._embed_points(point_coords, point_labels)
+        dense_embedding = self._embed_masks(mask_input, has_mask_input)
+        return self.model.mask_decoder.predict_masks(
+            image_embeddings=image_embeddings,
+            image_pe=self.model.prompt_encoder.get_dense_pe(),
+            sparse_prompt_embeddings=sparse_embedding,
+            dense_prompt_embeddings=dense_embedding
+        )
+
+
+class SamOnnxRuntime:
+    """
+    ONNX Runtime sessions for the SAM image encoder and mask decoder
+    
+    Both graphs are exported from the loaded PyTorch model the first time a
+    checkpoint is used and cached under MODELS_DIR/onnx/<checkpoint>/.
+    """
+    
+    OPSET = 17
+    
+    def __init__(self, model, device: str = 'cpu', models_dir: Optional[str] = None):
+        """
+        Args:
+            model: Loaded segment_anything Sam model
+            device: 'cpu' or 'cuda' (CUDA is used when onnxruntime-gpu provides it)
+            models_dir: Export cache root (defaults to Config.MODELS_DIR)
+        """
+        import onnxruntime as ort
+        
+        self.model = model
+        self.device = device
+        self.export_dir = os.path.join(
+            models_dir or Config.MODELS_DIR, 'onnx', os.path.splitext(Config.SAM_CHECKPOINT)[0]
+        )
+        
+        if not os.path.exists(os.path.join(self.export_dir, 'decoder.onnx')):
+            self._export()
+        
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        # The CPU arena never returns memory: it would pin the encoder's
+        # activations and the largest prompt batch (several GB) for good
+        options.enable_cpu_mem_arena = False
+        if Config.SAM_ONNX_THREADS > 0:
+            options.intra_op_num_threads = Config.SAM_ONNX_THREADS
+        
+        providers = ['CPUExecutionProvider']
+        if device == 'cuda' and 'CUDAExecutionProvider' in ort.get_available_providers():
+            providers.insert(0, 'CUDAExecutionProvider')
+        
+        self.encoder = ort.InferenceSession(
+            os.path.join(self.export_dir, 'encoder.onnx'), options, providers=providers
+        )
+        self.decoder = ort.InferenceSession(
+            os.path.join(self.export_dir, 'decoder.onnx'), options, providers=providers
+        )
+        print(f"✅ SAM ONNX Runtime sessions ready ({', '.join(self.encoder.get_providers())})")
+    
+    def _export(self):
+        """Export encoder and decoder into a temp directory, then move it into place"""
+        print(f"📦 Exporting SAM to ONNX: {self.export_dir} (one-time)")
+        tmp_dir = f'{self.export_dir}.tmp-{os.getpid()}'
+        os.makedirs(tmp_dir, exist_ok=True)
+        
+        try:
+            img_size = self.model.image_encoder.img_size
+            embed_dim = self.model.prompt_encoder.embed_dim
+            embed_size = self.model.prompt_encoder.image_embedding_size
+            mask_size = [4 * s for s in embed_size]
+            
+            with torch.no_grad():
+                self._export_graph(
+                    _EncoderExport(self.model).cpu(),
+                    (torch.randn(1, 3, img_size, img_size),),
+                    os.path.join(tmp_dir, 'encoder.onnx'),
+                    input_names=['images'],
+                    output_names=['image_embeddings'],
+                    dynamic_axes={'images': {0: 'batch'}, 'image_embeddings': {0: 'batch'}}
+                )
+                self._export_graph(
+                    _DecoderExport(self.model).cpu(),
+                    (
+                        torch.randn(1, embed_dim, *embed_size),
+                        torch.randint(0, img_size, (1, 2, 2), dtype=torch.float),
+                        torch.tensor([[1, -1]], dtype=torch.float),
+                        torch.zeros(1, 1, *mask_size),
+                        torch.zeros(1)
+                    ),
+                    os.path.join(tmp_dir, 'decoder.onnx'),
+                    input_names=['image_embeddings', 'point_coords', 'point_labels',
+                                 'mask_input', 'has_mask_input'],
+                    output_names=['low_res_masks', 'iou_predictions'],
+                    dynamic_axes={
+                        'point_coords': {0: 'prompts', 1: 'num_points'},
+                        'point_labels': {0: 'prompts', 1: 'num_points'},
+                        'mask_input': {0: 'mask_batch'},
+                        'low_res_masks': {0: 'prompts'},
+                        'iou_predictions': {0: 'prompts'}
+                    }
+                )
+            
+            self.model.to(self.device)
+            if os.path.exists(self.export_dir):
+                shutil.rmtree(self.export_dir)
+            os.replace(tmp_dir, self.export_dir)
+        except Exception as e:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise Exception(f"SAM ONNX export failed: {str(e)}")
+    
+    def _export_graph(self, module, args, path, **kwargs):
+        # Tracing exporter: handles the dynamic prompt batch in predict_masks
+        if 'dynamo' in inspect.signature(torch.onnx.export).parameters:
+            kwargs['dynamo'] = False
+        torch.onnx.export(module, args, path, opset_version=self.OPSET,
+                          do_constant_folding=True, **kwargs)
+    
+    def encode(self, images: torch.Tensor) -> torch.Tensor:
+        """Run the image encoder on a preprocessed batch"""
+        outputs = self.encoder.run(None, {'images': images.detach().cpu().numpy().astype(np.float32)})
+        return torch.from_numpy(outputs[0]).to(self.device)
+    
+    def decode(self, image_embeddings: torch.Tensor, point_coords: np.ndarray,
+               point_labels: np.ndarray, mask_input: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Run the prompt encoder and mask decoder
+        
+        Args:
+            image_embeddings: (1, C, H, W) features of one image
+            point_coords: (B, N, 2) prompts in the resized input frame
+            point_labels: (B, N) labels (1 fg, 0 bg, 2/3 box corners, -1 padding)
+            mask_input: Optional (B or 1, 1, 256, 256) low-res mask logits
+        
+        Returns:
+            (low_res_masks (B, 4, 256, 256), iou_predictions (B, 4)) for every mask token
+        """
+        if mask_input is None:
+            mask_size = [4 * s for s in self.model.prompt_encoder.image_embedding_size]
+            mask_input = np.zeros((1, 1, *mask_size), dtype=np.float32)
+            has_mask_input = np.zeros(1, dtype=np.float32)
+        else:
+            has_mask_input = np.ones(1, dtype=np.float32)
+        
+        return self.decoder.run(None, {
+            'image_embeddings': image_embeddings.detach().cpu().numpy().astype(np.float32),
+            'point_coords': point_coords.astype(np.float32),
+            'point_labels': point_labels.astype(np.float32),
+            'mask_input': mask_input.astype(np.float32),
+            'has_mask_input': has_mask_input
+        })
+
+
+class OnnxSamPredictor(CachedSamPredictor):
+    """CachedSamPredictor running the encoder and mask decoder in ONNX Runtime"""
+    
+    def __init__(self, sam_model, embedding_cache: EmbeddingCache, runtime: SamOnnxRuntime):
+        super().__init__(sam_model, embedding_cache)
+        self.runtime = runtime
+    
+    @torch.no_grad()
+    def set_torch_image(self, transformed_image: torch.Tensor, original_image_size: Tuple[int, ...]) -> None:
+        self.reset_image()
+        self.original_size = original_image_size
+        self.input_size = tuple(transformed_image.shape[-2:])
+        self.features = self.runtime.encode(self.model.preprocess(transformed_image))
+        self.is_image_set = True
+    
+    @torch.no_grad()
+    def predict_torch(self, point_coords: Optional[torch.Tensor], point_labels: Optional[torch.Tensor],
+                      boxes: Optional[torch.Tensor] = None, mask_input: Optional[torch.Tensor] = None,
+                      multimask_output: bool = True, return_logits: bool = False):
+        if not self.is_image_set:
+            raise RuntimeError("An image must be set with .set_image(...) before mask prediction.")
+        
+        # Same prompt layout as PromptEncoder: points, then box corners
+        # (labels 2 and 3) or a padding point (label -1) when there is no box
+        coords, labels = [], []
+        if point_coords is not None:
+            coords.append(point_coords.cpu().numpy())
+            labels.append(point_labels.cpu().numpy())
+        
+        if boxes is not None:
+            corners = boxes.cpu().numpy().reshape(-1, 2, 2)
+            coords.append(corners)
+            labels.append(np.tile(np.array([[2, 3]], dtype=np.float32), (corners.shape[0], 1)))
+        else:
+            batch = coords[0].shape[0] if coords else 1
+            coords.append(np.zeros((batch, 1, 2), dtype=np.float32))
+            labels.append(-np.ones((batch, 1), dtype=np.float32))
+        
+        low_res_masks, iou_predictions = self.runtime.decode(
+            self.features,
+            np.concatenate(coords, axis=1),
+            np.concatenate(labels, axis=1),
+            mask_input.cpu().numpy() if mask_input is not None else None
+        )
+        
+        mask_slice = slice(1, None) if multimask_output else slice(0, 1)
+        low_res_masks = torch.from_numpy(low_res_masks[:, mask_slice]).to(self.device)
+        iou_predictions = torch.from_numpy(iou_predictions[:, mask_slice]).to(self.device)
+        
+        masks = self.model.postprocess_masks(low_res_masks, self.input_size, self.original_size)
+        if not return_logits:
+            masks = masks > self.model.mask_threshold
+        
+        return masks, iou_predictions, low_res_masks
@@ -4,18 +4,274 @@ import cv2
 from typing import List, Dict, Tuple, Optional
 from segment_anything import sam_model_registry, SamAutomaticMaskGenerator, SamPredictor
 from ..config import Config
+from ..utils.cache import hash_image
+from ..utils.image_context import fit_size, resize_mask
+from ..utils.mask_encoding import encode_mask, validate_mask_encoding
+import json
 import os
+import threading
+import time
 import urllib.request
+from collections import OrderedDict
+
+
+# Automatic mask generation profiles: grid density, crop layers, prompt batch
+# size and quality thresholds. 'quality' matches the original settings.
+SAM_PROFILES = {
+    'fast': {
+        'points_per_side': 16,
+        'points_per_batch': 128,
+        'pred_iou_thresh': 0.88,
+        'stability_score_thresh': 0.92,
+        'crop_n_layers': 0,
+        'crop_n_points_downscale_factor': 1
+    },
+    'balanced': {
+        'points_per_side': 24,
+        'points_per_batch': 96,
+        'pred_iou_thresh': 0.86,
+        'stability_score_thresh': 0.92,
+        'crop_n_layers': 0,
+        'crop_n_points_downscale_factor': 1
+    },
+    'quality': {
+        'points_per_side': 32,
+        'points_per_batch': 64,
+        'pred_iou_thresh': 0.86,
+        'stability_score_thresh': 0.92,
+        'crop_n_layers': 1,
+        'crop_n_points_downscale_factor': 2
+    }
+}
+
+
+def validate_sam_profile(profile: Optional[str]) -> str:
+    """
+    Normalize and validate a requested SAM speed profile
+    
+    Args:
+        profile: Requested profile name (None uses Config.SAM_PROFILE)
+    
+    Returns:
+        Lower-cased profile name
+    """
+    profile = (profile or Config.SAM_PROFILE).lower()
+    
+    if profile not in SAM_PROFILES:
+        raise ValueError(f"Unknown SAM profile: {profile}. Allowed: {tuple(SAM_PROFILES)}")
+    
+    return profile
+
+
+class UnknownImageError(Exception):
+    """Raised when a prompt refers to an image_id whose embedding is not cached"""
+
+
+class EmbeddingCache:
+    """LRU cache of SAM image embeddings bounded by bytes, optionally persisted as .npy"""
+    
+    def __init__(self, max_bytes: int, disk_dir: Optional[str] = None, device: str = 'cpu'):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir or None
+        self.device = device
+        self._entries = OrderedDict()  # image hash -> entry dict
+        self._prefetched = set()  # Keys put for a caller that has not looked them up yet
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'disk_hits': 0, 'misses': 0, 'evictions': 0}
+        
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+    
+    def get(self, key: str) -> Optional[Dict]:
+        """
+        Look up an embedding
+        
+        Returns:
+            Dict with 'features', 'original_size', 'input_size' (and optionally
+            'display_size') or None
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                if key in self._prefetched:
+                    self._prefetched.discard(key)
+                    self._stats['misses'] += 1
+                else:
+                    self._stats['hits'] += 1
+                return entry
+        
+        entry = self._read_disk(key)
+        
+        with self._lock:
+            if entry is None:
+                self._stats['misses'] += 1
+                return None
+            self._stats['disk_hits'] += 1
+            self._insert(key, entry)
+        return entry
+    
+    def peek(self, key: str) -> Optional[Dict]:
+        """In-memory entry for key, without counting a lookup or reading disk"""
+        with self._lock:
+            return self._entries.get(key)
+    
+    def contains(self, key: str) -> bool:
+        """Whether key is in memory or on disk, without counting a lookup"""
+        if self.peek(key) is not None:
+            return True
+        return self.disk_dir is not None and os.path.exists(os.path.join(self.disk_dir, f'{key}.npy'))
+    
+    def put(self, key: str, entry: Dict, prefetched: bool = False):
+        """
+        Store an embedding in memory (and on disk if enabled)
+        
+        Args:
+            prefetched: Computed ahead of a lookup that should count as the
+                miss (batch encoding before set_image)
+        """
+        with self._lock:
+            self._insert(key, entry)
+            if prefetched:
+                self._prefetched.add(key)
+        self._write_disk(key, entry)
+    
+    def clear(self):
+        """Drop all in-memory embeddings (disk entries are kept)"""
+        with self._lock:
+            self._entries.clear()
+            self._prefetched.clear()
+            self._bytes = 0
+    
+    def stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entries)
+            stats['bytes'] = self._bytes
+        stats['max_bytes'] = self.max_bytes
+        stats['disk_enabled'] = self.disk_dir is not None
+        return stats
+    
+    def _insert(self, key: str, entry: Dict):
+        size = entry['features'].element_size() * entry['features'].nelement()
+        if size > self.max_bytes:
+            return
+        
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= old['features'].element_size() * old['features'].nelement()
+        
+        self._entries[key] = entry
+        self._bytes += size
+        
+        while self._bytes > self.max_bytes and self._entries:
+            evicted_key, evicted = self._entries.popitem(last=False)
+            self._prefetched.discard(evicted_key)
+            self._bytes -= evicted['features'].element_size() * evicted['features'].nelement()
+            self._stats['evictions'] += 1
+    
+    def _read_disk(self, key: str) -> Optional[Dict]:
+        if not self.disk_dir:
+            return None
+        
+        path = os.path.join(self.disk_dir, f'{key}.npy')
+        if not os.path.exists(path):
+            return None
+        
+        try:
+            with open(os.path.join(self.disk_dir, f'{key}.json')) as f:
+                meta = json.load(f)
+            features = torch.from_numpy(np.load(path)).to(self.device)
+            entry = {'features': features}
+            entry.update({name: tuple(size) for name, size in meta.items()})
+            return entry
+        except Exception as e:
+            print(f"⚠️  Error reading SAM embedding {key}: {str(e)}")
+            return None
+    
+    def _write_disk(self, key: str, entry: Dict):
+        if not self.disk_dir:
+            return
+        
+        # Other gunicorn workers read this directory too, so each file appears
+        # complete; the .json first, since readers look for the .npy
+        path = os.path.join(self.disk_dir, key)
+        tmp_suffix = f'{os.getpid()}.{threading.get_ident()}.tmp'
+        try:
+            meta = {name: list(value) for name, value in entry.items() if name != 'features'}
+            with open(f'{path}.json.{tmp_suffix}', 'w') as f:
+                json.dump(meta, f)
+            os.replace(f'{path}.json.{tmp_suffix}', f'{path}.json')
+            with open(f'{path}.npy.{tmp_suffix}', 'wb') as f:
+                np.save(f, entry['features'].cpu().numpy())
+            os.replace(f'{path}.npy.{tmp_suffix}', f'{path}.npy')
+        except Exception as e:
+            print(f"⚠️  Error writing SAM embedding {key}: {str(e)}")
+
+
+class CachedSamPredictor(SamPredictor):
+    """SamPredictor that reuses image embeddings through an EmbeddingCache"""
+    
+    def __init__(self, sam_model, embedding_cache: EmbeddingCache):
+        super().__init__(sam_model)
+        self.embedding_cache = embedding_cache
+    
+    def set_image(self, image: np.ndarray, image_format: str = "RGB") -> bool:
+        """Set the image, returning True when its embedding came from the cache"""
+        key = hash_image(image)
+        
+        if self.restore_embedding(key):
+            return True
+        
+        super().set_image(image, image_format)
+        self.embedding_cache.put(key, {
+            'features': self.features,
+            'original_size': tuple(self.original_size),
+            'input_size': tuple(self.input_size)
+        })
+        return False
+    
+    def restore_embedding(self, key: str) -> bool:
+        """Load a cached embedding into the predictor, returning False on a miss"""
+        entry = self.embedding_cache.get(key)
+        
+        if entry is None:
+            return False
+        
+        self.reset_image()
+        self.features = entry['features']
+        self.original_size = entry['original_size']
+        self.input_size = entry['input_size']
+        self.is_image_set = True
+        return True
+
+
+SAM_BACKENDS = ('torch', 'onnx', 'stub')
 
 
 class SAMService:
     """Service for Segment Anything Model (SAM) integration"""
     
-    def __init__(self):
+    def __init__(self, backend: Optional[str] = None):
+        """
+        Args:
+            backend: 'torch' or 'onnx' execution of the encoder and mask decoder,
+                or 'stub' for synthetic masks without weights (defaults to
+                Config.SAM_BACKEND)
+        """
         self.device = Config.DEVICE
+        self.backend = (backend or Config.SAM_BACKEND).lower()
         self.model = None
+        self.runtime = None
         self.mask_generator = None
+        self.mask_generators = {}
         self.predictor = None
+        self.lock = threading.Lock()  # SAM model/predictor state is not thread-safe
+        
+        if self.backend not in SAM_BACKENDS:
+            raise ValueError(f"Unknown SAM backend: {self.backend}. Allowed: {SAM_BACKENDS}")
+        
         self._load_model()
     
     def _download_checkpoint(self):
@@ -49,6 +305,10 @@ class SAMService:
     
     def _load_model(self):
         """Load SAM model with pretrained weights"""
+        if self.backend == 'stub':
+            self._load_stub()
+            return
+        
         try:
             checkpoint_path = self._download_checkpoint()
             
@@ -56,55 +316,83 @@ class SAMService:
             self.model = sam_model_registry[Config.SAM_MODEL_TYPE](checkpoint=checkpoint_path)
             self.model.to(device=self.device)
             
-            # Initialize mask generator for automatic segmentation
-            self.mask_generator = SamAutomaticMaskGenerator(
-                model=self.model,
-                points_per_side=32,
-                pred_iou_thresh=0.86,
-                stability_score_thresh=0.92,
-                crop_n_layers=1,
-                crop_n_points_downscale_factor=2,
-                min_mask_region_area=Config.MIN_SEGMENT_AREA
+            # Initialize predictor for prompt-based segmentation, shared with the
+            # mask generators so all of them reuse the same cached image embeddings
+            self.embedding_cache = EmbeddingCache(
+                Config.SAM_EMBEDDING_CACHE_BYTES,
+                Config.SAM_EMBEDDING_CACHE_DIR,
+                self.device
             )
+            if self.backend == 'onnx':
+                from .sam_onnx import OnnxSamPredictor, SamOnnxRuntime
+                self.runtime = SamOnnxRuntime(self.model, self.device)
+                self.predictor = OnnxSamPredictor(self.model, self.embedding_cache, self.runtime)
+            else:
+                self.predictor = CachedSamPredictor(self.model, self.embedding_cache)
             
-            # Initialize predictor for prompt-based segmentation
-            self.predictor = SamPredictor(self.model)
+            # Pre-build one mask generator per speed profile so switching is free
+            for name, params in SAM_PROFILES.items():
+                generator = SamAutomaticMaskGenerator(
+                    model=self.model,
+                    min_mask_region_area=Config.MIN_SEGMENT_AREA,
+                    **params
+                )
+                generator.predictor = self.predictor
+                self.mask_generators[name] = generator
             
-            print(f"✅ SAM model loaded successfully on {self.device}")
+            self.mask_generator = self.mask_generators[validate_sam_profile(None)]
+            
+            print(f"✅ SAM model loaded successfully on {self.device} ({self.backend} backend)")
         except Exception as e:
             raise Exception(f"Failed to load SAM model: {str(e)}")
     
-    def segment_image(self, image: np.ndarray) -> List[Dict]:
+    def _load_stub(self):
+        """Synthetic predictor and mask generators (see stub_models), no weights"""
+        from .stub_models import StubMaskGenerator, StubSamPredictor
+        
+        self.embedding_cache = EmbeddingCache(
+            Config.SAM_EMBEDDING_CACHE_BYTES,
+            Config.SAM_EMBEDDING_CACHE_DIR,
+            'cpu'
+        )
+        self.predictor = StubSamPredictor(self.embedding_cache)
+        for name, params in SAM_PROFILES.items():
+            generator = StubMaskGenerator(**params)
+            generator.predictor = self.predictor
+            self.mask_generators[name] = generator
+        
+        self.mask_generator = self.mask_generators[validate_sam_profile(None)]
+        print(f"✅ SAM stub backend ready ({Config.STUB_SAM_SEGMENTS} masks per image)")
+    
+    def segment_image(self, image: np.ndarray, mask_encoding: Optional[str] = None,
+                      profile: Optional[str] = None,
+                      output_size: Optional[Tuple[int, int]] = None) -> List[Dict]:
         """
         Perform automatic segmentation on image
         
         Args:
             image: Input image as numpy array (RGB)
+            mask_encoding: Mask encoding ('rle', 'bitmap', 'polygon' or 'raw')
+            profile: Speed profile ('fast', 'balanced' or 'quality')
+            output_size: (h, w) frame for masks and boxes when image is a
+                downscaled view (defaults to the input image's size)
         
         Returns:
             List of segment dictionaries with masks and bounding boxes
         """
+        mask_encoding = validate_mask_encoding(mask_encoding)
+        mask_generator = self.mask_generators[validate_sam_profile(profile)]
+        output_size = tuple(output_size or image.shape[:2])
+        
         try:
-            # Resize if image is too large
-            h, w = image.shape[:2]
-            if max(h, w) > Config.MAX_IMAGE_SIZE:
-                scale = Config.MAX_IMAGE_SIZE / max(h, w)
-                new_h, new_w = int(h * scale), int(w * scale)
-                image = cv2.resize(image, (new_w, new_h))
+            image = self._resize_for_sam(image)
             
             # Generate masks
             print(f"🔍 Generating masks for image of size {image.shape[:2]}")
-            masks = self.mask_generator.generate(image)
-            
-            # Process masks
-            segments = []
-            for idx, mask_data in enumerate(masks):
-                segment = self._process_mask(mask_data, idx, image.shape[:2])
-                if segment:
-                    segments.append(segment)
+            with self.lock:
+                masks = mask_generator.generate(image)
             
-            # Sort by area (largest first)
-            segments.sort(key=lambda x: x['area'], reverse=True)
+            segments = self._build_segments(masks, image.shape[:2], mask_encoding, output_size)
             
             print(f"✅ Found {len(segments)} segments")
             return segments
@@ -112,14 +400,130 @@ class SAMService:
         except Exception as e:
             raise Exception(f"SAM segmentation failed: {str(e)}")
     
-    def _process_mask(self, mask_data: Dict, idx: int, image_shape: Tuple[int, int]) -> Optional[Dict]:
+    def segment_images(self, images: List[np.ndarray], mask_encoding: Optional[str] = None,
+                       profile: Optional[str] = None,
+                       output_sizes: Optional[List[Tuple[int, int]]] = None) -> List[List[Dict]]:
+        """
+        Perform automatic segmentation on a batch of images
+        
+        The ViT image encoder (the dominant cost) runs once over the whole batch;
+        the embeddings go into the embedding cache, where the mask generator
+        picks them up for the full-image crop.
+        
+        Args:
+            images: Input images as numpy arrays (RGB)
+            mask_encoding: Mask encoding ('rle', 'bitmap', 'polygon' or 'raw')
+            profile: Speed profile ('fast', 'balanced' or 'quality')
+            output_sizes: (h, w) result frame per image (defaults to each input's size)
+        
+        Returns:
+            One list of segment dictionaries per input image
+        """
+        mask_encoding = validate_mask_encoding(mask_encoding)
+        mask_generator = self.mask_generators[validate_sam_profile(profile)]
+        if output_sizes is None:
+            output_sizes = [image.shape[:2] for image in images]
+        
+        try:
+            images = [self._resize_for_sam(image) for image in images]
+            results = []
+            
+            print(f"🔍 Generating masks for batch of {len(images)} images")
+            with self.lock:
+                # Uncounted check: set_image in generate() counts the one
+                # lookup, as a miss for the images encoded here
+                keys = [hash_image(image) for image in images]
+                pending = [
+                    (key, image) for key, image in zip(keys, images)
+                    if not self.embedding_cache.contains(key)
+                ]
+                
+                if pending:
+                    embeddings = self._encode_batch([image for _, image in pending])
+                    for (key, _), embedding in zip(pending, embeddings):
+                        self.embedding_cache.put(key, embedding, prefetched=True)
+                
+                for image, output_size in zip(images, output_sizes):
+                    masks = mask_generator.generate(image)
+                    results.append(self._build_segments(masks, image.shape[:2], mask_encoding, tuple(output_size)))
+            
+            print(f"✅ Segmented batch of {len(images)} images")
+            return results
+        
+        except Exception as e:
+            raise Exception(f"SAM batch segmentation failed: {str(e)}")
+    
+    def _resize_for_sam(self, image: np.ndarray) -> np.ndarray:
+        """Resize image if it's larger than Config.MAX_IMAGE_SIZE"""
+        new_h, new_w = fit_size(image.shape[:2], Config.MAX_IMAGE_SIZE)
+        if (new_h, new_w) != image.shape[:2]:
+            image = cv2.resize(image, (new_w, new_h))
+        return image
+    
+    def _encode_batch(self, images: List[np.ndarray]) -> List[Tuple]:
+        """
+        Run the SAM image encoder over a batch of images in one forward pass
+        
+        Args:
+            images: Input images as numpy arrays (RGB)
+        
+        Returns:
+            Embedding cache entry per image
+        """
+        if self.backend == 'stub':
+            return [self.predictor.embed(image) for image in images]
+        
+        tensors = []
+        sizes = []
+        
+        for image in images:
+            input_image = self.predictor.transform.apply_image(image)
+            input_tensor = torch.as_tensor(input_image, device=self.device)
+            input_tensor = input_tensor.permute(2, 0, 1).contiguous()[None, :, :, :]
+            sizes.append((image.shape[:2], tuple(input_tensor.shape[-2:])))
+            tensors.append(self.model.preprocess(input_tensor))
+        
+        batch = torch.cat(tensors, dim=0)
+        if self.runtime is not None:
+            features = self.runtime.encode(batch)
+        else:
+            with torch.no_grad():
+                features = self.model.image_encoder(batch)
+        
+        return [
+            {
+                'features': features[i:i + 1],
+                'original_size': original_size,
+                'input_size': input_size
+            }
+            for i, (original_size, input_size) in enumerate(sizes)
+        ]
+    
+    def _build_segments(self, masks: List[Dict], image_shape: Tuple[int, int],
+                        mask_encoding: str, output_size: Optional[Tuple[int, int]] = None) -> List[Dict]:
+        """Convert raw generator output into sorted segment dictionaries in the output frame"""
+        segments = []
+        for idx, mask_data in enumerate(masks):
+            segment = self._process_mask(mask_data, idx, image_shape, mask_encoding, output_size)
+            if segment:
+                segments.append(segment)
+        
+        # Sort by area (largest first)
+        segments.sort(key=lambda x: x['area'], reverse=True)
+        return segments
+    
+    def _process_mask(self, mask_data: Dict, idx: int, image_shape: Tuple[int, int],
+                      mask_encoding: str = 'rle',
+                      output_size: Optional[Tuple[int, int]] = None) -> Optional[Dict]:
         """
         Process a single mask and extract relevant information
         
         Args:
             mask_data: Mask data from SAM
             idx: Segment index
-            image_shape: Original image shape (h, w)
+            image_shape: Shape (h, w) of the image SAM segmented
+            mask_encoding: Mask encoding ('rle', 'bitmap', 'polygon' or 'raw')
+            output_size: (h, w) frame of the returned mask and box (defaults to image_shape)
         
         Returns:
             Processed segment dictionary
@@ -131,10 +535,23 @@ class SAMService:
             predicted_iou = mask_data['predicted_iou']
             stability_score = mask_data['stability_score']
             
-            # Filter out very small segments
-            if area < Config.MIN_SEGMENT_AREA:
+            output_size = tuple(output_size or image_shape)
+            scale = (output_size[0] * output_size[1]) / (image_shape[0] * image_shape[1])
+            
+            # Filter out very small segments (area in output pixels)
+            if area * scale < Config.MIN_SEGMENT_AREA:
                 return None
             
+            if output_size != tuple(image_shape):
+                # Upscale the mask, then take box and area from it as SAM does
+                segmentation = resize_mask(segmentation, output_size)
+                area = int(segmentation.sum())
+                if area == 0:
+                    return None
+                x, y, w, h = cv2.boundingRect(segmentation.astype(np.uint8))
+                bbox = [x, y, w - 1, h - 1]
+                image_shape = output_size
+            
             # Convert bbox to (x, y, width, height)
             x, y, w, h = bbox
             
@@ -146,15 +563,17 @@ class SAMService:
             aspect_ratio = w / h if h > 0 else 1.0
             segment_type = self._infer_segment_type(aspect_ratio, area, image_shape)
             
+            bbox_dict = {
+                'x': int(x),
+                'y': int(y),
+                'width': int(w),
+                'height': int(h)
+            }
+            
             return {
                 'id': f'segment_{idx}',
-                'mask': segmentation.tolist(),  # Binary mask
-                'bbox': {
-                    'x': int(x),
-                    'y': int(y),
-                    'width': int(w),
-                    'height': int(h)
-                },
+                'mask': encode_mask(segmentation, mask_encoding, bbox_dict),
+                'bbox': bbox_dict,
                 'center': {
                     'x': float(center_x),
                     'y': float(center_y)
@@ -200,8 +619,13 @@ class SAMService:
         # Default to shape
         return 'shape'
     
+    def warmup(self):
+        """Run one encoder + prompt decoder pass on a blank image"""
+        image = np.full((64, 64, 3), 255, dtype=np.uint8)
+        self.segment_with_prompts(image, points=[(32, 32)], labels=[1])
+    
     def segment_with_points(self, image: np.ndarray, points: List[Tuple[int, int]], 
-                           labels: List[int]) -> Dict:
+                           labels: List[int], mask_encoding: Optional[str] = None) -> Dict:
         """
         Perform segmentation with point prompts
         
@@ -209,32 +633,103 @@ class SAMService:
             image: Input image as numpy array (RGB)
             points: List of (x, y) coordinates
             labels: List of labels (1 for foreground, 0 for background)
+            mask_encoding: Mask encoding ('rle', 'bitmap', 'polygon' or 'raw')
         
         Returns:
             Segmentation result with mask and score
         """
-        try:
-            self.predictor.set_image(image)
+        return self.segment_with_prompts(
+            image=image, points=points, labels=labels, mask_encoding=mask_encoding
+        )
+    
+    def segment_with_prompts(self, image: Optional[np.ndarray] = None, image_id: Optional[str] = None,
+                             points: Optional[List[Tuple[int, int]]] = None,
+                             labels: Optional[List[int]] = None,
+                             box: Optional[List[int]] = None,
+                             mask_encoding: Optional[str] = None) -> Dict:
+        """
+        Perform segmentation with point and/or box prompts
+        
+        The image embedding is looked up in the embedding cache (shared with
+        automatic segmentation), so only the first call for an image runs the
+        ViT encoder; later calls can pass the returned image_id instead of the
+        image and only run the lightweight mask decoder.
+        
+        Args:
+            image: Input image as numpy array (RGB), optional if image_id is given
+            image_id: Id returned by an earlier call for the same image
+            points: List of (x, y) coordinates in original image pixels
+            labels: List of labels (1 for foreground, 0 for background)
+            box: Optional [x0, y0, x1, y1] box in original image pixels
+            mask_encoding: Mask encoding ('rle', 'bitmap', 'polygon' or 'raw')
+        
+        Returns:
+            Segmentation result with mask, score, image_id and timings
+        """
+        mask_encoding = validate_mask_encoding(mask_encoding)
+        
+        if image is None and image_id is None:
+            raise ValueError("Either an image or an image_id is required")
+        if not points and box is None:
+            raise ValueError("At least one point or a box is required")
+        if points and (labels is None or len(labels) != len(points)):
+            raise ValueError("Each point needs a label")
+        
+        with self.lock:
+            encode_start = time.perf_counter()
             
-            point_coords = np.array(points)
-            point_labels = np.array(labels)
+            if image is not None:
+                # Embed the same resized image automatic segmentation uses so
+                # the two paths share one cache entry
+                display_size = tuple(image.shape[:2])
+                sam_image = self._resize_for_sam(image)
+                image_id = hash_image(sam_image)
+                cached = self.predictor.set_image(sam_image)
+                
+                # One counted lookup per request: set_image did it, so peek here
+                entry = self.embedding_cache.peek(image_id)
+                if entry is not None and entry.get('display_size') != display_size:
+                    self.embedding_cache.put(image_id, dict(entry, display_size=display_size))
+            else:
+                if not self.predictor.restore_embedding(image_id):
+                    raise UnknownImageError(f"No cached embedding for image_id {image_id}")
+                cached = True
+                entry = self.embedding_cache.peek(image_id) or {}
+                display_size = entry.get('display_size', tuple(self.predictor.original_size))
             
-            masks, scores, logits = self.predictor.predict(
-                point_coords=point_coords,
-                point_labels=point_labels,
-                multimask_output=True
-            )
+            encode_time = time.perf_counter() - encode_start
             
-            # Select best mask
-            best_idx = np.argmax(scores)
+            try:
+                # Prompts and masks use original image pixels
+                self.predictor.original_size = display_size
+                
+                decode_start = time.perf_counter()
+                masks, scores, logits = self.predictor.predict(
+                    point_coords=np.array(points) if points else None,
+                    point_labels=np.array(labels) if points else None,
+                    box=np.array(box) if box is not None else None,
+                    multimask_output=True
+                )
+                decode_time = time.perf_counter() - decode_start
             
-            return {
-                'mask': masks[best_idx].tolist(),
-                'score': float(scores[best_idx])
-            }
+            except Exception as e:
+                raise Exception(f"Prompt-based segmentation failed: {str(e)}")
         
-        except Exception as e:
-            raise Exception(f"Point-based segmentation failed: {str(e)}")
+        # Select best mask
+        best_idx = np.argmax(scores)
+        
+        return {
+            'image_id': image_id,
+            'mask': encode_mask(masks[best_idx], mask_encoding),
+            'score': float(scores[best_idx]),
+            'scores': [float(score) for score in scores],
+            'image_size': {'width': int(display_size[1]), 'height': int(display_size[0])},
+            'embedding_cached': cached,
+            'timings_ms': {
+                'encode': round(encode_time * 1000, 2),
+                'decode': round(decode_time * 1000, 2)
+            }
+        }
     
     def extract_segment_image(self, image: np.ndarray, mask: np.ndarray) -> np.ndarray:
         """
@@ -0,0 +1,276 @@
+import time
+import zlib
+import cv2
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+from ..config import Config
+from ..utils.cache import hash_image
+
+
+# Vocabulary of the generated text (UI labels, like the benchmark corpus)
+STUB_WORDS = [
+    'Dashboard', 'Settings', 'Profile', 'Revenue', 'Orders', 'Customers',
+    'Export', 'Filter', 'Search', 'Monthly', 'Report', 'Total', 'Active',
+    'Pending', 'Invoice', 'Summary', 'Download', 'Share', 'Analytics'
+]
+
+# Longest side of the view the stubs analyse
+_ANALYSIS_SIDE = 1024
+
+
+def _sleep_ms(ms: float):
+    if ms > 0:
+        time.sleep(ms / 1000)
+
+
+def _seed(image: np.ndarray) -> int:
+    """Deterministic seed from pixel content"""
+    return zlib.crc32(np.ascontiguousarray(image).data)
+
+
+def _words(rng: np.random.Generator, low: int = 1, high: int = 4) -> str:
+    return ' '.join(rng.choice(STUB_WORDS, size=int(rng.integers(low, high + 1))))
+
+
+def _gray_view(image: np.ndarray) -> Tuple[np.ndarray, float]:
+    """Grayscale copy with the longest side at most _ANALYSIS_SIDE, and its scale"""
+    h, w = image.shape[:2]
+    scale = min(1.0, _ANALYSIS_SIDE / max(h, w))
+    if scale < 1.0:
+        image = cv2.resize(image, (max(1, int(w * scale)), max(1, int(h * scale))), interpolation=cv2.INTER_AREA)
+    gray = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY) if image.ndim == 3 else image
+    return gray, scale
+
+
+def _to_image_boxes(boxes, scale: float) -> List[Tuple[int, int, int, int]]:
+    return [(int(x / scale), int(y / scale), max(1, int(w / scale)), max(1, int(h / scale))) for x, y, w, h in boxes]
+
+
+def text_line_boxes(image: np.ndarray) -> List[Tuple[int, int, int, int]]:
+    """
+    Boxes of the text lines in an image, in reading order
+    
+    Strong edges minus long straight rules (borders, table lines), dilated
+    sideways so the characters of a line join into one component.
+    
+    Returns:
+        (x, y, width, height) boxes in image pixels
+    """
+    gray, scale = _gray_view(image)
+    h, w = gray.shape
+    
+    ink = (cv2.morphologyEx(gray, cv2.MORPH_GRADIENT, np.ones((3, 3), np.uint8)) > 40).astype(np.uint8)
+    rules = (cv2.morphologyEx(ink, cv2.MORPH_OPEN, cv2.getStructuringElement(cv2.MORPH_RECT, (max(40, w // 12), 1))) |
+             cv2.morphologyEx(ink, cv2.MORPH_OPEN, cv2.getStructuringElement(cv2.MORPH_RECT, (1, max(40, h // 12)))))
+    ink = cv2.dilate(ink & (1 - rules), cv2.getStructuringElement(cv2.MORPH_RECT, (11, 3)))
+    
+    _, _, stats, _ = cv2.connectedComponentsWithStats(ink)
+    boxes = sorted((tuple(stat[:4]) for stat in stats[1:] if stat[4] >= 12), key=lambda box: (box[1], box[0]))
+    return _to_image_boxes(boxes, scale)
+
+
+def region_boxes(image: np.ndarray) -> List[Tuple[int, int, int, int]]:
+    """
+    Boxes of nested visual regions (cards, buttons, icons, lines), largest first
+    
+    Returns:
+        (x, y, width, height) boxes in image pixels
+    """
+    gray, scale = _gray_view(image)
+    edges = cv2.dilate(cv2.Canny(gray, 30, 90), np.ones((3, 3), np.uint8))
+    contours, _ = cv2.findContours(edges, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
+    
+    boxes = {cv2.boundingRect(contour) for contour in contours}
+    boxes = sorted((box for box in boxes if box[2] * box[3] >= 200), key=lambda box: (-box[2] * box[3], box[1], box[0]))
+    return _to_image_boxes(boxes, scale)
+
+
+class StubSamPredictor:
+    """
+    Stand-in for CachedSamPredictor: embeddings are zero tensors of SAM's
+    real size, stored in the same EmbeddingCache, after a synthetic encoder
+    delay
+    """
+    
+    def __init__(self, embedding_cache):
+        self.embedding_cache = embedding_cache
+        self.original_size = None
+        self.input_size = None
+        self.is_image_set = False
+    
+    def embed(self, image: np.ndarray) -> Dict:
+        """Cache entry for an image, after Config.STUB_SAM_ENCODER_MS"""
+        import torch
+        _sleep_ms(Config.STUB_SAM_ENCODER_MS)
+        h, w = image.shape[:2]
+        scale = 1024 / max(h, w)
+        return {
+            'features': torch.zeros((1, 256, 64, 64)),
+            'original_size': (h, w),
+            'input_size': (int(h * scale + 0.5), int(w * scale + 0.5))
+        }
+    
+    def set_image(self, image: np.ndarray, image_format: str = "RGB") -> bool:
+        key = hash_image(image)
+        if self.restore_embedding(key):
+            return True
+        
+        entry = self.embed(image)
+        self.embedding_cache.put(key, entry)
+        self.original_size, self.input_size = entry['original_size'], entry['input_size']
+        self.is_image_set = True
+        return False
+    
+    def restore_embedding(self, key: str) -> bool:
+        entry = self.embedding_cache.get(key)
+        if entry is None:
+            return False
+        
+        self.original_size = entry['original_size']
+        self.input_size = entry['input_size']
+        self.is_image_set = True
+        return True
+    
+    def predict(self, point_coords: Optional[np.ndarray] = None, point_labels: Optional[np.ndarray] = None,
+                box: Optional[np.ndarray] = None, multimask_output: bool = True):
+        """Three nested rectangular masks around the prompt box (or points)"""
+        h, w = self.original_size
+        if box is not None:
+            x0, y0, x1, y1 = [int(v) for v in box]
+        else:
+            positive = point_coords[point_labels == 1] if point_labels is not None else point_coords
+            positive = positive if len(positive) else point_coords
+            x0, y0 = positive.min(axis=0).astype(int)
+            x1, y1 = positive.max(axis=0).astype(int)
+        
+        masks = np.zeros((3, h, w), dtype=bool)
+        for idx, pad in enumerate((2, 12, 32)):
+            masks[idx, max(0, y0 - pad):min(h, y1 + pad + 1), max(0, x0 - pad):min(w, x1 + pad + 1)] = True
+        scores = np.array([0.91, 0.95, 0.88], dtype=np.float32)
+        return masks, scores, np.zeros((3, 256, 256), dtype=np.float32)
+
+
+class StubMaskGenerator:
+    """
+    Stand-in for SamAutomaticMaskGenerator
+    
+    Produces Config.STUB_SAM_SEGMENTS masks in SAM's output format: the
+    background and the largest regions found in the image, then seeded
+    random boxes if the image has fewer regions. The mask delay scales with
+    the profile's points_per_side like SAM's prompt grid.
+    """
+    
+    def __init__(self, points_per_side: int = 32, **params):
+        self.points_per_side = points_per_side
+        self.predictor = None
+    
+    def generate(self, image: np.ndarray) -> List[Dict]:
+        self.predictor.set_image(image)
+        _sleep_ms(Config.STUB_SAM_DECODER_MS * (self.points_per_side / 32) ** 2)
+        
+        h, w = image.shape[:2]
+        rng = np.random.default_rng(_seed(image))
+        boxes = ([(0, 0, w, h)] + region_boxes(image))[:Config.STUB_SAM_SEGMENTS]
+        while len(boxes) < Config.STUB_SAM_SEGMENTS:
+            bw, bh = int(rng.integers(8, max(9, w // 3))), int(rng.integers(8, max(9, h // 3)))
+            boxes.append((int(rng.integers(0, max(1, w - bw))), int(rng.integers(0, max(1, h - bh))), bw, bh))
+        
+        masks = []
+        for x, y, bw, bh in boxes:
+            segmentation = np.zeros((h, w), dtype=bool)
+            segmentation[y:y + bh, x:x + bw] = True
+            masks.append({
+                'segmentation': segmentation,
+                'area': int(segmentation.sum()),
+                # SAM boxes are XYWH with inclusive extents
+                'bbox': [x, y, min(bw, w - x) - 1, min(bh, h - y) - 1],
+                'predicted_iou': float(rng.uniform(0.86, 0.99)),
+                'stability_score': float(rng.uniform(0.92, 0.99))
+            })
+        return masks
+
+
+class StubPix2StructInputs(dict):
+    """Processor output: the images and prompts, movable like a BatchEncoding"""
+    
+    def to(self, device):
+        return self
+
+
+class StubPix2StructProcessor:
+    """Stand-in for Pix2StructProcessor; tokens are words"""
+    
+    def __call__(self, images=None, text=None, return_tensors=None):
+        images = images if isinstance(images, list) else [images]
+        texts = text if isinstance(text, list) else [text] * len(images)
+        return StubPix2StructInputs(images=[np.asarray(image) for image in images], prompts=texts)
+    
+    def decode(self, ids: List[str], skip_special_tokens: bool = True) -> str:
+        tokens = ids[1:] if skip_special_tokens else ids
+        return ' '.join(tokens)
+    
+    def batch_decode(self, sequences: List[List[str]], skip_special_tokens: bool = True) -> List[str]:
+        return [self.decode(ids, skip_special_tokens) for ids in sequences]
+
+
+class StubPix2StructModel:
+    """
+    Stand-in for Pix2StructForConditionalGeneration
+    
+    generate() describes Config.STUB_LAYOUT_ELEMENTS text elements with
+    positions, in the phrasing Pix2StructService._parse_layout looks for,
+    after Config.STUB_PIX2STRUCT_MS per image (scaled by beam count).
+    With max_time shorter than that, it stops at max_time and keeps the
+    same fraction of the tokens, like MaxTimeCriteria.
+    """
+    
+    def generate(self, images: List[np.ndarray], prompts: List[str], max_new_tokens: int = 512,
+                 num_beams: int = 1, max_time: Optional[float] = None, **kwargs) -> List[List[str]]:
+        delay_ms = Config.STUB_PIX2STRUCT_MS * len(images) * (1 + 0.25 * (num_beams - 1))
+        if max_time is not None and delay_ms > max_time * 1000:
+            max_new_tokens = min(max_new_tokens, int(Config.STUB_LAYOUT_ELEMENTS * 5 * max_time * 1000 / delay_ms))
+            delay_ms = max_time * 1000
+        _sleep_ms(delay_ms)
+        
+        sequences = []
+        for image in images:
+            rng = np.random.default_rng(_seed(image))
+            tokens = []
+            for _ in range(Config.STUB_LAYOUT_ELEMENTS):
+                position = rng.choice(['top', 'middle', 'bottom'])
+                side = rng.choice(['left', 'center', 'right'])
+                tokens.extend(['text:', f'"{_words(rng)}"', 'at', f'{position}', f'{side},'])
+            sequences.append(['<pad>'] + tokens[:max_new_tokens])
+        return sequences
+
+
+class StubPaddleOCR:
+    """
+    Stand-in for a PaddleOCR engine (ocr(), text_recognizer, text_classifier)
+    
+    Detects the image's text lines (capped at Config.STUB_OCR_MAX_LINES)
+    and reads each as words chosen from its pixels, after
+    Config.STUB_OCR_MS per image and Config.STUB_OCR_REC_MS per line.
+    """
+    
+    def ocr(self, image: np.ndarray, cls: bool = True, det: bool = True, rec: bool = True) -> List:
+        _sleep_ms(Config.STUB_OCR_MS)
+        boxes = text_line_boxes(image)[:Config.STUB_OCR_MAX_LINES]
+        
+        lines = []
+        for x, y, w, h in boxes:
+            text, confidence = self._read(image[y:y + h, x:x + w])
+            polygon = [[x, y], [x + w, y], [x + w, y + h], [x, y + h]]
+            lines.append([polygon, (text, confidence)])
+        return [lines]
+    
+    def text_classifier(self, crops: List[np.ndarray]):
+        return crops, [('0', 1.0)] * len(crops), 0.0
+    
+    def text_recognizer(self, crops: List[np.ndarray]):
+        return [self._read(crop) for crop in crops], 0.0
+    
+    def _read(self, crop: np.ndarray) -> Tuple[str, float]:
+        _sleep_ms(Config.STUB_OCR_REC_MS)
+        rng = np.random.default_rng(_seed(crop))
+        return _words(rng), float(rng.uniform(0.8, 0.99))
@@ -0,0 +1,105 @@
+import threading
+import time
+from typing import Dict, List, Optional
+from ..config import Config
+from .registry import registry
+
+
+class Warmup:
+    """
+    Background model warmup at startup
+    
+    Loads each configured service through the registry and runs its
+    warmup() dummy inference so the first real request does not pay for
+    weight loading, allocator growth or kernel selection.
+    """
+    
+    def __init__(self):
+        self.status = 'idle'  # idle, running, ready or failed
+        self.services: List[str] = []
+        self.results: Dict[str, Dict] = {}
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._lock = threading.Lock()
+        self._thread = None
+    
+    def start(self, services: Optional[List[str]] = None) -> bool:
+        """
+        Start warmup in a daemon thread
+        
+        Args:
+            services: Registry service names (defaults to Config.WARMUP_SERVICES)
+        
+        Returns:
+            False if warmup was already started
+        """
+        with self._lock:
+            if self._thread is not None:
+                return False
+            
+            self.services = list(services if services is not None else Config.WARMUP_SERVICES)
+            self.results = {name: {'status': 'pending', 'load_time': None, 'inference_time': None, 'error': None}
+                            for name in self.services}
+            self.status = 'running'
+            self.started_at = time.time()
+            self._thread = threading.Thread(target=self._run, name='warmup', daemon=True)
+            self._thread.start()
+        
+        print(f"🔥 Warmup started: {', '.join(self.services) or 'no services'}")
+        return True
+    
+    def is_ready(self) -> bool:
+        """Ready once warmup succeeded, or immediately when warmup is disabled"""
+        if self.status == 'idle':
+            return not Config.WARMUP_ENABLED
+        return self.status == 'ready'
+    
+    def state(self) -> Dict:
+        """Overall status, per-service durations (seconds) and total warmup time"""
+        with self._lock:
+            results = {name: dict(result) for name, result in self.results.items()}
+        
+        total = None
+        if self.started_at is not None and self.finished_at is not None:
+            total = round(self.finished_at - self.started_at, 3)
+        
+        return {
+            'status': self.status,
+            'enabled': Config.WARMUP_ENABLED,
+            'services': results,
+            'total_time': total
+        }
+    
+    def _run(self):
+        failed = False
+        
+        for name in self.services:
+            self._update(name, status='loading')
+            
+            try:
+                start = time.perf_counter()
+                service = registry.get(name)
+                load_time = time.perf_counter() - start
+                self._update(name, status='warming', load_time=round(load_time, 3))
+                
+                start = time.perf_counter()
+                service.warmup()
+                inference_time = time.perf_counter() - start
+                self._update(name, status='ready', inference_time=round(inference_time, 3))
+                
+                print(f"🔥 Warmed up {name}: load {load_time:.2f}s, first inference {inference_time:.2f}s")
+            except Exception as e:
+                failed = True
+                self._update(name, status='failed', error=str(e))
+                print(f"❌ Warmup failed for {name}: {str(e)}")
+        
+        self.finished_at = time.time()
+        self.status = 'failed' if failed else 'ready'
+        print(f"✅ Warmup {self.status} in {self.finished_at - self.started_at:.2f}s")
+    
+    def _update(self, name: str, **fields):
+        with self._lock:
+            self.results[name].update(fields)
+
+
+warmup = Warmup()
@@ -0,0 +1,119 @@
+import numpy as np
+from typing import Dict, List, Optional
+
+
+# Rows of the IoU matrix computed at once, bounded so dense pages stay small
+_MAX_MATRIX_CELLS = 4_000_000
+
+
+def boxes_to_array(items: List[Dict]) -> np.ndarray:
+    """
+    Stack the 'bbox' dicts of segments or OCR results into an array
+    
+    Args:
+        items: Dicts with a 'bbox' of x, y, width, height
+    
+    Returns:
+        Float array of shape (n, 4) holding x_min, y_min, x_max, y_max
+    """
+    boxes = np.array(
+        [[b['x'], b['y'], b['width'], b['height']] for b in (item['bbox'] for item in items)],
+        dtype=np.float64
+    ).reshape(-1, 4)
+    boxes[:, 2] += boxes[:, 0]
+    boxes[:, 3] += boxes[:, 1]
+    return boxes
+
+
+def centers_to_array(items: List[Dict]) -> np.ndarray:
+    """Stack the 'center' dicts of items into an (n, 2) array of x, y"""
+    return np.array(
+        [[item['center']['x'], item['center']['y']] for item in items],
+        dtype=np.float64
+    ).reshape(-1, 2)
+
+
+def pairwise_iou(boxes1: np.ndarray, boxes2: np.ndarray) -> np.ndarray:
+    """
+    Intersection over Union of every box in boxes1 against every box in boxes2
+    
+    Args:
+        boxes1: Array of shape (n, 4) from boxes_to_array
+        boxes2: Array of shape (m, 4) from boxes_to_array
+    
+    Returns:
+        IoU matrix of shape (n, m) (0 where boxes do not overlap or the union is empty)
+    """
+    inter_w = np.minimum(boxes1[:, None, 2], boxes2[None, :, 2]) - np.maximum(boxes1[:, None, 0], boxes2[None, :, 0])
+    inter_h = np.minimum(boxes1[:, None, 3], boxes2[None, :, 3]) - np.maximum(boxes1[:, None, 1], boxes2[None, :, 1])
+    inter_area = np.clip(inter_w, 0, None) * np.clip(inter_h, 0, None)
+    
+    area1 = (boxes1[:, 2] - boxes1[:, 0]) * (boxes1[:, 3] - boxes1[:, 1])
+    area2 = (boxes2[:, 2] - boxes2[:, 0]) * (boxes2[:, 3] - boxes2[:, 1])
+    union_area = area1[:, None] + area2[None, :] - inter_area
+    
+    iou = np.zeros_like(inter_area)
+    np.divide(inter_area, union_area, out=iou, where=union_area != 0)
+    return iou
+
+
+def match_segments_to_text(segments: List[Dict], texts: List[Dict]) -> List[Optional[int]]:
+    """
+    Greedily assign each segment at most one OCR text element
+    
+    Segments are visited in order and take the unmatched text with the
+    highest IoU among those with IoU > 0.5, or IoU > 0.3 when the text
+    center lies inside the segment box. Ties go to the earlier text.
+    
+    Args:
+        segments: SAM segments with 'bbox'
+        texts: OCR results with 'bbox' and 'center'
+    
+    Returns:
+        Index into texts (or None) for every segment
+    """
+    assignments: List[Optional[int]] = [None] * len(segments)
+    if not segments or not texts:
+        return assignments
+    
+    seg_boxes = boxes_to_array(segments)
+    text_boxes = boxes_to_array(texts)
+    text_centers = centers_to_array(texts)
+    
+    # Candidate (segment, text) pairs, best first within each segment
+    chunk = max(1, _MAX_MATRIX_CELLS // len(texts))
+    cand_rows, cand_cols = [], []
+    
+    for start in range(0, len(segments), chunk):
+        boxes = seg_boxes[start:start + chunk]
+        iou = pairwise_iou(boxes, text_boxes)
+        
+        center_inside = (
+            (boxes[:, None, 0] <= text_centers[None, :, 0]) &
+            (text_centers[None, :, 0] <= boxes[:, None, 2]) &
+            (boxes[:, None, 1] <= text_centers[None, :, 1]) &
+            (text_centers[None, :, 1] <= boxes[:, None, 3])
+        )
+        eligible = (iou > 0.5) | (center_inside & (iou > 0.3))
+        
+        rows, cols = np.nonzero(eligible)
+        order = np.lexsort((cols, -iou[rows, cols], rows))
+        cand_rows.append(rows[order] + start)
+        cand_cols.append(cols[order])
+    
+    rows = np.concatenate(cand_rows)
+    cols = np.concatenate(cand_cols)
+    if rows.size == 0:
+        return assignments
+    
+    # Resolve conflicts in segment order; only candidate pairs are visited
+    taken = np.zeros(len(texts), dtype=bool)
+    bounds = np.flatnonzero(np.diff(rows)) + 1
+    
+    for seg_rows, seg_cols in zip(np.split(rows, bounds), np.split(cols, bounds)):
+        free = seg_cols[~taken[seg_cols]]
+        if free.size:
+            taken[free[0]] = True
+            assignments[int(seg_rows[0])] = int(free[0])
+    
+    return assignments
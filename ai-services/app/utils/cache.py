@@ -0,0 +1,178 @@
+import hashlib
+import os
+import pickle
+import threading
+import numpy as np
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+
+def hash_image(image: np.ndarray) -> str:
+    """
+    Content hash of decoded pixels (independent of file name or container format)
+    
+    Args:
+        image: Image as numpy array
+    
+    Returns:
+        Hex digest
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(str((image.shape, image.dtype.str)).encode('ascii'))
+    digest.update(np.ascontiguousarray(image).data)
+    return digest.hexdigest()
+
+
+def make_cache_key(stage: str, image_hash: str, params: Tuple) -> str:
+    """
+    Build a cache key from the stage name, image hash and stage parameters
+    
+    Args:
+        stage: Stage name (e.g. 'segmentation', 'ocr')
+        image_hash: Content hash from hash_image
+        params: Config values and request options that affect the stage output
+    
+    Returns:
+        Hex digest usable as a file name
+    """
+    raw = f"{stage}|{image_hash}|{params!r}".encode('utf-8')
+    return hashlib.blake2b(raw, digest_size=20).hexdigest()
+
+
+class ResultCache:
+    """Two-tier (memory LRU bounded by bytes, optional disk) cache for stage outputs"""
+    
+    def __init__(self, max_bytes: int, disk_dir: Optional[str] = None):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir or None
+        self._entries = OrderedDict()  # key -> (value, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {
+            'hits': 0,
+            'memory_hits': 0,
+            'disk_hits': 0,
+            'misses': 0,
+            'evictions': 0
+        }
+        
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+    
+    def get_or_compute(self, key: str, compute: Callable[[], Any]) -> Any:
+        """
+        Return the cached value for key, computing and storing it on a miss
+        
+        Args:
+            key: Cache key from make_cache_key
+            compute: Zero-argument callable producing the value
+        
+        Returns:
+            Cached or freshly computed value
+        """
+        found, value = self.get(key)
+        if found:
+            return value
+        
+        value = compute()
+        self.put(key, value)
+        return value
+    
+    def get(self, key: str) -> Tuple[bool, Any]:
+        """Look up key in memory, then on disk"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self._stats['hits'] += 1
+                self._stats['memory_hits'] += 1
+                return True, entry[0]
+        
+        payload = self._read_disk(key)
+        if payload is not None:
+            value = pickle.loads(payload)
+            with self._lock:
+                self._stats['hits'] += 1
+                self._stats['disk_hits'] += 1
+                self._insert(key, value, len(payload))
+            return True, value
+        
+        with self._lock:
+            self._stats['misses'] += 1
+        return False, None
+    
+    def put(self, key: str, value: Any):
+        """Store value in memory (and on disk if enabled)"""
+        payload = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        
+        with self._lock:
+            self._insert(key, value, len(payload))
+        
+        self._write_disk(key, payload)
+    
+    def clear(self):
+        """Drop all in-memory entries (disk entries are kept)"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+    
+    def stats(self) -> Dict:
+        """Hit/miss counters and current memory usage"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entries)
+            stats['bytes'] = self._bytes
+        
+        stats['max_bytes'] = self.max_bytes
+        stats['disk_enabled'] = self.disk_dir is not None
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+        return stats
+    
+    def _insert(self, key: str, value: Any, size: int):
+        """Insert under the lock, evicting least recently used entries to fit"""
+        if size > self.max_bytes:
+            return
+        
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= old[1]
+        
+        self._entries[key] = (value, size)
+        self._bytes += size
+        
+        while self._bytes > self.max_bytes and self._entries:
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+            self._bytes -= evicted_size
+            self._stats['evictions'] += 1
+    
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, key[:2], f'{key}.pkl')
+    
+    def _read_disk(self, key: str) -> Optional[bytes]:
+        if not self.disk_dir:
+            return None
+        
+        try:
+            with open(self._disk_path(key), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"⚠️  Error reading cache entry {key}: {str(e)}")
+            return None
+    
+    def _write_disk(self, key: str, payload: bytes):
+        if not self.disk_dir:
+            return
+        
+        path = self._disk_path(key)
+        tmp_path = f'{path}.{threading.get_ident()}.tmp'
+        
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp_path, 'wb') as f:
+                f.write(payload)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            print(f"⚠️  Error writing cache entry {key}: {str(e)}")
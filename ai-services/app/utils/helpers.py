@@ -1,9 +1,13 @@
 import os
-import uuid
+import shutil
+import sys
+import tempfile
+import zipfile
 import cv2
 import numpy as np
-from werkzeug.utils import secure_filename
+from typing import Dict, Iterator, List, Optional, Tuple
 from ..config import Config
+from .metrics import STAGE_LATENCY, timed_stage
 
 
 def allowed_file(filename: str) -> bool:
@@ -20,55 +24,142 @@ def allowed_file(filename: str) -> bool:
            filename.rsplit('.', 1)[1].lower() in Config.ALLOWED_EXTENSIONS
 
 
-def save_upload_file(file) -> str:
+@timed_stage('decode')
+def decode_upload(file) -> np.ndarray:
     """
-    Save uploaded file to disk
+    Decode an uploaded image straight from the request stream
+    
+    Small uploads are decoded from an in-memory buffer; uploads above
+    Config.UPLOAD_SPILL_THRESHOLD are spilled to an anonymous file in the
+    system temp directory and decoded from a memory map, so no named file
+    is left behind on failure.
     
     Args:
         file: FileStorage object from Flask request
     
     Returns:
-        Path to saved file
+        Image as numpy array (RGB) or None if failed
     """
-    filename = secure_filename(file.filename)
-    
-    # Generate unique filename
-    unique_filename = f"{uuid.uuid4()}_{filename}"
-    filepath = os.path.join(Config.UPLOAD_FOLDER, unique_filename)
-    
-    # Save file
-    file.save(filepath)
+    try:
+        stream = file.stream
+        stream.seek(0, os.SEEK_END)
+        size = stream.tell()
+        stream.seek(0)
+        
+        if size == 0:
+            return None
+        
+        if size <= Config.UPLOAD_SPILL_THRESHOLD:
+            return decode_image_bytes(stream.read())
+        else:
+            with tempfile.TemporaryFile() as spill:
+                shutil.copyfileobj(stream, spill)
+                spill.flush()
+                buffer = np.memmap(spill, dtype=np.uint8, mode='r', shape=(size,))
+                image = cv2.imdecode(buffer, cv2.IMREAD_COLOR)
+                del buffer
+        
+        if image is None:
+            return None
+        
+        # Convert BGR to RGB
+        return cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
     
-    return filepath
+    except Exception as e:
+        print(f"❌ Error decoding upload: {str(e)}")
+        return None
 
 
-def load_image(filepath: str) -> np.ndarray:
+def decode_image_bytes(data: bytes) -> Optional[np.ndarray]:
     """
-    Load image from file
+    Decode an encoded image (PNG, JPEG, WebP...) held in memory
     
     Args:
-        filepath: Path to image file
+        data: Encoded image bytes
     
     Returns:
         Image as numpy array (RGB) or None if failed
     """
     try:
-        # Read image
-        image = cv2.imread(filepath)
+        image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
         
         if image is None:
             return None
         
-        # Convert BGR to RGB
-        image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-        
-        return image
+        return cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
     
     except Exception as e:
-        print(f"❌ Error loading image: {str(e)}")
+        print(f"❌ Error decoding image: {str(e)}")
         return None
 
 
+def zip_image_members(archive: zipfile.ZipFile) -> List[zipfile.ZipInfo]:
+    """
+    Image members of a zip archive, checked against the batch limits
+    
+    Only the central directory is read, so oversized archives are rejected
+    before anything is decompressed. ZipFile never inflates a member past
+    its declared file_size, so the declared sizes bound the allocations.
+    
+    Args:
+        archive: Open zip archive
+    
+    Returns:
+        Members with an allowed image extension, in archive order
+    
+    Raises:
+        ValueError: If the archive holds more than Config.BATCH_MAX_SIZE
+            images, or a member or the total exceeds the size or
+            compression ratio limits
+    """
+    members = [info for info in archive.infolist() if not info.is_dir() and allowed_file(info.filename)]
+    if len(members) > Config.BATCH_MAX_SIZE:
+        raise ValueError(f"Zip archive holds {len(members)} images, more than {Config.BATCH_MAX_SIZE}")
+    
+    for info in members:
+        if info.file_size > Config.BATCH_ZIP_MAX_MEMBER_BYTES:
+            raise ValueError(f"Zip member {info.filename} is larger than {Config.BATCH_ZIP_MAX_MEMBER_BYTES} bytes")
+        if info.file_size > Config.BATCH_ZIP_MAX_RATIO * max(info.compress_size, 1):
+            raise ValueError(f"Zip member {info.filename} exceeds the compression ratio limit")
+    
+    if sum(info.file_size for info in members) > Config.BATCH_ZIP_MAX_TOTAL_BYTES:
+        raise ValueError(f"Zip archive is larger than {Config.BATCH_ZIP_MAX_TOTAL_BYTES} bytes uncompressed")
+    return members
+
+
+def iter_batch_uploads(files: List) -> Iterator[Tuple[str, Optional[np.ndarray]]]:
+    """
+    Lazily decode a batch of uploads, expanding zip archives
+    
+    Each upload is read from its stream only when the batch reaches it, so
+    at most one encoded image is held in memory at a time.
+    
+    Args:
+        files: FileStorage objects of images and/or .zip archives
+    
+    Yields:
+        (filename, image or None if it could not be decoded or the archive
+        is over the limits of zip_image_members)
+    """
+    for file in files:
+        if get_file_extension(file.filename) == 'zip':
+            try:
+                file.stream.seek(0)
+                archive = zipfile.ZipFile(file.stream)
+                members = zip_image_members(archive)
+            except (zipfile.BadZipFile, ValueError):
+                yield file.filename, None
+                continue
+            
+            with archive:
+                for info in members:
+                    with STAGE_LATENCY.time(stage='decode'):
+                        image = decode_image_bytes(archive.read(info))
+                    yield info.filename, image
+        else:
+            yield file.filename, decode_upload(file)
+
+
 def resize_image(image: np.ndarray, max_size: int = None) -> np.ndarray:
     """
     Resize image if it's too large
@@ -126,3 +217,59 @@ def cleanup_old_files(directory: str, max_age_hours: int = 24):
                     print(f"🗑️  Removed old file: {filename}")
                 except Exception as e:
                     print(f"⚠️  Failed to remove {filename}: {str(e)}")
+
+
+def get_rss_bytes() -> Optional[int]:
+    """
+    Resident set size of the current process
+    
+    Returns:
+        RSS in bytes (peak RSS where /proc is unavailable), or None
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        pass
+    
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+    except ImportError:
+        return None
+
+
+def get_memory_breakdown(pid: Optional[int] = None) -> Optional[Dict[str, int]]:
+    """
+    Shared and private resident memory of a process (Linux only)
+    
+    RSS counts every page a process maps, so forked workers sharing model
+    weights copy-on-write each report the full size. PSS divides each
+    shared page among the processes mapping it (summing PSS over processes
+    gives their real footprint) and USS is the memory only this process
+    holds.
+    
+    Args:
+        pid: Process id (defaults to the current process)
+    
+    Returns:
+        rss_bytes, pss_bytes, uss_bytes and shared_bytes, or None where
+        /proc/<pid>/smaps_rollup is unavailable
+    """
+    fields = {}
+    try:
+        with open(f"/proc/{pid or 'self'}/smaps_rollup") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) == 3 and parts[2] == 'kB':
+                    fields[parts[0].rstrip(':')] = int(parts[1]) * 1024
+    except (OSError, ValueError):
+        return None
+    
+    return {
+        'rss_bytes': fields.get('Rss', 0),
+        'pss_bytes': fields.get('Pss', 0),
+        'uss_bytes': fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0),
+        'shared_bytes': fields.get('Shared_Clean', 0) + fields.get('Shared_Dirty', 0)
+    }
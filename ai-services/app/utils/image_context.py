@@ -0,0 +1,126 @@
+import cv2
+import threading
+import numpy as np
+from typing import Dict, Tuple
+from ..config import Config
+from .cache import hash_image
+
+
+STAGES = ('segmentation', 'layout', 'ocr')
+
+
+def stage_max_size(stage: str) -> int:
+    """
+    Longest image side a stage works on (0 means full resolution)
+    
+    Args:
+        stage: 'segmentation', 'layout' or 'ocr'
+    
+    Returns:
+        Maximum dimension from the resolution policy in Config
+    """
+    if stage == 'segmentation':
+        return Config.MAX_IMAGE_SIZE
+    elif stage == 'layout':
+        return Config.LAYOUT_MAX_IMAGE_SIZE
+    elif stage == 'ocr':
+        return Config.OCR_MAX_IMAGE_SIZE
+    
+    raise ValueError(f"Unknown stage: {stage}. Allowed: {STAGES}")
+
+
+def fit_size(size: Tuple[int, int], max_size: int) -> Tuple[int, int]:
+    """(h, w) scaled so the longest side is at most max_size (0 keeps size)"""
+    h, w = size
+    if max_size <= 0 or max(h, w) <= max_size:
+        return h, w
+    scale = max_size / max(h, w)
+    return int(h * scale), int(w * scale)
+
+
+def scale_bbox(bbox: Dict, from_size: Tuple[int, int], to_size: Tuple[int, int]) -> Dict:
+    """Map an x, y, width, height box between two frames of the same image"""
+    sy, sx = to_size[0] / from_size[0], to_size[1] / from_size[1]
+    return {
+        'x': int(round(bbox['x'] * sx)),
+        'y': int(round(bbox['y'] * sy)),
+        'width': int(round(bbox['width'] * sx)),
+        'height': int(round(bbox['height'] * sy))
+    }
+
+
+def scale_point(point: Dict, from_size: Tuple[int, int], to_size: Tuple[int, int]) -> Dict:
+    """Map an x, y point between two frames of the same image"""
+    sy, sx = to_size[0] / from_size[0], to_size[1] / from_size[1]
+    return {'x': point['x'] * sx, 'y': point['y'] * sy}
+
+
+def resize_mask(mask: np.ndarray, size: Tuple[int, int]) -> np.ndarray:
+    """Nearest-neighbour resize of a boolean mask to (h, w)"""
+    if tuple(mask.shape[:2]) == tuple(size):
+        return mask
+    resized = cv2.resize(mask.astype(np.uint8), (size[1], size[0]), interpolation=cv2.INTER_NEAREST)
+    return resized.astype(bool)
+
+
+class ImageContext:
+    """
+    One request's image with lazily derived, cached representations
+    
+    Stages ask for their view through stage_image(); downscaled levels,
+    grayscale and the content hash are computed at most once per request.
+    Stage results are mapped back to the original frame (size) with the
+    scale_* helpers, so every layer uses original-image coordinates.
+    """
+    
+    def __init__(self, image: np.ndarray):
+        """
+        Args:
+            image: Original image as numpy array (RGB)
+        """
+        self.image = image
+        self.size = (int(image.shape[0]), int(image.shape[1]))
+        self._hash = None
+        self._levels = {}
+        self._gray = None
+        self._lock = threading.Lock()  # Pipeline stages read one context concurrently
+    
+    @property
+    def hash(self) -> str:
+        """Content hash of the original pixels"""
+        with self._lock:
+            if self._hash is None:
+                self._hash = hash_image(self.image)
+            return self._hash
+    
+    @property
+    def gray(self) -> np.ndarray:
+        """Grayscale view of the original image"""
+        with self._lock:
+            if self._gray is None:
+                self._gray = cv2.cvtColor(self.image, cv2.COLOR_RGB2GRAY)
+            return self._gray
+    
+    def resized(self, max_size: int) -> np.ndarray:
+        """
+        Pyramid level whose longest side is at most max_size
+        
+        Args:
+            max_size: Maximum dimension (0 returns the original image)
+        
+        Returns:
+            Downscaled image (the original when it already fits)
+        """
+        target = fit_size(self.size, max_size)
+        if target == self.size:
+            return self.image
+        
+        with self._lock:
+            if target not in self._levels:
+                # Same resize as helpers.resize_image so embedding cache keys match
+                self._levels[target] = cv2.resize(self.image, (target[1], target[0]))
+            return self._levels[target]
+    
+    def stage_image(self, stage: str) -> np.ndarray:
+        """Image at the resolution the stage's policy allows"""
+        return self.resized(stage_max_size(stage))
@@ -0,0 +1,216 @@
+import base64
+import cv2
+import numpy as np
+from typing import Dict, List, Optional
+
+
+MASK_ENCODINGS = ('rle', 'bitmap', 'polygon', 'raw')
+
+
+def validate_mask_encoding(encoding: Optional[str]) -> str:
+    """
+    Normalize and validate a requested mask encoding
+    
+    Args:
+        encoding: Requested encoding name (None uses the configured default)
+    
+    Returns:
+        Lower-cased encoding name
+    """
+    from ..config import Config
+    
+    if not encoding:
+        encoding = Config.MASK_ENCODING
+    
+    encoding = encoding.lower()
+    
+    if encoding not in MASK_ENCODINGS:
+        raise ValueError(f"Unknown mask encoding: {encoding}. Allowed: {MASK_ENCODINGS}")
+    
+    return encoding
+
+
+def encode_mask(mask: np.ndarray, encoding: str = 'rle', bbox: Optional[Dict] = None) -> Dict:
+    """
+    Encode a binary mask into a compact JSON-serializable form
+    
+    Args:
+        mask: Binary mask of shape (h, w)
+        encoding: One of 'rle', 'bitmap', 'polygon' or 'raw'
+        bbox: Optional bounding box (x, y, width, height) used to crop bitmaps
+    
+    Returns:
+        Encoded mask dictionary with a 'format' key
+    """
+    mask = np.asarray(mask, dtype=bool)
+    
+    if encoding == 'rle':
+        return encode_rle(mask)
+    elif encoding == 'bitmap':
+        return encode_bitmap(mask, bbox)
+    elif encoding == 'polygon':
+        return encode_polygon(mask)
+    elif encoding == 'raw':
+        return {
+            'format': 'raw',
+            'size': [int(mask.shape[0]), int(mask.shape[1])],
+            'data': mask.tolist()
+        }
+    
+    raise ValueError(f"Unknown mask encoding: {encoding}")
+
+
+def decode_mask(encoded: Dict) -> np.ndarray:
+    """
+    Decode any mask produced by encode_mask back into a boolean array
+    
+    Args:
+        encoded: Encoded mask dictionary
+    
+    Returns:
+        Boolean mask of shape (h, w)
+    """
+    fmt = encoded['format']
+    h, w = encoded['size']
+    
+    if fmt == 'rle':
+        return decode_rle(encoded)
+    elif fmt == 'bitmap':
+        return decode_bitmap(encoded)
+    elif fmt == 'polygon':
+        mask = np.zeros((h, w), dtype=np.uint8)
+        contours = [
+            np.array(poly, dtype=np.int32).reshape(-1, 1, 2)
+            for poly in encoded['polygons']
+        ]
+        if contours:
+            cv2.fillPoly(mask, contours, 1)
+        return mask.astype(bool)
+    elif fmt == 'raw':
+        return np.array(encoded['data'], dtype=bool)
+    
+    raise ValueError(f"Unknown mask format: {fmt}")
+
+
+def encode_rle(mask: np.ndarray) -> Dict:
+    """
+    COCO-style uncompressed RLE (column-major, counts start with a zero run)
+    
+    Args:
+        mask: Boolean mask of shape (h, w)
+    
+    Returns:
+        {'format': 'rle', 'size': [h, w], 'counts': [...]}
+    """
+    h, w = mask.shape
+    flat = mask.ravel(order='F').astype(np.int8)
+    
+    # Positions where the value changes, plus both ends
+    changes = np.flatnonzero(np.diff(flat)) + 1
+    boundaries = np.concatenate(([0], changes, [flat.size]))
+    counts = np.diff(boundaries)
+    
+    # COCO RLE always starts with a run of zeros (possibly empty)
+    if flat.size and flat[0] == 1:
+        counts = np.concatenate(([0], counts))
+    
+    return {
+        'format': 'rle',
+        'size': [int(h), int(w)],
+        'counts': counts.astype(np.int64).tolist()
+    }
+
+
+def decode_rle(encoded: Dict) -> np.ndarray:
+    """Decode COCO-style uncompressed RLE"""
+    h, w = encoded['size']
+    counts = np.asarray(encoded['counts'], dtype=np.int64)
+    values = np.arange(len(counts)) % 2
+    flat = np.repeat(values, counts).astype(bool)
+    return flat.reshape((w, h)).T
+
+
+def encode_bitmap(mask: np.ndarray, bbox: Optional[Dict] = None) -> Dict:
+    """
+    Crop the mask to its bounding box and bit-pack it as base64
+    
+    Args:
+        mask: Boolean mask of shape (h, w)
+        bbox: Optional bounding box; computed from the mask if omitted
+    
+    Returns:
+        {'format': 'bitmap', 'size': [h, w], 'bbox': [x, y, w, h], 'data': base64}
+    """
+    h, w = mask.shape
+    
+    if bbox is None:
+        ys, xs = np.nonzero(mask)
+        if len(xs) == 0:
+            x0, y0, x1, y1 = 0, 0, 0, 0
+        else:
+            x0, y0 = int(xs.min()), int(ys.min())
+            x1, y1 = int(xs.max()) + 1, int(ys.max()) + 1
+    else:
+        # SAM's XYWH boxes are one pixel short of the last mask column/row
+        x0, y0 = bbox['x'], bbox['y']
+        x1 = min(w, x0 + bbox['width'] + 1)
+        y1 = min(h, y0 + bbox['height'] + 1)
+    
+    crop = mask[y0:y1, x0:x1]
+    packed = np.packbits(crop, axis=None)
+    
+    return {
+        'format': 'bitmap',
+        'size': [int(h), int(w)],
+        'bbox': [int(x0), int(y0), int(crop.shape[1]), int(crop.shape[0])],
+        'data': base64.b64encode(packed.tobytes()).decode('ascii')
+    }
+
+
+def decode_bitmap(encoded: Dict) -> np.ndarray:
+    """Decode a bbox-cropped bit-packed bitmap"""
+    h, w = encoded['size']
+    x, y, bw, bh = encoded['bbox']
+    
+    mask = np.zeros((h, w), dtype=bool)
+    if bw == 0 or bh == 0:
+        return mask
+    
+    packed = np.frombuffer(base64.b64decode(encoded['data']), dtype=np.uint8)
+    crop = np.unpackbits(packed, count=bw * bh).reshape((bh, bw)).astype(bool)
+    mask[y:y + bh, x:x + bw] = crop
+    
+    return mask
+
+
+def encode_polygon(mask: np.ndarray, epsilon: float = 1.0) -> Dict:
+    """
+    Trace the outer contours of the mask as simplified polygons
+    
+    Args:
+        mask: Boolean mask of shape (h, w)
+        epsilon: Douglas-Peucker tolerance in pixels
+    
+    Returns:
+        {'format': 'polygon', 'size': [h, w], 'polygons': [[x1, y1, x2, y2, ...], ...]}
+    """
+    h, w = mask.shape
+    contours, _ = cv2.findContours(
+        mask.astype(np.uint8),
+        cv2.RETR_EXTERNAL,
+        cv2.CHAIN_APPROX_SIMPLE
+    )
+    
+    polygons: List[List[int]] = []
+    for contour in contours:
+        if epsilon > 0:
+            contour = cv2.approxPolyDP(contour, epsilon, True)
+        if len(contour) < 3:
+            continue
+        polygons.append(contour.reshape(-1).astype(int).tolist())
+    
+    return {
+        'format': 'polygon',
+        'size': [int(h), int(w)],
+        'polygons': polygons
+    }
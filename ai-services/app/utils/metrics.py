@@ -0,0 +1,388 @@
+import bisect
+import functools
+import glob
+import json
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+
+# Latency buckets in seconds, from fast decodes to slow SAM quality runs
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _format_labels(labelnames: Tuple[str, ...], values: Tuple, extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Metric:
+    """Base class for a named metric family with optional labels"""
+    
+    kind = 'untyped'
+    
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+    
+    def _key(self, labels: Dict) -> Tuple:
+        return tuple(labels.get(name, '') for name in self.labelnames)
+    
+    def collect(self) -> Dict[Tuple, Any]:
+        """Current value per label value tuple"""
+        raise NotImplementedError
+    
+    def merge(self, per_process: Dict[int, Dict[Tuple, Any]]) -> Tuple[Tuple[str, ...], Dict[Tuple, Any]]:
+        """
+        Combine the collected values of several processes
+        
+        Returns:
+            (label names, values) to render
+        """
+        raise NotImplementedError
+    
+    def samples(self, labelnames: Tuple[str, ...], values: Dict[Tuple, Any]) -> Iterator[str]:
+        raise NotImplementedError
+    
+    def render(self, per_process: Optional[Dict[int, Dict[Tuple, Any]]] = None) -> str:
+        """Exposition text of this process's values, or of several processes' merged"""
+        if per_process is None:
+            labelnames, values = self.labelnames, self.collect()
+        else:
+            labelnames, values = self.merge(per_process)
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        lines.extend(self.samples(labelnames, values))
+        return '\n'.join(lines)
+
+
+class _Value(Metric):
+    """
+    Metric holding one number per label set
+    
+    Values are either updated in place or read at scrape time from a
+    callback (set_function) returning a number, or a dict mapping label
+    value tuples to numbers for labelled metrics, so existing stats() of
+    queues and caches are exported without touching their hot paths.
+    """
+    
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+        self._function = None
+    
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+    
+    def set_function(self, function: Callable):
+        self._function = function
+    
+    def collect(self) -> Dict[Tuple, float]:
+        if self._function is not None:
+            try:
+                value = self._function()
+            except Exception as e:
+                print(f"⚠️  Metric {self.name} callback failed: {str(e)}")
+                return {}
+            values = value if isinstance(value, dict) else {(): value}
+        else:
+            with self._lock:
+                values = dict(self._values)
+        return {key: value for key, value in values.items() if value is not None}
+    
+    def merge(self, per_process: Dict[int, Dict[Tuple, float]]) -> Tuple[Tuple[str, ...], Dict[Tuple, float]]:
+        merged = {}
+        for values in per_process.values():
+            for key, value in values.items():
+                merged[key] = merged.get(key, 0) + value
+        return self.labelnames, merged
+    
+    def samples(self, labelnames: Tuple[str, ...], values: Dict[Tuple, float]) -> Iterator[str]:
+        for key, value in values.items():
+            yield f'{self.name}{_format_labels(labelnames, key)} {_format_value(value)}'
+
+
+class Counter(_Value):
+    """Monotonically increasing count"""
+    
+    kind = 'counter'
+
+
+class Gauge(_Value):
+    """
+    Value that goes up and down
+    
+    multiprocess_mode says how the values of several worker processes are
+    combined: 'sum' (e.g. requests in flight), 'max' (values every worker
+    shares) or 'all' (one series per process, with a pid label).
+    """
+    
+    kind = 'gauge'
+    
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 multiprocess_mode: str = 'sum'):
+        super().__init__(name, documentation, labelnames)
+        self.multiprocess_mode = multiprocess_mode
+    
+    def merge(self, per_process: Dict[int, Dict[Tuple, float]]) -> Tuple[Tuple[str, ...], Dict[Tuple, float]]:
+        if self.multiprocess_mode == 'all':
+            merged = {
+                key + (str(pid),): value
+                for pid, values in per_process.items() for key, value in values.items()
+            }
+            return self.labelnames + ('pid',), merged
+        if self.multiprocess_mode == 'max':
+            merged = {}
+            for values in per_process.values():
+                for key, value in values.items():
+                    merged[key] = max(merged.get(key, value), value)
+            return self.labelnames, merged
+        return super().merge(per_process)
+    
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+    
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(Metric):
+    """Distribution of observations over fixed cumulative buckets"""
+    
+    kind = 'histogram'
+    
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}  # key -> [per-bucket counts (+Inf last), sum]
+    
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][idx] += 1
+            entry[1] += value
+    
+    @contextmanager
+    def time(self, **labels):
+        """Observe the wall-clock duration of a with-block"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+    
+    def collect(self) -> Dict[Tuple, List]:
+        with self._lock:
+            return {key: [list(counts), total] for key, (counts, total) in self._values.items()}
+    
+    def merge(self, per_process: Dict[int, Dict[Tuple, List]]) -> Tuple[Tuple[str, ...], Dict[Tuple, List]]:
+        merged = {}
+        for values in per_process.values():
+            for key, (counts, total) in values.items():
+                entry = merged.setdefault(key, [[0] * len(counts), 0.0])
+                entry[0] = [a + b for a, b in zip(entry[0], counts)]
+                entry[1] += total
+        return self.labelnames, merged
+    
+    def samples(self, labelnames: Tuple[str, ...], values: Dict[Tuple, List]) -> Iterator[str]:
+        for key, (counts, total) in values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                labels = _format_labels(labelnames, key, f'le="{_format_value(bound)}"')
+                yield f'{self.name}_bucket{labels} {cumulative}'
+            labels = _format_labels(labelnames, key)
+            yield f'{self.name}_sum{labels} {_format_value(total)}'
+            yield f'{self.name}_count{labels} {cumulative}'
+
+
+class MetricsRegistry:
+    """
+    Named metrics rendered together in the Prometheus text format
+    
+    With a multiprocess directory (one per server, shared by its forked
+    workers), each process writes a snapshot of its values to
+    <directory>/<pid>.json and render() merges every snapshot, so a scrape
+    answered by any worker covers all of them. Snapshots of exited workers
+    keep their counters and histograms (see mark_process_dead), so totals
+    never go backwards.
+    """
+    
+    def __init__(self):
+        self._metrics: List[Metric] = []
+        self.multiprocess_dir: Optional[str] = None
+        self._sync_thread = None
+    
+    def register(self, metric: Metric) -> Metric:
+        self._metrics.append(metric)
+        return metric
+    
+    def counter(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+    
+    def gauge(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+              multiprocess_mode: str = 'sum') -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames, multiprocess_mode))
+    
+    def histogram(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                  buckets: Optional[Tuple[float, ...]] = None) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets or DEFAULT_BUCKETS))
+    
+    def render(self) -> str:
+        """Text exposition format (version 0.0.4) of every registered metric"""
+        if self.multiprocess_dir is None:
+            return '\n'.join(metric.render() for metric in self._metrics) + '\n'
+        
+        self.write_snapshot()
+        snapshots = self._read_snapshots()
+        rendered = []
+        for metric in self._metrics:
+            per_process = {
+                pid: {tuple(key): value for key, value in snapshot.get(metric.name, [])}
+                for pid, snapshot in snapshots.items()
+            }
+            rendered.append(metric.render(per_process))
+        return '\n'.join(rendered) + '\n'
+    
+    def enable_multiprocess(self, directory: str, sync_interval: float = 5.0):
+        """
+        Share this process's metrics through directory
+        
+        Writes a snapshot now and every sync_interval seconds from a daemon
+        thread (and on every render), so other workers' scrapes lag by at
+        most sync_interval.
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.multiprocess_dir = directory
+        self.write_snapshot()
+        
+        if self._sync_thread is None and sync_interval > 0:
+            def sync():
+                while True:
+                    time.sleep(sync_interval)
+                    self.write_snapshot()
+            
+            self._sync_thread = threading.Thread(target=sync, name='metrics-sync', daemon=True)
+            self._sync_thread.start()
+    
+    def write_snapshot(self):
+        """Write this process's values to <multiprocess_dir>/<pid>.json"""
+        if self.multiprocess_dir is None:
+            return
+        
+        snapshot = {
+            metric.name: [[list(key), value] for key, value in metric.collect().items()]
+            for metric in self._metrics
+        }
+        path = os.path.join(self.multiprocess_dir, f'{os.getpid()}.json')
+        try:
+            with open(path + '.tmp', 'w') as f:
+                json.dump(snapshot, f)
+            os.replace(path + '.tmp', path)
+        except OSError as e:
+            print(f"⚠️  Failed to write metrics snapshot: {str(e)}")
+    
+    def mark_process_dead(self, pid: int, directory: Optional[str] = None):
+        """Drop an exited process's gauges, keeping its counters and histograms"""
+        path = os.path.join(directory or self.multiprocess_dir, f'{pid}.json')
+        try:
+            with open(path) as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError):
+            return
+        
+        gauges = {metric.name for metric in self._metrics if isinstance(metric, Gauge)}
+        snapshot = {name: values for name, values in snapshot.items() if name not in gauges}
+        with open(path + '.tmp', 'w') as f:
+            json.dump(snapshot, f)
+        os.replace(path + '.tmp', path)
+    
+    def _read_snapshots(self) -> Dict[int, Dict]:
+        snapshots = {}
+        for path in glob.glob(os.path.join(self.multiprocess_dir, '*.json')):
+            try:
+                with open(path) as f:
+                    snapshots[int(os.path.basename(path)[:-len('.json')])] = json.load(f)
+            except (OSError, ValueError):
+                continue
+        return snapshots
+
+
+metrics = MetricsRegistry()
+
+REQUESTS = metrics.counter(
+    'pixmorph_requests_total', 'HTTP requests by endpoint, method and status code',
+    ('endpoint', 'method', 'status')
+)
+REQUESTS_IN_FLIGHT = metrics.gauge(
+    'pixmorph_requests_in_flight', 'HTTP requests currently being handled', ('endpoint',), multiprocess_mode='sum'
+)
+REQUEST_LATENCY = metrics.histogram(
+    'pixmorph_request_duration_seconds', 'Time to produce an HTTP response (stream start for streamed ones)',
+    ('endpoint',)
+)
+STAGE_LATENCY = metrics.histogram(
+    'pixmorph_stage_duration_seconds',
+    'Pipeline stage time: decode, segmentation, layout, ocr, matching, palette, serialization',
+    ('stage',)
+)
+MODEL_LOAD_SECONDS = metrics.gauge(
+    'pixmorph_model_load_seconds', 'Time taken to load each model service', ('service',), multiprocess_mode='max'
+)
+RESIDENT_MEMORY = metrics.gauge(
+    'pixmorph_resident_memory_bytes', 'Resident set size of the server process', multiprocess_mode='all'
+)
+MEMORY_BREAKDOWN = metrics.gauge(
+    'pixmorph_memory_bytes', 'Proportional (pss), private (uss) and shared resident memory of the server process',
+    ('kind',), multiprocess_mode='all'
+)
+# max: with JOB_BACKEND=redis every worker reports the same shared queue
+QUEUE_DEPTH = metrics.gauge(
+    'pixmorph_queue_depth', 'Work waiting for a worker (async jobs, OCR worker pool)', ('queue',),
+    multiprocess_mode='max'
+)
+CACHE_LOOKUPS = metrics.counter(
+    'pixmorph_result_cache_lookups_total', 'Stage result cache lookups since start by outcome', ('result',)
+)
+
+
+def observe_stages(timings: Dict[str, float], skip: Tuple[str, ...] = ('total',)):
+    """Record a pipeline timings dict (seconds per stage) in STAGE_LATENCY"""
+    for stage, seconds in timings.items():
+        if stage not in skip:
+            STAGE_LATENCY.observe(seconds, stage=stage)
+
+
+def timed_stage(stage: str) -> Callable:
+    """Decorator recording each call of the wrapped function as a pipeline stage"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with STAGE_LATENCY.time(stage=stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
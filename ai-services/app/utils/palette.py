@@ -0,0 +1,155 @@
+import numpy as np
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+# 5 bits per channel -> 32768 color bins
+QUANT_BITS = 5
+NUM_BINS = 1 << (3 * QUANT_BITS)
+
+# Only the most populated bins are considered as palette candidates
+_MAX_CANDIDATE_BINS = 1024
+
+
+def quantize(pixels: np.ndarray) -> np.ndarray:
+    """
+    Map RGB pixels to histogram bin indices
+    
+    Args:
+        pixels: uint8 array of shape (..., 3)
+    
+    Returns:
+        Bin indices of shape (...)
+    """
+    shift = 8 - QUANT_BITS
+    q = (pixels >> shift).astype(np.int32)
+    return (q[..., 0] << (2 * QUANT_BITS)) | (q[..., 1] << QUANT_BITS) | q[..., 2]
+
+
+def _subsample_step(count: int, max_pixels: int) -> int:
+    return max(1, -(-count // max_pixels)) if max_pixels else 1
+
+
+def extract_palette(image: np.ndarray, num_colors: int = 8, max_pixels: int = 250000,
+                    min_distance: float = 24.0) -> List[Tuple[int, int, int]]:
+    """
+    Most frequent distinct colors of an image from a quantized histogram
+    
+    Pixels are strided down to max_pixels, binned at 5 bits per channel and
+    the bins are visited by population. A bin's color is the mean of its
+    pixels, and it is skipped if it lies within min_distance (RGB euclidean)
+    of a color already chosen.
+    
+    Args:
+        image: RGB image of shape (h, w, 3)
+        num_colors: Maximum number of colors to return
+        max_pixels: Upper bound on sampled pixels (0 samples every pixel)
+        min_distance: Minimum RGB distance between palette colors
+    
+    Returns:
+        List of (r, g, b) tuples, most frequent first
+    """
+    pixels = np.ascontiguousarray(image).reshape(-1, 3)
+    if pixels.shape[0] == 0 or num_colors <= 0:
+        return []
+    
+    pixels = pixels[::_subsample_step(pixels.shape[0], max_pixels)]
+    bins = quantize(pixels)
+    
+    counts = np.bincount(bins, minlength=NUM_BINS)
+    sums = np.stack(
+        [np.bincount(bins, weights=pixels[:, c], minlength=NUM_BINS) for c in range(3)],
+        axis=1
+    )
+    
+    occupied = np.flatnonzero(counts)
+    order = occupied[np.argsort(-counts[occupied], kind='stable')][:_MAX_CANDIDATE_BINS]
+    means = sums[order] / counts[order, None]
+    
+    chosen = np.empty((0, 3))
+    for mean in means:
+        if chosen.shape[0] and np.min(np.linalg.norm(chosen - mean, axis=1)) < min_distance:
+            continue
+        chosen = np.vstack([chosen, mean])
+        if chosen.shape[0] == num_colors:
+            break
+    
+    return [tuple(int(v) for v in np.rint(color)) for color in chosen]
+
+
+def dominant_colors(image: np.ndarray, regions: Iterable[Tuple[Dict, Optional[np.ndarray]]],
+                    max_pixels_per_region: int = 20000) -> List[Tuple[int, int, int]]:
+    """
+    Dominant color of many regions with a single grouped histogram
+    
+    The image is quantized once; each region contributes the bin indices
+    of its pixels (inside its mask when given, otherwise its bbox) and all
+    regions are counted together.
+    
+    Args:
+        image: RGB image of shape (h, w, 3)
+        regions: (bbox, mask) pairs; bbox has x, y, width, height and mask is
+            an optional full-size boolean array. Consumed once, so a generator
+            keeps only one decoded mask alive at a time
+        max_pixels_per_region: Upper bound on sampled pixels per region
+    
+    Returns:
+        (r, g, b) per region ((0, 0, 0) for empty regions)
+    """
+    bin_image = None
+    keys, samples = [], []
+    num_regions = 0
+    
+    for idx, (bbox, mask) in enumerate(regions):
+        num_regions = idx + 1
+        if bin_image is None:
+            bin_image = quantize(image)
+        
+        x, y, w, h = bbox['x'], bbox['y'], bbox['width'], bbox['height']
+        region_bins = bin_image[y:y + h, x:x + w]
+        region_pixels = image[y:y + h, x:x + w]
+        
+        if mask is not None:
+            # SAM's XYWH boxes are one pixel short of the last mask column/row
+            region_mask = mask[y:y + h + 1, x:x + w + 1]
+            if region_mask.any():
+                region_bins = bin_image[y:y + h + 1, x:x + w + 1][region_mask]
+                region_pixels = image[y:y + h + 1, x:x + w + 1][region_mask]
+        
+        region_bins = region_bins.reshape(-1)
+        region_pixels = region_pixels.reshape(-1, 3)
+        if region_bins.size == 0:
+            continue
+        
+        step = _subsample_step(region_bins.size, max_pixels_per_region)
+        keys.append(idx * NUM_BINS + region_bins[::step].astype(np.int64))
+        samples.append(region_pixels[::step])
+    
+    colors = [(0, 0, 0)] * num_regions
+    if not keys:
+        return colors
+    
+    keys = np.concatenate(keys)
+    samples = np.concatenate(samples)
+    
+    unique_keys, inverse, counts = np.unique(keys, return_inverse=True, return_counts=True)
+    sums = np.stack(
+        [np.bincount(inverse, weights=samples[:, c], minlength=unique_keys.size) for c in range(3)],
+        axis=1
+    )
+    
+    # Most populated bin per region (lowest bin index on ties)
+    region_ids = unique_keys // NUM_BINS
+    order = np.lexsort((-counts, region_ids))
+    first = np.concatenate(([True], np.diff(region_ids[order]) != 0))
+    best = order[first]
+    
+    means = np.rint(sums[best] / counts[best, None]).astype(int)
+    for region_id, color in zip(region_ids[best], means):
+        colors[int(region_id)] = tuple(int(v) for v in color)
+    
+    return colors
+
+
+def to_hex(rgb: Tuple[int, int, int]) -> str:
+    """Format an (r, g, b) tuple as #rrggbb"""
+    return '#{:02x}{:02x}{:02x}'.format(*rgb)
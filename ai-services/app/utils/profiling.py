@@ -0,0 +1,194 @@
+import cProfile
+import json
+import os
+import pstats
+import random
+import re
+import threading
+import time
+from typing import Dict, List, Optional
+from ..config import Config
+
+
+PROFILE_TRIGGER_HEADER = 'X-Profile'
+PROFILE_TRIGGER_PARAM = 'profile'
+
+# cProfile and the PyTorch profiler are process-wide: a second session
+# started while one runs raises (cProfile, Python 3.12+) or crashes (kineto)
+_profiling_lock = threading.Lock()
+
+
+def should_profile(requested: Optional[str], sample_rate: Optional[float] = None) -> bool:
+    """
+    Decide whether to profile a request
+    
+    Args:
+        requested: Value of the X-Profile header or ?profile= parameter, if any
+        sample_rate: Fraction of other requests profiled automatically
+            (defaults to Config.PROFILE_SAMPLE_RATE)
+    
+    Returns:
+        True when profiling is enabled and the request asked for it or was sampled
+    """
+    if not Config.PROFILING_ENABLED:
+        return False
+    if requested is not None:
+        return requested.lower() in ('1', 'true', 'yes', 'on')
+    
+    sample_rate = Config.PROFILE_SAMPLE_RATE if sample_rate is None else sample_rate
+    return sample_rate > 0 and random.random() < sample_rate
+
+
+def safe_request_id(value: Optional[str]) -> Optional[str]:
+    """A client-supplied request id usable as a directory name, or None"""
+    if value and re.fullmatch(r'[A-Za-z0-9._-]{1,64}', value) and value.strip('.'):
+        return value
+    return None
+
+
+def _function_label(func) -> str:
+    filename, line, name = func
+    if filename == '~':
+        return name
+    return f"{os.path.basename(filename)}:{line}({name})"
+
+
+def cprofile_hotspots(profile: cProfile.Profile, top_n: int) -> List[Dict]:
+    """Functions with the most own (excluding callees) time"""
+    stats = pstats.Stats(profile).stats
+    rows = sorted(stats.items(), key=lambda item: item[1][2], reverse=True)[:top_n]
+    return [
+        {
+            'function': _function_label(func),
+            'calls': calls,
+            'own_ms': round(tottime * 1000, 2),
+            'cumulative_ms': round(cumtime * 1000, 2)
+        }
+        for func, (_, calls, tottime, cumtime, _) in rows
+    ]
+
+
+class RequestProfiler:
+    """
+    cProfile (and, when torch is installed, PyTorch profiler) run around
+    one request
+    
+    cProfile only sees the thread that started it, so callers run the
+    pipeline sequentially in that thread while profiling. The PyTorch
+    profiler records operators from every thread. Only one request per
+    process is profiled at a time. Results are written to
+    output_dir/<request_id>/:
+        
+        cprofile.prof       pstats dump (snakeviz, python -m pstats)
+        torch_trace.json    Chrome trace (chrome://tracing, Perfetto)
+        summary.json        Top-N hotspots, as returned by stop()
+    """
+    
+    def __init__(self, request_id: str, output_dir: Optional[str] = None,
+                 top_n: Optional[int] = None, torch_enabled: Optional[bool] = None):
+        """
+        Args:
+            request_id: Name of the profile directory
+            output_dir: Parent directory (defaults to Config.PROFILES_DIR)
+            top_n: Hotspots kept in the summary (defaults to Config.PROFILE_TOP_N)
+            torch_enabled: Also run the PyTorch profiler (defaults to Config.PROFILE_TORCH)
+        """
+        self.request_id = request_id
+        self.output_dir = os.path.join(output_dir or Config.PROFILES_DIR, request_id)
+        self.top_n = top_n or Config.PROFILE_TOP_N
+        self.torch_enabled = Config.PROFILE_TORCH if torch_enabled is None else torch_enabled
+        self.profile = cProfile.Profile()
+        self.torch_profile = None
+        self._start = None
+        self._summary = None
+    
+    def start(self) -> bool:
+        """
+        Start profiling the calling thread
+        
+        Returns:
+            False, without profiling, when another request is being profiled
+        """
+        if not _profiling_lock.acquire(blocking=False):
+            print(f"⚠️  Not profiling {self.request_id}: another request is being profiled")
+            return False
+        
+        if self.torch_enabled:
+            try:
+                import torch
+                activities = [torch.profiler.ProfilerActivity.CPU]
+                if torch.cuda.is_available():
+                    activities.append(torch.profiler.ProfilerActivity.CUDA)
+                self.torch_profile = torch.profiler.profile(activities=activities)
+                self.torch_profile.__enter__()
+            except Exception as e:
+                print(f"⚠️  PyTorch profiler unavailable: {str(e)}")
+                self.torch_profile = None
+        
+        self._start = time.perf_counter()
+        try:
+            self.profile.enable()
+        except ValueError as e:
+            # Another profiler (not started here) holds the interpreter's hook
+            print(f"⚠️  Not profiling {self.request_id}: {str(e)}")
+            if self.torch_profile is not None:
+                self.torch_profile.__exit__(None, None, None)
+            _profiling_lock.release()
+            return False
+        return True
+    
+    def stop(self) -> Dict:
+        """
+        Stop profiling, save the results and summarize them
+        
+        Safe to call more than once; later calls return the first summary.
+        
+        Returns:
+            request_id, directory, wall time and top-N cProfile hotspots
+            (plus top-N PyTorch operators when that profiler ran)
+        """
+        if self._summary is not None:
+            return self._summary
+        
+        self.profile.disable()
+        elapsed = time.perf_counter() - self._start
+        try:
+            summary = self._save(elapsed)
+        finally:
+            _profiling_lock.release()
+        
+        print(f"✅ Profile saved to {self.output_dir} ({elapsed:.2f}s)")
+        self._summary = summary
+        return summary
+    
+    def _save(self, elapsed: float) -> Dict:
+        os.makedirs(self.output_dir, exist_ok=True)
+        
+        summary = {
+            'request_id': self.request_id,
+            'directory': self.output_dir,
+            'wall_ms': round(elapsed * 1000, 2),
+            'hotspots': cprofile_hotspots(self.profile, self.top_n)
+        }
+        self.profile.dump_stats(os.path.join(self.output_dir, 'cprofile.prof'))
+        
+        if self.torch_profile is not None:
+            try:
+                self.torch_profile.__exit__(None, None, None)
+                self.torch_profile.export_chrome_trace(os.path.join(self.output_dir, 'torch_trace.json'))
+                events = sorted(self.torch_profile.key_averages(), key=lambda e: e.self_cpu_time_total, reverse=True)
+                summary['torch_ops'] = [
+                    {
+                        'op': event.key,
+                        'calls': event.count,
+                        'self_cpu_ms': round(event.self_cpu_time_total / 1000, 2),
+                        'cpu_total_ms': round(event.cpu_time_total / 1000, 2)
+                    }
+                    for event in events[:self.top_n]
+                ]
+            except Exception as e:
+                print(f"⚠️  Failed to save PyTorch profile: {str(e)}")
+        
+        with open(os.path.join(self.output_dir, 'summary.json'), 'w') as f:
+            json.dump(summary, f, indent=2)
+        return summary
@@ -0,0 +1,98 @@
+import cv2
+import numpy as np
+from typing import Dict, List
+
+
+def _histogram_medians(hist: np.ndarray) -> np.ndarray:
+    """np.median of the values described by each row of a (n, 256) histogram"""
+    cum = np.cumsum(hist, axis=1)
+    count = cum[:, -1]
+    low = (cum > (np.maximum(count - 1, 0) // 2)[:, None]).argmax(axis=1)
+    high = (cum > (count // 2)[:, None]).argmax(axis=1)
+    return (low + high) / 2.0
+
+
+def _run_starts(ink: np.ndarray) -> np.ndarray:
+    """Ink pixels whose previous flat pixel is not ink"""
+    starts = ink.copy()
+    starts[1:] &= ~ink[:-1]
+    return starts
+
+
+def text_styles(image: np.ndarray, gray: np.ndarray, bboxes: List[Dict],
+                bold_stroke_ratio: float = 0.1) -> List[Dict]:
+    """
+    Color, stroke weight and alignment of many text boxes at once
+    
+    Each box only runs OpenCV kernels on views of the shared grayscale and
+    RGB images: an Otsu threshold and masked per-channel histograms of its
+    text pixels (the dark ones, or the light ones when there are none, as
+    in OCRService.detect_font_color). Medians, stroke widths and alignment
+    are then computed for all boxes together from the stacked histograms
+    and the concatenated masks. Stroke width is the minority class's pixel
+    count over its number of horizontal plus vertical runs.
+    
+    Args:
+        image: Full RGB image
+        gray: Grayscale view of image
+        bboxes: Text boxes with x, y, width, height
+        bold_stroke_ratio: Stroke width over box height above which text is bold
+    
+    Returns:
+        Per box: 'color' (hex), 'stroke_width' (pixels), 'bold' and 'align'
+    """
+    n = len(bboxes)
+    if n == 0:
+        return []
+    
+    hists = np.zeros((n, 3, 256), dtype=np.float32)
+    heights = np.zeros(n, dtype=np.int64)
+    ink_masks = []
+    
+    for idx, bbox in enumerate(bboxes):
+        x, y = max(bbox['x'], 0), max(bbox['y'], 0)
+        region_gray = gray[y:bbox['y'] + bbox['height'], x:bbox['x'] + bbox['width']]
+        if region_gray.size == 0:
+            ink_masks.append(np.zeros((1, 1), dtype=np.uint8))
+            continue
+        
+        # 255 on the pixels THRESH_BINARY would set to 0
+        _, dark = cv2.threshold(region_gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+        dark_count = cv2.countNonZero(dark)
+        light = cv2.bitwise_not(dark)
+        
+        region = image[y:y + region_gray.shape[0], x:x + region_gray.shape[1]]
+        text_mask = dark if dark_count > 0 else light
+        for c in range(3):
+            hists[idx, c] = cv2.calcHist([region], [c], text_mask, [256], [0, 256]).ravel()
+        
+        # A leading zero row and column keep runs from spanning rows or boxes
+        ink = dark if dark_count <= dark.size / 2 else light
+        ink_masks.append(cv2.copyMakeBorder(ink, 1, 0, 1, 0, cv2.BORDER_CONSTANT, value=0))
+        heights[idx] = region_gray.shape[0]
+    
+    colors = _histogram_medians(hists.reshape(n * 3, 256)).reshape(n, 3).astype(int)
+    
+    sizes = np.array([mask.size for mask in ink_masks])
+    offsets = np.cumsum(sizes) - sizes
+    rows = np.concatenate([mask.ravel() for mask in ink_masks]) > 0
+    columns = np.concatenate([mask.T.ravel() for mask in ink_masks]) > 0
+    ink_count = np.add.reduceat(rows.view(np.uint8), offsets, dtype=np.int32)
+    runs = (np.add.reduceat(_run_starts(rows).view(np.uint8), offsets, dtype=np.int32) +
+            np.add.reduceat(_run_starts(columns).view(np.uint8), offsets, dtype=np.int32))
+    stroke = np.divide(ink_count, runs, out=np.zeros(n), where=runs > 0)
+    
+    image_width = gray.shape[1]
+    centers = np.array([b['x'] + b['width'] / 2 for b in bboxes])
+    align = np.where(centers < image_width * 0.33, 'left',
+                     np.where(centers > image_width * 0.67, 'right', 'center'))
+    
+    return [
+        {
+            'color': '#{:02x}{:02x}{:02x}'.format(*colors[idx]),
+            'stroke_width': round(float(stroke[idx]), 2),
+            'bold': bool(heights[idx] > 0 and stroke[idx] / heights[idx] > bold_stroke_ratio),
+            'align': str(align[idx])
+        }
+        for idx in range(n)
+    ]
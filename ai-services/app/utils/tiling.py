@@ -0,0 +1,120 @@
+import re
+import numpy as np
+from typing import Dict, List, Tuple
+from .box_matching import boxes_to_array, pairwise_iou
+
+
+def tile_grid(size: Tuple[int, int], tile_size: int, overlap: int) -> List[Tuple[int, int, int, int]]:
+    """
+    Overlapping tiles covering an image
+    
+    Tiles step by tile_size - overlap; the last tile in each direction is
+    shifted back to end on the image border, so every tile is full size
+    (unless the image itself is smaller).
+    
+    Args:
+        size: Image (h, w)
+        tile_size: Tile side in pixels
+        overlap: Pixels shared by neighbouring tiles
+    
+    Returns:
+        Tiles as (x, y, width, height)
+    """
+    h, w = size
+    step = max(1, tile_size - overlap)
+    
+    def starts(length):
+        if length <= tile_size:
+            return [0]
+        positions = list(range(0, length - tile_size, step))
+        positions.append(length - tile_size)
+        return positions
+    
+    return [
+        (x, y, min(tile_size, w), min(tile_size, h))
+        for y in starts(h) for x in starts(w)
+    ]
+
+
+def offset_text_element(element: Dict, dx: int, dy: int) -> Dict:
+    """Move an OCR text element from tile to image coordinates (in place)"""
+    element['bbox']['x'] += dx
+    element['bbox']['y'] += dy
+    element['center'] = {'x': element['center']['x'] + dx, 'y': element['center']['y'] + dy}
+    if 'polygon' in element:
+        element['polygon'] = [[x + dx, y + dy] for x, y in element['polygon']]
+    return element
+
+
+def touches_seam(bbox: Dict, tile: Tuple[int, int, int, int], size: Tuple[int, int], margin: int = 2) -> bool:
+    """
+    Whether a box (in image coordinates) reaches an inner edge of its tile
+    
+    Such detections may be cut off by the tile; the neighbouring tile
+    usually holds the whole line.
+    """
+    x, y, w, h = tile
+    return (
+        (x > 0 and bbox['x'] <= x + margin) or
+        (y > 0 and bbox['y'] <= y + margin) or
+        (x + w < size[1] and bbox['x'] + bbox['width'] >= x + w - margin) or
+        (y + h < size[0] and bbox['y'] + bbox['height'] >= y + h - margin)
+    )
+
+
+def _normalize_text(text: str) -> str:
+    return re.sub(r'\s+', '', text).lower()
+
+
+def merge_tile_text(elements: List[Dict], clipped: List[bool], iou_threshold: float = 0.5,
+                    containment_threshold: float = 0.7) -> List[Dict]:
+    """
+    Remove duplicate text detections from overlapping tiles
+    
+    Elements are ranked whole-before-clipped, then by text length and
+    confidence, and kept greedily. A lower-ranked element is dropped when
+    its box overlaps a kept one with IoU above iou_threshold (box NMS), or
+    when the kept box covers containment_threshold of it and its text is
+    contained in the kept text (a fragment of the same line cut at a seam).
+    
+    Args:
+        elements: Text elements in image coordinates
+        clipped: Per element, whether it touches an inner tile edge
+        iou_threshold: IoU above which two boxes are the same detection
+        containment_threshold: Covered fraction above which text dedup applies
+    
+    Returns:
+        Kept elements in reading order (top to bottom, left to right)
+    """
+    if not elements:
+        return []
+    
+    boxes = boxes_to_array(elements)
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    texts = [_normalize_text(element['content']) for element in elements]
+    order = sorted(
+        range(len(elements)),
+        key=lambda i: (clipped[i], -len(texts[i]), -elements[i]['confidence'])
+    )
+    
+    suppressed = np.zeros(len(elements), dtype=bool)
+    kept = []
+    for i in order:
+        if suppressed[i]:
+            continue
+        kept.append(i)
+        
+        iou = pairwise_iou(boxes[i:i + 1], boxes)[0]
+        inter_w = np.clip(np.minimum(boxes[i, 2], boxes[:, 2]) - np.maximum(boxes[i, 0], boxes[:, 0]), 0, None)
+        inter_h = np.clip(np.minimum(boxes[i, 3], boxes[:, 3]) - np.maximum(boxes[i, 1], boxes[:, 1]), 0, None)
+        covered = np.zeros_like(areas)
+        np.divide(inter_w * inter_h, areas, out=covered, where=areas > 0)
+        
+        duplicates = iou > iou_threshold
+        for j in np.flatnonzero((covered > containment_threshold) & ~duplicates):
+            duplicates[j] = texts[j] in texts[i]
+        suppressed |= duplicates
+    
+    merged = [elements[i] for i in kept]
+    merged.sort(key=lambda element: (element['bbox']['y'], element['bbox']['x']))
+    return merged
@@ -0,0 +1,144 @@
+"""
+Benchmark segment-text matching
+
+Compares the per-pair Python loop that ImageProcessor used before with the
+vectorized app.utils.box_matching implementation on random UI-like boxes,
+and checks that both produce the same assignments.
+
+Usage (from ai-services/):
+    python -m benchmarks.box_matching
+    python -m benchmarks.box_matching --sizes 100 1000 --repeat 5
+"""
+import argparse
+import statistics
+import time
+import numpy as np
+from app.utils.box_matching import match_segments_to_text
+
+
+def random_boxes(count: int, seed: int = 0, width: int = 1920, height: int = 1080):
+    """
+    Build count segments and count text elements, about half of which overlap
+    
+    Returns:
+        (segments, texts) as lists of dicts shaped like SAMService/OCRService output
+    """
+    rng = np.random.default_rng(seed)
+    
+    def box(x, y, w, h):
+        return {
+            'bbox': {'x': int(x), 'y': int(y), 'width': int(w), 'height': int(h)},
+            'center': {'x': int(x + w // 2), 'y': int(y + h // 2)}
+        }
+    
+    texts = []
+    for idx in range(count):
+        w, h = rng.integers(20, 240), rng.integers(10, 40)
+        item = box(rng.integers(0, width - w), rng.integers(0, height - h), w, h)
+        item['id'] = f'text_{idx}'
+        texts.append(item)
+    
+    segments = []
+    for idx in range(count):
+        if idx % 2 == 0:
+            # Jittered copy of a text box
+            ref = texts[int(rng.integers(0, count))]['bbox']
+            dx, dy = rng.integers(-6, 7, size=2)
+            dw, dh = rng.integers(-4, 12, size=2)
+            item = box(max(0, ref['x'] + dx), max(0, ref['y'] + dy),
+                       max(1, ref['width'] + dw), max(1, ref['height'] + dh))
+        else:
+            w, h = rng.integers(10, 600), rng.integers(10, 400)
+            item = box(rng.integers(0, width - w), rng.integers(0, height - h), w, h)
+        item['id'] = f'segment_{idx}'
+        segments.append(item)
+    
+    return segments, texts
+
+
+def _loop_iou(bbox1, bbox2):
+    x_inter_min = max(bbox1['x'], bbox2['x'])
+    y_inter_min = max(bbox1['y'], bbox2['y'])
+    x_inter_max = min(bbox1['x'] + bbox1['width'], bbox2['x'] + bbox2['width'])
+    y_inter_max = min(bbox1['y'] + bbox1['height'], bbox2['y'] + bbox2['height'])
+    
+    if x_inter_max < x_inter_min or y_inter_max < y_inter_min:
+        return 0.0
+    
+    inter_area = (x_inter_max - x_inter_min) * (y_inter_max - y_inter_min)
+    union_area = bbox1['width'] * bbox1['height'] + bbox2['width'] * bbox2['height'] - inter_area
+    
+    if union_area == 0:
+        return 0.0
+    
+    return inter_area / union_area
+
+
+def loop_match(segments, texts):
+    """Reference implementation: the previous per-segment, per-text loop"""
+    matched_ids = set()
+    assignments = []
+    
+    for segment in segments:
+        seg_bbox = segment['bbox']
+        best_idx, best_iou = None, 0.0
+        
+        for idx, text in enumerate(texts):
+            if text['id'] in matched_ids:
+                continue
+            
+            iou = _loop_iou(seg_bbox, text['bbox'])
+            center = text['center']
+            center_inside = (
+                seg_bbox['x'] <= center['x'] <= seg_bbox['x'] + seg_bbox['width'] and
+                seg_bbox['y'] <= center['y'] <= seg_bbox['y'] + seg_bbox['height']
+            )
+            
+            if iou > 0.5 or (center_inside and iou > 0.3):
+                if iou > best_iou:
+                    best_iou, best_idx = iou, idx
+        
+        if best_idx is not None:
+            matched_ids.add(texts[best_idx]['id'])
+        assignments.append(best_idx)
+    
+    return assignments
+
+
+def _time(func, repeat: int):
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        latencies.append(time.perf_counter() - start)
+    return result, statistics.median(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark segment-text matching')
+    parser.add_argument('--sizes', nargs='+', type=int, default=[100, 1000, 5000],
+                        help='Number of segments (and of text elements) per run')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per size (median is reported)')
+    args = parser.parse_args()
+    
+    print()
+    print("=" * 72)
+    print(f"{'Boxes':>6} {'Loop (s)':>10} {'NumPy (s)':>10} {'Speedup':>9} {'Matches':>9} {'Identical':>10}")
+    print("-" * 72)
+    
+    for size in args.sizes:
+        segments, texts = random_boxes(size, seed=size)
+        
+        # The quadratic loop is slow at large sizes, so it runs once there
+        loop_result, loop_time = _time(lambda: loop_match(segments, texts), 1 if size > 1000 else args.repeat)
+        fast_result, fast_time = _time(lambda: match_segments_to_text(segments, texts), args.repeat)
+        
+        matches = sum(idx is not None for idx in fast_result)
+        print(f"{size:>6} {loop_time:>10.4f} {fast_time:>10.4f} {loop_time / fast_time:>8.1f}x "
+              f"{matches:>9} {str(loop_result == fast_result):>10}")
+    
+    print("=" * 72)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""
+Measure cold-start latency and memory per endpoint
+
+Each endpoint is called once in a fresh Python process, so the numbers
+include every model that endpoint loads on first use.
+
+Usage (from ai-services/):
+    python -m benchmarks.cold_start
+    python -m benchmarks.cold_start --endpoints colors ocr --output cold_start.json
+"""
+import argparse
+import io
+import json
+import os
+import runpy
+import subprocess
+import sys
+import time
+import cv2
+from benchmarks.images import synthetic_ui_image
+
+ENDPOINTS = ['colors', 'ocr', 'layout', 'segment', 'process']
+
+SERVICE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def measure(endpoint: str) -> dict:
+    """Create the app, call one endpoint once and report time, RSS and loaded services"""
+    from app.services.registry import registry
+    from app.utils.helpers import get_rss_bytes
+    
+    # app.py is shadowed by the app package, so load the factory by path
+    create_app = runpy.run_path(os.path.join(SERVICE_ROOT, 'app.py'))['create_app']
+    client = create_app().test_client()
+    
+    image = cv2.cvtColor(synthetic_ui_image(480, 640), cv2.COLOR_RGB2BGR)
+    payload = cv2.imencode('.png', image)[1].tobytes()
+    
+    rss_before = get_rss_bytes()
+    start = time.perf_counter()
+    response = client.post(
+        f'/api/image/{endpoint}',
+        data={'image': (io.BytesIO(payload), 'benchmark.png')},
+        content_type='multipart/form-data'
+    )
+    elapsed = time.perf_counter() - start
+    rss_after = get_rss_bytes()
+    
+    return {
+        'endpoint': endpoint,
+        'status': response.status_code,
+        'first_request_s': round(elapsed, 3),
+        'rss_before_mb': round(rss_before / 2**20, 1) if rss_before else None,
+        'rss_after_mb': round(rss_after / 2**20, 1) if rss_after else None,
+        'services_loaded': registry.loaded(),
+        'services': registry.stats()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Cold-start latency and RSS per endpoint')
+    parser.add_argument('--endpoints', nargs='+', default=ENDPOINTS, choices=ENDPOINTS)
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    parser.add_argument('--child', choices=ENDPOINTS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    
+    if args.child:
+        print('RESULT ' + json.dumps(measure(args.child)))
+        return
+    
+    results = []
+    for endpoint in args.endpoints:
+        proc = subprocess.run(
+            [sys.executable, '-m', 'benchmarks.cold_start', '--child', endpoint],
+            cwd=SERVICE_ROOT, capture_output=True, text=True
+        )
+        lines = [line for line in proc.stdout.splitlines() if line.startswith('RESULT ')]
+        if not lines:
+            print(f"❌ {endpoint} failed:\n{proc.stderr[-2000:]}")
+            continue
+        results.append(json.loads(lines[-1][len('RESULT '):]))
+    
+    print()
+    print("=" * 72)
+    print(f"{'Endpoint':10} {'Status':>6} {'First (s)':>10} {'RSS (MB)':>10} {'+RSS (MB)':>10}  Services")
+    print("-" * 72)
+    for r in results:
+        delta = r['rss_after_mb'] - r['rss_before_mb'] if r['rss_after_mb'] and r['rss_before_mb'] else 0
+        print(f"{r['endpoint']:10} {r['status']:>6} {r['first_request_s']:>10.3f} "
+              f"{r['rss_after_mb'] or 0:>10.1f} {delta:>10.1f}  {', '.join(r['services_loaded']) or '-'}")
+    print("=" * 72)
+    
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"📄 Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
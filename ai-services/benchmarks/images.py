@@ -0,0 +1,204 @@
+"""
+Deterministic benchmark images
+
+Generates synthetic UI screenshots (header, cards, buttons, icons and text
+lines) and document pages (title, paragraphs, a table) from a fixed seed so
+every run measures the same inputs without network access or checked-in
+image files.
+"""
+import os
+import cv2
+import numpy as np
+from typing import List, Optional, Tuple
+
+
+DEFAULT_SIZES = [(480, 640), (1080, 1920), (2048, 1536)]
+
+WORDS = [
+    'Dashboard', 'Settings', 'Profile', 'Revenue', 'Orders', 'Customers',
+    'Export', 'Filter', 'Search', 'Monthly', 'Report', 'Total', 'Active',
+    'Pending', 'Invoice', 'Summary', 'Download', 'Share', 'Analytics'
+]
+
+
+def synthetic_ui_image(height: int, width: int, seed: int = 0) -> np.ndarray:
+    """
+    Render a synthetic UI screenshot
+    
+    Args:
+        height: Image height in pixels
+        width: Image width in pixels
+        seed: Random seed (same seed and size give identical pixels)
+    
+    Returns:
+        Image as numpy array (RGB)
+    """
+    rng = np.random.default_rng(seed)
+    scale = min(height, width) / 480
+    
+    background = tuple(int(c) for c in rng.integers(225, 256, size=3))
+    image = np.full((height, width, 3), background, dtype=np.uint8)
+    
+    # Header bar with a title
+    header_h = int(56 * scale)
+    header_color = tuple(int(c) for c in rng.integers(20, 120, size=3))
+    cv2.rectangle(image, (0, 0), (width, header_h), header_color, -1)
+    _put_text(image, rng.choice(WORDS), (int(16 * scale), int(38 * scale)), 1.0 * scale, (255, 255, 255))
+    
+    # Grid of cards, each with an icon, a heading, body lines and a button
+    margin = int(16 * scale)
+    cols = max(1, width // int(320 * scale))
+    rows = max(1, (height - header_h) // int(220 * scale))
+    card_w = (width - margin * (cols + 1)) // cols
+    card_h = (height - header_h - margin * (rows + 1)) // rows
+    
+    for row in range(rows):
+        for col in range(cols):
+            x0 = margin + col * (card_w + margin)
+            y0 = header_h + margin + row * (card_h + margin)
+            _draw_card(image, rng, x0, y0, card_w, card_h, scale)
+    
+    return image
+
+
+def _draw_card(image: np.ndarray, rng: np.random.Generator, x0: int, y0: int,
+               w: int, h: int, scale: float):
+    cv2.rectangle(image, (x0, y0), (x0 + w, y0 + h), (255, 255, 255), -1)
+    cv2.rectangle(image, (x0, y0), (x0 + w, y0 + h), (200, 200, 200), max(1, int(scale)))
+    
+    pad = int(12 * scale)
+    icon_r = int(14 * scale)
+    icon_color = tuple(int(c) for c in rng.integers(0, 256, size=3))
+    cv2.circle(image, (x0 + pad + icon_r, y0 + pad + icon_r), icon_r, icon_color, -1)
+    
+    _put_text(image, rng.choice(WORDS), (x0 + 2 * pad + 2 * icon_r, y0 + pad + int(icon_r * 1.4)),
+              0.7 * scale, (30, 30, 30))
+    
+    line_y = y0 + 2 * pad + 2 * icon_r + int(14 * scale)
+    line_step = int(22 * scale)
+    while line_y < y0 + h - int(56 * scale):
+        words = ' '.join(rng.choice(WORDS, size=int(rng.integers(2, 5))))
+        _put_text(image, words, (x0 + pad, line_y), 0.5 * scale, (90, 90, 90))
+        line_y += line_step
+    
+    button_color = tuple(int(c) for c in rng.integers(0, 200, size=3))
+    bx0, by0 = x0 + pad, y0 + h - int(44 * scale)
+    bx1, by1 = bx0 + int(110 * scale), by0 + int(32 * scale)
+    cv2.rectangle(image, (bx0, by0), (bx1, by1), button_color, -1)
+    _put_text(image, rng.choice(WORDS), (bx0 + int(8 * scale), by1 - int(10 * scale)),
+              0.5 * scale, (255, 255, 255))
+
+
+def synthetic_document_image(height: int, width: int, seed: int = 0) -> np.ndarray:
+    """
+    Render a synthetic document page: a title, paragraphs and a table
+    
+    Args:
+        height: Image height in pixels
+        width: Image width in pixels
+        seed: Random seed (same seed and size give identical pixels)
+    
+    Returns:
+        Image as numpy array (RGB)
+    """
+    rng = np.random.default_rng(seed)
+    scale = min(height, width) / 480
+    image = np.full((height, width, 3), 250, dtype=np.uint8)
+    
+    margin = int(32 * scale)
+    line_step = int(20 * scale)
+    y = margin + int(24 * scale)
+    _put_text(image, ' '.join(rng.choice(WORDS, size=3)), (margin, y), 0.9 * scale, (20, 20, 20))
+    y += int(40 * scale)
+    
+    table_top = int(height * 0.6)
+    while y < table_top - line_step:
+        # Paragraph of 3-6 lines followed by a blank line
+        for _ in range(int(rng.integers(3, 7))):
+            if y >= table_top - line_step:
+                break
+            words = ' '.join(rng.choice(WORDS, size=int(rng.integers(4, 9))))
+            _put_text(image, words, (margin, y), 0.45 * scale, (50, 50, 50))
+            y += line_step
+        y += line_step
+    
+    cols, rows = 4, max(2, (height - margin - table_top) // int(28 * scale))
+    cell_w = (width - 2 * margin) // cols
+    cell_h = int(28 * scale)
+    for row in range(rows):
+        for col in range(cols):
+            x0, y0 = margin + col * cell_w, table_top + row * cell_h
+            fill = (230, 236, 245) if row == 0 else (255, 255, 255)
+            cv2.rectangle(image, (x0, y0), (x0 + cell_w, y0 + cell_h), fill, -1)
+            cv2.rectangle(image, (x0, y0), (x0 + cell_w, y0 + cell_h), (170, 170, 170), 1)
+            text = rng.choice(WORDS) if row == 0 else str(int(rng.integers(0, 10000)))
+            _put_text(image, text, (x0 + int(6 * scale), y0 + cell_h - int(9 * scale)),
+                      0.45 * scale, (30, 30, 30))
+    
+    return image
+
+
+def _put_text(image: np.ndarray, text: str, origin: Tuple[int, int], font_scale: float,
+              color: Tuple[int, int, int]):
+    thickness = max(1, int(round(font_scale * 1.5)))
+    cv2.putText(image, str(text), origin, cv2.FONT_HERSHEY_SIMPLEX, font_scale, color,
+                thickness, cv2.LINE_AA)
+
+
+def benchmark_images(sizes: Optional[List[Tuple[int, int]]] = None, per_size: int = 2,
+                     seed: int = 0) -> List[Tuple[str, np.ndarray]]:
+    """
+    Build the fixed synthetic image set
+    
+    Args:
+        sizes: (height, width) pairs (defaults to DEFAULT_SIZES)
+        per_size: Images per size
+        seed: Base seed
+    
+    Returns:
+        List of (name, image) pairs
+    """
+    images = []
+    for h, w in sizes or DEFAULT_SIZES:
+        for idx in range(per_size):
+            images.append((f'ui_{w}x{h}_{idx}', synthetic_ui_image(h, w, seed=seed + idx)))
+    return images
+
+
+def benchmark_corpus(sizes: Optional[List[Tuple[int, int]]] = None, per_size: int = 1,
+                     seed: int = 0) -> List[Tuple[str, np.ndarray]]:
+    """
+    Build the fixed mixed corpus: UI screenshots and document pages
+    
+    Args:
+        sizes: (height, width) pairs (defaults to DEFAULT_SIZES)
+        per_size: Images of each kind per size
+        seed: Base seed
+    
+    Returns:
+        List of (name, image) pairs
+    """
+    images = []
+    for h, w in sizes or DEFAULT_SIZES:
+        for idx in range(per_size):
+            images.append((f'ui_{w}x{h}_{idx}', synthetic_ui_image(h, w, seed=seed + idx)))
+            images.append((f'doc_{w}x{h}_{idx}', synthetic_document_image(h, w, seed=seed + idx)))
+    return images
+
+
+def load_image_dir(directory: str) -> List[Tuple[str, np.ndarray]]:
+    """
+    Load every readable image in a directory (sorted by name)
+    
+    Args:
+        directory: Directory containing PNG/JPEG/WebP files
+    
+    Returns:
+        List of (name, image) pairs in RGB
+    """
+    images = []
+    for filename in sorted(os.listdir(directory)):
+        image = cv2.imread(os.path.join(directory, filename))
+        if image is not None:
+            images.append((filename, cv2.cvtColor(image, cv2.COLOR_BGR2RGB)))
+    return images
@@ -0,0 +1,284 @@
+"""
+Benchmark every ImageProcessor stage and the full pipeline
+
+Runs segment_image, analyze_layout, extract_text, _match_segments_with_text,
+_extract_color_palette, JSON serialization and the full process_image over
+the deterministic UI/document corpus, with the result cache disabled so
+each run does the work. Latency percentiles, peak RSS and output sizes are
+written as a JSON baseline. A later run can be compared against a stored
+baseline, and the command exits non-zero when a stage regressed beyond the
+thresholds.
+
+Models are loaded from MODELS_DIR and the Hugging Face cache with
+downloads disabled, so the benchmark runs on a CPU-only machine without
+network once the weights are present (pass --allow-download otherwise).
+
+Usage (from ai-services/):
+    python -m benchmarks.pipeline --output baseline.json
+    python -m benchmarks.pipeline --compare baseline.json --threshold 0.2
+    python -m benchmarks.pipeline --sizes 480x640 1080x1920 --repeat 5 --stages process
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import numpy as np
+from benchmarks.images import DEFAULT_SIZES, benchmark_corpus, load_image_dir
+
+STAGES = ['segmentation', 'layout', 'ocr', 'matching', 'palette', 'serialization', 'process']
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+def parse_size(value: str):
+    """'HxW' -> (height, width)"""
+    try:
+        h, w = value.lower().split('x')
+        return int(h), int(w)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Size must be HEIGHTxWIDTH, got {value}")
+
+
+def peak_rss_bytes():
+    """Peak resident set size of this process so far"""
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def summarize(latencies):
+    """Latency percentiles, mean and max in milliseconds"""
+    ms = np.asarray(latencies) * 1000
+    summary = {f'p{p}_ms': round(float(np.percentile(ms, p)), 2) for p in PERCENTILES}
+    summary['mean_ms'] = round(float(ms.mean()), 2)
+    summary['max_ms'] = round(float(ms.max()), 2)
+    summary['runs'] = len(latencies)
+    return summary
+
+
+def _json_size(value) -> int:
+    return len(json.dumps(value))
+
+
+def run(images, stages, repeat: int):
+    from app.services.processor import ImageProcessor
+    from app.services.registry import registry
+    from app.utils.image_context import ImageContext
+    
+    processor = ImageProcessor()
+    processor.cache = None
+    
+    # Load every model (timed by the registry) and run one warm pass
+    processor.process_image(images[0][1], pipeline_mode='sequential')
+    
+    def clear_embeddings():
+        if registry.is_loaded('sam'):
+            registry.get('sam').embedding_cache.clear()
+    
+    latencies = {stage: [] for stage in stages}
+    output_bytes = {stage: [] for stage in stages}
+    per_image = {}
+    
+    for name, image in images:
+        for _ in range(repeat):
+            clear_embeddings()
+            context = ImageContext(image)
+            
+            def timed(stage, func, *args, **kwargs):
+                start = time.perf_counter()
+                result = func(*args, **kwargs)
+                latencies[stage].append(time.perf_counter() - start)
+                return result
+            
+            # Inputs of the later stages come from the earlier ones even when
+            # only some stages are measured
+            segments = (timed('segmentation', processor.segment_image, context)
+                        if 'segmentation' in stages else processor.segment_image(context))
+            if 'layout' in stages:
+                layout = timed('layout', processor.analyze_layout, context)
+                output_bytes['layout'].append(_json_size(layout))
+            ocr_results = (timed('ocr', processor.extract_text, context)
+                           if 'ocr' in stages else processor.extract_text(context))
+            
+            if 'segmentation' in stages:
+                output_bytes['segmentation'].append(_json_size(segments))
+            if 'ocr' in stages:
+                output_bytes['ocr'].append(_json_size(ocr_results))
+            if 'matching' in stages:
+                layers = timed('matching', processor._match_segments_with_text, segments, ocr_results, context)
+                output_bytes['matching'].append(_json_size(layers))
+            if 'palette' in stages:
+                palette = timed('palette', processor._extract_color_palette, context.image)
+                output_bytes['palette'].append(_json_size(palette))
+            
+            if 'process' in stages or 'serialization' in stages:
+                clear_embeddings()
+                if 'process' in stages:
+                    result = timed('process', processor.process_image, image)
+                else:
+                    result = processor.process_image(image)
+                
+                payload = {'success': True, 'data': result}
+                if 'serialization' in stages:
+                    body = timed('serialization', json.dumps, payload)
+                else:
+                    body = json.dumps(payload)
+                for stage in ('process', 'serialization'):
+                    if stage in stages:
+                        output_bytes[stage].append(len(body))
+                
+                per_image[name] = {
+                    'layers': len(result['layers']),
+                    'text_elements': result['total_text_elements'],
+                    'timings_ms': result['pipeline']['timings_ms']
+                }
+    
+    return {
+        'stages': {
+            stage: dict(summarize(latencies[stage]),
+                        output_bytes_mean=int(np.mean(output_bytes[stage])) if output_bytes[stage] else None)
+            for stage in stages if latencies[stage]
+        },
+        'images': per_image,
+        'model_load_s': {name: stats['load_time'] for name, stats in registry.stats().items() if stats['loaded']},
+        'peak_rss_mb': round(peak_rss_bytes() / 2**20, 1)
+    }
+
+
+def environment(args):
+    """Versions and settings that make two runs comparable"""
+    from app.config import Config
+    
+    versions = {}
+    for module in ('numpy', 'cv2', 'torch', 'transformers'):
+        try:
+            versions[module] = getattr(__import__(module), '__version__', None)
+        except ImportError:
+            versions[module] = None
+    
+    return {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'versions': versions,
+        'device': Config.DEVICE,
+        'sam_backend': Config.SAM_BACKEND,
+        'pix2struct_backend': Config.PIX2STRUCT_BACKEND,
+        'sam_model': Config.SAM_MODEL_TYPE,
+        'sam_profile': Config.SAM_PROFILE,
+        'pix2struct_model': Config.PIX2STRUCT_MODEL,
+        'pix2struct_decoding': Config.PIX2STRUCT_DECODING,
+        'ocr_backend': Config.OCR_BACKEND,
+        'pipeline_mode': Config.PIPELINE_MODE,
+        'repeat': args.repeat,
+        'images': args.images or [f'{h}x{w}' for h, w in args.sizes]
+    }
+
+
+def compare(current, baseline, threshold: float, rss_threshold: float, min_delta_ms: float):
+    """
+    Regressions of current against baseline
+    
+    A stage regresses when its p50 or p95 grew by more than threshold
+    (relative) and min_delta_ms (absolute, to ignore noise on fast stages).
+    Peak RSS regresses beyond rss_threshold. Output size changes are
+    reported but not failures, since they follow behaviour changes.
+    
+    Returns:
+        (rows for the report, list of regression messages)
+    """
+    rows, regressions = [], []
+    for stage, stats in current['stages'].items():
+        base = baseline['stages'].get(stage)
+        if base is None:
+            continue
+        for key in ('p50_ms', 'p95_ms'):
+            delta = stats[key] - base[key]
+            ratio = delta / base[key] if base[key] > 0 else 0.0
+            regressed = ratio > threshold and delta > min_delta_ms
+            rows.append((stage, key, base[key], stats[key], ratio, regressed))
+            if regressed:
+                regressions.append(f"{stage} {key}: {base[key]:.1f} -> {stats[key]:.1f} ms ({ratio:+.0%})")
+        if base.get('output_bytes_mean') and stats.get('output_bytes_mean') != base['output_bytes_mean']:
+            print(f"ℹ️  {stage} output size {base['output_bytes_mean']} -> {stats['output_bytes_mean']} bytes")
+    
+    rss_ratio = current['peak_rss_mb'] / baseline['peak_rss_mb'] - 1 if baseline.get('peak_rss_mb') else 0.0
+    if rss_ratio > rss_threshold:
+        regressions.append(f"peak RSS: {baseline['peak_rss_mb']} -> {current['peak_rss_mb']} MB ({rss_ratio:+.0%})")
+    
+    return rows, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark pipeline stages against a baseline')
+    parser.add_argument('--images', help='Directory of images (defaults to the synthetic corpus)')
+    parser.add_argument('--sizes', nargs='+', type=parse_size, default=DEFAULT_SIZES,
+                        help='Corpus sizes as HEIGHTxWIDTH')
+    parser.add_argument('--per-size', type=int, default=1, help='UI and document images per size')
+    parser.add_argument('--stages', nargs='+', default=STAGES, choices=STAGES)
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per image')
+    parser.add_argument('--device', help='Override Config.DEVICE (e.g. cpu)')
+    parser.add_argument('--allow-download', action='store_true', help='Let models download weights')
+    parser.add_argument('--output', help='Write results (a baseline) as JSON to this file')
+    parser.add_argument('--compare', help='Baseline JSON to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2, help='Allowed relative latency growth')
+    parser.add_argument('--rss-threshold', type=float, default=0.1, help='Allowed relative peak RSS growth')
+    parser.add_argument('--min-delta-ms', type=float, default=5.0, help='Ignore latency growth below this')
+    args = parser.parse_args()
+    
+    if not args.allow_download:
+        os.environ.setdefault('HF_HUB_OFFLINE', '1')
+        os.environ.setdefault('TRANSFORMERS_OFFLINE', '1')
+    
+    from app.config import Config
+    if args.device:
+        Config.DEVICE = args.device
+    
+    images = load_image_dir(args.images) if args.images else benchmark_corpus(args.sizes, args.per_size)
+    if not images:
+        raise SystemExit('No images to benchmark')
+    
+    results = {'environment': environment(args)}
+    results.update(run(images, args.stages, args.repeat))
+    
+    print()
+    print("=" * 72)
+    print(f"{'Stage':14} {'p50 (ms)':>10} {'p90 (ms)':>10} {'p95 (ms)':>10} {'p99 (ms)':>10} {'Out (KB)':>10}")
+    print("-" * 72)
+    for stage, stats in results['stages'].items():
+        size = f"{stats['output_bytes_mean'] / 1024:>10.1f}" if stats['output_bytes_mean'] else f"{'-':>10}"
+        print(f"{stage:14} {stats['p50_ms']:>10.1f} {stats['p90_ms']:>10.1f} {stats['p95_ms']:>10.1f} "
+              f"{stats['p99_ms']:>10.1f} {size}")
+    print("-" * 72)
+    print(f"Peak RSS: {results['peak_rss_mb']} MB   Model load (s): {results['model_load_s']}")
+    print("=" * 72)
+    
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"📄 Results written to {args.output}")
+    
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        
+        rows, regressions = compare(results, baseline, args.threshold, args.rss_threshold, args.min_delta_ms)
+        print()
+        print(f"{'Stage':14} {'Metric':8} {'Baseline':>10} {'Current':>10} {'Change':>8}")
+        for stage, key, base, current, ratio, regressed in rows:
+            flag = '  ❌' if regressed else ''
+            print(f"{stage:14} {key:8} {base:>10.1f} {current:>10.1f} {ratio:>+8.0%}{flag}")
+        
+        if regressions:
+            print(f"\n❌ {len(regressions)} regression(s) beyond {args.threshold:.0%}:")
+            for message in regressions:
+                print(f"   {message}")
+            sys.exit(1)
+        print(f"\n✅ No regressions against {args.compare}")
+
+
+if __name__ == '__main__':
+    main()
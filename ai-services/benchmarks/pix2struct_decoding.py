@@ -0,0 +1,100 @@
+"""
+Benchmark Pix2Struct decoding profiles with and without int8 quantization
+
+Runs analyze_layout for every decoding profile on float and dynamically
+quantized weights and reports latency and generated tokens per second.
+
+Usage (from ai-services/):
+    python -m benchmarks.pix2struct_decoding
+    python -m benchmarks.pix2struct_decoding --profiles greedy budget --weights int8 --output p2s.json
+"""
+import argparse
+import json
+import statistics
+import time
+from app.services.pix2struct_service import DECODING_PROFILES, Pix2StructService
+from benchmarks.images import benchmark_images, load_image_dir
+
+WEIGHTS = {'fp32': False, 'int8': True}
+
+
+def run(images, profiles, weights, repeat: int):
+    results = []
+    
+    for weight_name in weights:
+        try:
+            service = Pix2StructService(quantize=WEIGHTS[weight_name])
+        except Exception as e:
+            print(f"⚠️  Skipping {weight_name}: {str(e)}")
+            continue
+        
+        if WEIGHTS[weight_name] and not service.quantized:
+            print(f"⚠️  Skipping {weight_name}: quantization is only applied on CPU")
+            continue
+        
+        # First generate() pays for allocator growth and kernel selection
+        service.warmup()
+        
+        for profile in profiles:
+            latencies = []
+            tokens = []
+            time_limited = 0
+            
+            for _, image in images:
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    layout = service.analyze_layout(image, profile=profile)
+                    latencies.append(time.perf_counter() - start)
+                    tokens.append(layout['decoding']['new_tokens'])
+                    time_limited += layout['decoding']['time_limited']
+            
+            results.append({
+                'weights': weight_name,
+                'profile': profile,
+                'settings': DECODING_PROFILES[profile],
+                'runs': len(latencies),
+                'latency_mean_s': round(statistics.mean(latencies), 4),
+                'latency_median_s': round(statistics.median(latencies), 4),
+                'tokens_mean': round(statistics.mean(tokens), 1),
+                'tokens_per_sec': round(sum(tokens) / sum(latencies), 2) if sum(latencies) > 0 else 0.0,
+                'time_limited_runs': time_limited
+            })
+        
+        del service
+    
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark Pix2Struct decoding profiles')
+    parser.add_argument('--images', help='Directory of images (defaults to the synthetic set)')
+    parser.add_argument('--profiles', nargs='+', default=list(DECODING_PROFILES), choices=list(DECODING_PROFILES))
+    parser.add_argument('--weights', nargs='+', default=list(WEIGHTS), choices=list(WEIGHTS))
+    parser.add_argument('--per-size', type=int, default=1, help='Synthetic images per size')
+    parser.add_argument('--repeat', type=int, default=1, help='Runs per image and combination')
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    args = parser.parse_args()
+    
+    images = load_image_dir(args.images) if args.images else benchmark_images(per_size=args.per_size)
+    if not images:
+        raise SystemExit('No images to benchmark')
+    
+    results = run(images, args.profiles, args.weights, args.repeat)
+    
+    print()
+    print("=" * 72)
+    print(f"{'Weights':8} {'Profile':11} {'Mean (s)':>9} {'Median (s)':>11} {'Tokens':>7} {'Tok/s':>8} {'Capped':>7}")
+    print("-" * 72)
+    for r in results:
+        print(f"{r['weights']:8} {r['profile']:11} {r['latency_mean_s']:>9.3f} {r['latency_median_s']:>11.3f} "
+              f"{r['tokens_mean']:>7.1f} {r['tokens_per_sec']:>8.1f} {r['time_limited_runs']:>7}")
+    print("=" * 72)
+    
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"📄 Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
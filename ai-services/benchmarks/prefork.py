@@ -0,0 +1,175 @@
+"""
+Measure memory per worker of the pre-fork server
+
+Starts gunicorn (gunicorn.conf.py, wsgi:app) with each worker count, waits
+until every worker has warmed up, sends a round of /api/image/process
+requests and reads RSS, PSS and USS of the master and each worker from
+/proc/<pid>/smaps_rollup (Linux only). Summing RSS over workers counts the
+copy-on-write model weights once per worker; summing PSS gives the real
+footprint. With --no-preload each worker loads its own copy of the models
+instead, for comparison.
+
+Usage (from ai-services/):
+    python -m benchmarks.prefork --workers 1 2 4
+    python -m benchmarks.prefork --workers 4 --no-preload --output prefork.json
+    SAM_BACKEND=stub PIX2STRUCT_BACKEND=stub OCR_BACKEND=stub python -m benchmarks.prefork
+"""
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+from benchmarks.images import synthetic_ui_image
+
+SERVICE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def child_pids(pid: int):
+    """Direct children of a process"""
+    try:
+        with open(f'/proc/{pid}/task/{pid}/children') as f:
+            return [int(child) for child in f.read().split()]
+    except OSError:
+        return []
+
+
+def get_json(url: str, timeout: float = 5.0):
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            return json.loads(response.read())
+    except Exception:
+        return None
+
+
+def post_image(url: str, payload: bytes, timeout: float) -> int:
+    """multipart/form-data POST of one PNG as 'image'; returns the status code"""
+    boundary = uuid.uuid4().hex
+    body = (f'--{boundary}\r\nContent-Disposition: form-data; name="image"; filename="benchmark.png"\r\n'
+            f'Content-Type: image/png\r\n\r\n').encode() + payload + f'\r\n--{boundary}--\r\n'.encode()
+    request = urllib.request.Request(url, data=body, headers={'Content-Type': f'multipart/form-data; boundary={boundary}'})
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            response.read()
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+
+def wait_ready(master: subprocess.Popen, base_url: str, workers: int, timeout: float):
+    """Poll /health until every worker reports warmup finished; returns the worker pids"""
+    deadline = time.time() + timeout
+    ready = set()
+    while time.time() < deadline:
+        if master.poll() is not None:
+            raise RuntimeError(f"gunicorn exited with {master.returncode}")
+        
+        pids = set(child_pids(master.pid))
+        health = get_json(f'{base_url}/api/image/health')
+        if health and health['warmup']['status'] in ('ready', 'idle'):
+            ready.add(health['pid'])
+        if len(pids) == workers and pids <= ready:
+            return sorted(pids)
+        time.sleep(0.2)
+    raise TimeoutError(f"Workers not ready after {timeout}s")
+
+
+def _total_mb(rows, key: str) -> float:
+    return round(sum(row.get(key, 0) for row in rows) / 2**20, 1)
+
+
+def measure(workers: int, args) -> dict:
+    """Run gunicorn with this many workers and report memory per process"""
+    from app.utils.helpers import get_memory_breakdown
+    
+    env = dict(os.environ, SERVER_WORKERS=str(workers), PORT=str(args.port), HOST='127.0.0.1',
+               WARMUP_ENABLED='True', DEBUG='False')
+    if args.no_preload:
+        env['SERVER_PRELOAD_SERVICES'] = ''
+    
+    base_url = f'http://127.0.0.1:{args.port}'
+    master = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:app'],
+        cwd=SERVICE_ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    
+    try:
+        start = time.perf_counter()
+        pids = wait_ready(master, base_url, workers, args.timeout)
+        ready_s = time.perf_counter() - start
+        
+        image = cv2.cvtColor(synthetic_ui_image(480, 640), cv2.COLOR_RGB2BGR)
+        payload = cv2.imencode('.png', image)[1].tobytes()
+        with ThreadPoolExecutor(max_workers=workers * 2) as executor:
+            statuses = list(executor.map(
+                lambda _: post_image(f'{base_url}/api/image/process', payload, args.timeout),
+                range(args.requests * workers)
+            ))
+        
+        processes = [dict(get_memory_breakdown(master.pid) or {}, pid=master.pid, role='master')]
+        processes += [dict(get_memory_breakdown(pid) or {}, pid=pid, role='worker') for pid in pids]
+    finally:
+        master.send_signal(signal.SIGTERM)
+        try:
+            master.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            master.kill()
+    
+    worker_stats = [p for p in processes if p['role'] == 'worker']
+    return {
+        'workers': workers,
+        'preload': not args.no_preload,
+        'ready_s': round(ready_s, 2),
+        'requests_ok': sum(status == 200 for status in statuses),
+        'requests': len(statuses),
+        'processes': processes,
+        'total_rss_mb': _total_mb(processes, 'rss_bytes'),
+        'total_pss_mb': _total_mb(processes, 'pss_bytes'),
+        'worker_rss_mb': round(_total_mb(worker_stats, 'rss_bytes') / max(1, len(worker_stats)), 1),
+        'worker_uss_mb': round(_total_mb(worker_stats, 'uss_bytes') / max(1, len(worker_stats)), 1)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='RSS / PSS / USS per worker of the pre-fork server')
+    parser.add_argument('--workers', nargs='+', type=int, default=[1, 2, 4])
+    parser.add_argument('--requests', type=int, default=4, help='/process requests per worker before measuring')
+    parser.add_argument('--no-preload', action='store_true', help='Let each worker load its own models')
+    parser.add_argument('--port', type=int, default=5055)
+    parser.add_argument('--timeout', type=float, default=600, help='Seconds to wait for warmup and requests')
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    args = parser.parse_args()
+    
+    if not sys.platform.startswith('linux'):
+        raise SystemExit('Memory breakdown needs /proc/<pid>/smaps_rollup (Linux)')
+    
+    results = []
+    for workers in args.workers:
+        print(f"🚀 {workers} worker(s), preload {'off' if args.no_preload else 'on'}")
+        results.append(measure(workers, args))
+    
+    print()
+    print("=" * 80)
+    print(f"{'Workers':>7} {'Ready (s)':>10} {'OK':>7} {'Worker RSS':>11} {'Worker USS':>11} "
+          f"{'Sum RSS':>9} {'Sum PSS':>9}   (MB)")
+    print("-" * 80)
+    for r in results:
+        print(f"{r['workers']:>7} {r['ready_s']:>10.1f} {r['requests_ok']:>3}/{r['requests']:<3} "
+              f"{r['worker_rss_mb']:>11.1f} {r['worker_uss_mb']:>11.1f} {r['total_rss_mb']:>9.1f} {r['total_pss_mb']:>9.1f}")
+    print("=" * 80)
+    print("Sum PSS is the memory the server really uses; Sum RSS counts shared pages once per process.")
+    
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"📄 Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
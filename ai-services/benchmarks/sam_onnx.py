@@ -0,0 +1,167 @@
+"""
+Parity and latency of the ONNX Runtime SAM backend against PyTorch
+
+Loads the configured checkpoint on both backends and compares, per image:
+- image embeddings (max relative difference)
+- point and box prompt masks (IoU) and scores
+- automatic segmentation (segment count and mean best-match IoU)
+
+It also reports encoder, prompt decoder and end-to-end latency. Exits with
+status 1 when parity falls outside the tolerances.
+
+Usage (from ai-services/):
+    python -m benchmarks.sam_onnx
+    python -m benchmarks.sam_onnx --images ./samples --repeat 3 --output sam_onnx.json
+"""
+import argparse
+import gc
+import json
+import statistics
+import sys
+import time
+import numpy as np
+from app.config import Config
+from app.services.sam_service import SAM_PROFILES, SAMService
+from app.utils.mask_encoding import decode_mask
+from benchmarks.images import benchmark_images, load_image_dir
+
+
+def _iou(a: np.ndarray, b: np.ndarray) -> float:
+    union = np.logical_or(a, b).sum()
+    return float(np.logical_and(a, b).sum() / union) if union else 1.0
+
+
+def _best_match_iou(masks_a, masks_b) -> float:
+    """Mean over masks_a of the best IoU against any mask in masks_b"""
+    if not masks_a or not masks_b:
+        return 1.0 if not masks_a and not masks_b else 0.0
+    return float(np.mean([max(_iou(a, b) for b in masks_b) for a in masks_a]))
+
+
+def _encode(service: SAMService, image: np.ndarray):
+    """Cold-cache encoder pass; returns (features, seconds)"""
+    service.embedding_cache.clear()
+    image = service._resize_for_sam(image)
+    start = time.perf_counter()
+    with service.lock:
+        service.predictor.set_image(image)
+    elapsed = time.perf_counter() - start
+    return service.predictor.features.detach().cpu().numpy(), elapsed
+
+
+def run_backend(backend: str, images, repeat: int, profile=None):
+    """Outputs and latencies of one backend; only one model is held in memory at a time"""
+    service = SAMService(backend=backend)
+    outputs = []
+    latency = {'encoder': [], 'decoder': [], 'segment_image': []}
+    
+    for _, image in images:
+        h, w = image.shape[:2]
+        point = [(w // 2, h // 2)]
+        box = [w // 4, h // 4, 3 * w // 4, 3 * h // 4]
+        
+        for _ in range(repeat):
+            features, seconds = _encode(service, image)
+            latency['encoder'].append(seconds)
+        
+        prompts = []
+        for kwargs in ({'points': point, 'labels': [1]}, {'box': box}):
+            result = service.segment_with_prompts(image, mask_encoding='rle', **kwargs)
+            for _ in range(repeat):
+                timed = service.segment_with_prompts(image_id=result['image_id'], mask_encoding='rle', **kwargs)
+                latency['decoder'].append(timed['timings_ms']['decode'] / 1000)
+            prompts.append((decode_mask(result['mask']), result['score']))
+        
+        for _ in range(repeat):
+            service.embedding_cache.clear()
+            start = time.perf_counter()
+            segments = service.segment_image(image, mask_encoding='rle', profile=profile)
+            latency['segment_image'].append(time.perf_counter() - start)
+        
+        outputs.append({
+            'features': features,
+            'prompts': prompts,
+            'masks': [decode_mask(s['mask']) for s in segments]
+        })
+    
+    del service
+    gc.collect()
+    return outputs, {stage: round(statistics.median(values), 4) for stage, values in latency.items()}
+
+
+def compare(images, repeat: int, profile=None):
+    torch_out, torch_latency = run_backend('torch', images, repeat, profile)
+    onnx_out, onnx_latency = run_backend('onnx', images, repeat, profile)
+    
+    parity = []
+    for (image_name, _), ref, alt in zip(images, torch_out, onnx_out):
+        feature_diff = np.abs(ref['features'] - alt['features']).max() / max(np.abs(ref['features']).max(), 1e-12)
+        
+        parity.append({
+            'image': image_name,
+            'feature_rel_diff': float(feature_diff),
+            'prompt_mask_iou_min': min(_iou(a[0], b[0]) for a, b in zip(ref['prompts'], alt['prompts'])),
+            'prompt_score_diff_max': max(abs(a[1] - b[1]) for a, b in zip(ref['prompts'], alt['prompts'])),
+            'segments_torch': len(ref['masks']),
+            'segments_onnx': len(alt['masks']),
+            'segment_match_iou': min(_best_match_iou(ref['masks'], alt['masks']),
+                                     _best_match_iou(alt['masks'], ref['masks']))
+        })
+    
+    return parity, {'torch': torch_latency, 'onnx': onnx_latency}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='SAM ONNX Runtime parity and latency')
+    parser.add_argument('--images', help='Directory of images (defaults to the synthetic set)')
+    parser.add_argument('--per-size', type=int, default=1, help='Synthetic images per size')
+    parser.add_argument('--repeat', type=int, default=1, help='Timed runs per image and stage')
+    parser.add_argument('--profile', choices=list(SAM_PROFILES), help='SAM profile for automatic segmentation')
+    parser.add_argument('--max-feature-diff', type=float, default=1e-3,
+                        help='Allowed max |torch - onnx| / max |torch| of image embeddings')
+    parser.add_argument('--min-mask-iou', type=float, default=0.98,
+                        help='Required IoU of prompt masks and of matched automatic masks')
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    args = parser.parse_args()
+    
+    images = load_image_dir(args.images) if args.images else benchmark_images(per_size=args.per_size)
+    if not images:
+        raise SystemExit('No images to benchmark')
+    
+    # Keep each backend's embeddings in memory only so they never serve each other
+    Config.SAM_EMBEDDING_CACHE_DIR = ''
+    
+    parity, latency = compare(images, args.repeat, args.profile)
+    
+    failures = [
+        p['image'] for p in parity
+        if p['feature_rel_diff'] > args.max_feature_diff
+        or p['prompt_mask_iou_min'] < args.min_mask_iou
+        or p['segment_match_iou'] < args.min_mask_iou
+    ]
+    
+    print()
+    print("=" * 78)
+    print(f"{'Image':18} {'Feat diff':>10} {'Prompt IoU':>11} {'Score diff':>11} {'Segs t/o':>10} {'Seg IoU':>8}")
+    print("-" * 78)
+    for p in parity:
+        print(f"{p['image']:18} {p['feature_rel_diff']:>10.2e} {p['prompt_mask_iou_min']:>11.4f} "
+              f"{p['prompt_score_diff_max']:>11.2e} {p['segments_torch']:>4}/{p['segments_onnx']:<5} "
+              f"{p['segment_match_iou']:>8.4f}")
+    print("-" * 78)
+    print(f"{'Median (s)':18} {'Encoder':>10} {'Decoder':>11} {'Segment':>11}")
+    for name, stages in latency.items():
+        print(f"{name:18} {stages['encoder']:>10.4f} {stages['decoder']:>11.4f} {stages['segment_image']:>11.4f}")
+    print("=" * 78)
+    print("✅ Parity OK" if not failures else f"❌ Parity failed for: {', '.join(failures)}")
+    
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'parity': parity, 'latency': latency}, f, indent=2)
+        print(f"📄 Results written to {args.output}")
+    
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""
+Benchmark SAM automatic mask generation profiles
+
+Runs every profile in SAM_PROFILES over a fixed image set and reports
+latency and mask count per profile.
+
+Usage (from ai-services/):
+    python -m benchmarks.sam_profiles
+    python -m benchmarks.sam_profiles --images ./samples --repeat 3 --output sam_profiles.json
+"""
+import argparse
+import json
+import statistics
+import time
+from app.services.sam_service import SAMService, SAM_PROFILES
+from benchmarks.images import benchmark_images, load_image_dir
+
+
+def run(images, profiles, repeat: int):
+    sam_service = SAMService()
+    
+    # Warm up the encoder once so the first profile does not pay for it
+    sam_service.segment_image(images[0][1], profile=profiles[0])
+    
+    results = {}
+    for profile in profiles:
+        latencies = []
+        mask_counts = []
+        
+        for name, image in images:
+            for _ in range(repeat):
+                # Drop cached embeddings so every run includes the encoder
+                sam_service.embedding_cache.clear()
+                
+                start = time.perf_counter()
+                segments = sam_service.segment_image(image, mask_encoding='rle', profile=profile)
+                latencies.append(time.perf_counter() - start)
+            mask_counts.append(len(segments))
+        
+        results[profile] = {
+            'params': SAM_PROFILES[profile],
+            'images': len(images),
+            'runs': len(latencies),
+            'latency_mean_s': round(statistics.mean(latencies), 4),
+            'latency_median_s': round(statistics.median(latencies), 4),
+            'latency_max_s': round(max(latencies), 4),
+            'masks_mean': round(statistics.mean(mask_counts), 2),
+            'masks_total': sum(mask_counts)
+        }
+    
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark SAM speed profiles')
+    parser.add_argument('--images', help='Directory of images (defaults to the synthetic set)')
+    parser.add_argument('--profiles', nargs='+', default=list(SAM_PROFILES), choices=list(SAM_PROFILES))
+    parser.add_argument('--repeat', type=int, default=1, help='Runs per image and profile')
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    args = parser.parse_args()
+    
+    images = load_image_dir(args.images) if args.images else benchmark_images()
+    if not images:
+        raise SystemExit('No images to benchmark')
+    
+    results = run(images, args.profiles, args.repeat)
+    
+    print()
+    print("=" * 72)
+    print(f"{'Profile':10} {'Mean (s)':>10} {'Median (s)':>11} {'Max (s)':>9} {'Masks/img':>10}")
+    print("-" * 72)
+    for profile, stats in results.items():
+        print(f"{profile:10} {stats['latency_mean_s']:>10.3f} {stats['latency_median_s']:>11.3f} "
+              f"{stats['latency_max_s']:>9.3f} {stats['masks_mean']:>10.1f}")
+    print("=" * 72)
+    
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"📄 Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
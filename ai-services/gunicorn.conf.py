@@ -0,0 +1,60 @@
+"""
+gunicorn settings for pre-fork serving
+    
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+The master loads the models once (preload_app) and forks SERVER_WORKERS
+workers that share the weights copy-on-write. Each worker serves
+SERVER_THREADS requests at a time and gives torch its share of the CPU
+cores. Workers write their metrics to METRICS_MULTIPROC_DIR (a fresh temp
+directory when unset) and /metrics merges them. Settings come from the
+same environment / .env as app.py.
+"""
+import glob
+import os
+import shutil
+import tempfile
+from app.config import Config
+from app.services.prefork import init_worker, per_worker_state_warnings
+from app.utils.metrics import metrics
+
+bind = f"{Config.HOST}:{Config.PORT}"
+workers = Config.SERVER_WORKERS
+worker_class = 'gthread'
+threads = Config.SERVER_THREADS
+timeout = Config.SERVER_TIMEOUT
+preload_app = True
+
+
+_metrics_tmpdir = None
+
+
+def on_starting(server):
+    global _metrics_tmpdir
+    for warning in per_worker_state_warnings(Config.SERVER_WORKERS):
+        print(f"⚠️  {warning}")
+    
+    # Snapshots from a previous run would be merged into this one's totals
+    if Config.METRICS_MULTIPROC_DIR:
+        os.makedirs(Config.METRICS_MULTIPROC_DIR, exist_ok=True)
+        for path in glob.glob(os.path.join(Config.METRICS_MULTIPROC_DIR, '*.json')):
+            os.remove(path)
+    else:
+        _metrics_tmpdir = Config.METRICS_MULTIPROC_DIR = tempfile.mkdtemp(prefix='pixmorph-metrics-')
+
+
+def post_fork(server, worker):
+    init_worker(Config.SERVER_WORKERS)
+
+
+def worker_exit(server, worker):
+    metrics.write_snapshot()
+
+
+def child_exit(server, worker):
+    metrics.mark_process_dead(worker.pid, Config.METRICS_MULTIPROC_DIR)
+
+
+def on_exit(server):
+    if _metrics_tmpdir:
+        shutil.rmtree(_metrics_tmpdir, ignore_errors=True)
@@ -0,0 +1,18 @@
+"""
+WSGI entry point for pre-fork serving
+    
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+gunicorn.conf.py sets preload_app, so the master process imports this
+module once: it builds the app and loads the models, then forks
+SERVER_WORKERS workers that share the weights copy-on-write.
+"""
+import os
+import runpy
+from app.services.prefork import preload_models
+
+# app.py is shadowed by the app package, so load the factory by path
+create_app = runpy.run_path(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app.py'))['create_app']
+
+app = create_app(start_warmup=False)
+preload_models()
@@ -23,6 +23,12 @@ export interface TextStyle {
   align: 'left' | 'center' | 'right';
 }
 
+export type EncodedMask =
+  | { format: 'rle'; size: [number, number]; counts: number[] }
+  | { format: 'bitmap'; size: [number, number]; bbox: [number, number, number, number]; data: string }
+  | { format: 'polygon'; size: [number, number]; polygons: number[][] }
+  | { format: 'raw'; size: [number, number]; data: boolean[][] };
+
 export interface Layer {
   id: string;
   type: 'text' | 'shape' | 'background' | 'icon';
@@ -35,7 +41,7 @@ export interface Layer {
     stroke_color?: string;
     stroke_width?: number;
   };
-  mask?: number[][];
+  mask?: EncodedMask;
   area?: number;
   editable: boolean;
   locked: boolean;